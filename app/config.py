@@ -1,4 +1,5 @@
 from dotenv import load_dotenv
+import json
 import os
 # sys.path.append("../")
 class Config:
@@ -8,13 +9,99 @@ class Config:
         env_path = os.path.join(os.path.dirname(__file__), '..', '.env.development')
         load_dotenv(dotenv_path=env_path)
         self.news_api_key = os.getenv("NEWS_API_KEY")
-        self.news_base_url = "https://newsapi.org/v2/top-headlines"
-        self.news_everything_url = "https://newsapi.org/v2/everything"
+        self.news_api_base = os.getenv("NEWS_API_BASE", "https://newsapi.org/v2")
+        self.news_base_url = f"{self.news_api_base}/top-headlines"
+        self.news_everything_url = f"{self.news_api_base}/everything"
+        self.news_request_timeout = float(os.getenv("NEWS_REQUEST_TIMEOUT", 10))
+        self.news_max_concurrency = int(os.getenv("NEWS_MAX_CONCURRENCY", 8))
+        self.news_max_retries = int(os.getenv("NEWS_MAX_RETRIES", 3))
+        self.ingestion_queue_size = int(os.getenv("INGESTION_QUEUE_SIZE", 100))
+        ## e.g. [{"country": "us", "category": "sports", "interval_seconds": 900}]
+        self.ingestion_subscriptions = json.loads(os.getenv("INGESTION_SUBSCRIPTIONS", "[]"))
         self.groq_api_key = os.getenv("GROQ_API_KEY")
         self.llm_provider = "groq"
         self.model = "llama-3.3-70b-versatile"
         self.temperature = 0.7
         self.llm_max_tokens = 1000
+        ## /ask/batch runs at most this many llm calls at once, within the provider's tokens-per-minute quota (0 = unlimited)
+        self.llm_batch_concurrency = int(os.getenv("LLM_BATCH_CONCURRENCY", 8))
+        self.llm_tokens_per_minute = int(os.getenv("LLM_TOKENS_PER_MINUTE", 0))
+        ## llm gateway: every llm call of the process goes through it
+        self.llm_timeout_seconds = float(os.getenv("LLM_TIMEOUT_SECONDS", 30))
+        self.llm_max_retries = int(os.getenv("LLM_MAX_RETRIES", 1))
+        self.llm_max_concurrency = int(os.getenv("LLM_MAX_CONCURRENCY", 16))
+        ## a second request is sent once the first runs longer than this percentile of recent latencies (0 disables hedging)
+        self.llm_hedge_percentile = float(os.getenv("LLM_HEDGE_PERCENTILE", 95))
+        self.llm_hedge_min_seconds = float(os.getenv("LLM_HEDGE_MIN_SECONDS", 2))
+        self.llm_circuit_failures = int(os.getenv("LLM_CIRCUIT_FAILURES", 5))
+        self.llm_circuit_reset_seconds = float(os.getenv("LLM_CIRCUIT_RESET_SECONDS", 30))
+        ## optional OpenAI-compatible secondary provider, used when groq fails, times out or its circuit is open
+        self.llm_fallback_model = os.getenv("LLM_FALLBACK_MODEL")
+        self.llm_fallback_base_url = os.getenv("LLM_FALLBACK_BASE_URL")
+        self.llm_fallback_api_key = os.getenv("LLM_FALLBACK_API_KEY")
+        self.answer_cache_threshold = float(os.getenv("ANSWER_CACHE_THRESHOLD", 0.95))
+        self.answer_cache_ttl_seconds = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", 3600))
+        self.answer_cache_max_entries = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", 1000))
+        self.embedding_model = "sentence-transformers/all-MiniLM-L6-v2"
+        ## torch | onnx, the onnx backend runs without torch and can use the int8 quantized graph
+        self.embedding_backend = os.getenv("EMBEDDING_BACKEND", "torch")
+        self.embedding_quantized = os.getenv("EMBEDDING_QUANTIZED", "false").lower() == "true"
+        self.embedding_onnx_file = os.getenv("EMBEDDING_ONNX_FILE")
+        self.embedding_onnx_threads = int(os.getenv("EMBEDDING_ONNX_THREADS", 0))
+        self.embedding_batch_size = int(os.getenv("EMBEDDING_BATCH_SIZE", 64))
+        self.embedding_workers = int(os.getenv("EMBEDDING_WORKERS", 2))
+        self.vectorstore_workers = int(os.getenv("VECTORSTORE_WORKERS", 4))
+        ## dense | lexical | hybrid
+        self.retrieval_mode = os.getenv("RETRIEVAL_MODE", "hybrid")
+        self.hybrid_candidates = int(os.getenv("HYBRID_CANDIDATES", 20))
+        ## 0 disables recency decay unless a request asks for it
+        self.recency_half_life_hours = float(os.getenv("RECENCY_HALF_LIFE_HOURS", 0))
+        self.lexical_index_path = os.getenv("LEXICAL_INDEX_PATH", "../data/lexical_index.sqlite3")
+        self.near_duplicate_enabled = os.getenv("NEAR_DUPLICATE_ENABLED", "true").lower() == "true"
+        self.near_duplicate_threshold = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", 0.8))
+        self.near_duplicate_index_path = os.getenv("NEAR_DUPLICATE_INDEX_PATH", "../data/near_duplicates.sqlite3")
+        self.query_batching_enabled = os.getenv("QUERY_BATCHING_ENABLED", "true").lower() == "true"
+        self.query_batch_max_size = int(os.getenv("QUERY_BATCH_MAX_SIZE", 32))
+        self.query_batch_max_wait_ms = float(os.getenv("QUERY_BATCH_MAX_WAIT_MS", 5))
+        self.embedding_cache_path = os.getenv("EMBEDDING_CACHE_PATH", "../data/embedding_cache.sqlite3")
+        self.embedding_cache_memory_size = int(os.getenv("EMBEDDING_CACHE_MEMORY_SIZE", 10000))
+        self.embedding_cache_disk_size = int(os.getenv("EMBEDDING_CACHE_DISK_SIZE", 500000))
+        ## /ask context is packed from article passages under a token budget
+        self.model_context_window = int(os.getenv("MODEL_CONTEXT_WINDOW", 8192))
+        self.context_token_budget = int(os.getenv("CONTEXT_TOKEN_BUDGET", 1500))
+        self.context_passage_candidates = int(os.getenv("CONTEXT_PASSAGE_CANDIDATES", 40))
+        self.context_mmr_lambda = float(os.getenv("CONTEXT_MMR_LAMBDA", 0.7))
+        self.passage_max_tokens = int(os.getenv("PASSAGE_MAX_TOKENS", 128))
+        ## none | console | file | otlp
+        self.tracing_exporter = os.getenv("TRACING_EXPORTER", "none")
+        self.tracing_file_path = os.getenv("TRACING_FILE_PATH", "../data/traces.jsonl")
+        self.tracing_otlp_endpoint = os.getenv("TRACING_OTLP_ENDPOINT", "http://localhost:4317")
+        ## chroma | numpy, numpy keeps memory-mapped vectors in process (single writer only)
+        self.vector_backend = os.getenv("VECTOR_BACKEND", "chroma")
+        self.vector_index_path = os.getenv("VECTOR_INDEX_PATH", "../data/vector_index")
+        self.vector_max_segments = int(os.getenv("VECTOR_MAX_SEGMENTS", 8))
+        ## build an hnsw graph (needs hnswlib) once the index holds this many vectors, 0 keeps search exact
+        self.vector_hnsw_min_size = int(os.getenv("VECTOR_HNSW_MIN_SIZE", 0))
+        ## empty runs chroma embedded in the process, set it to share one chroma server between workers and replicas
+        self.chroma_host = os.getenv("CHROMA_HOST", "")
+        self.chroma_port = int(os.getenv("CHROMA_PORT", 8000))
+        ## shared sqlite file holding the ingestion job queue and the ingestion leader lease,
+        ## empty keeps both in process (single worker deployments)
+        self.coordination_db_path = os.getenv("COORDINATION_DB_PATH", "")
+        self.leader_lease_seconds = float(os.getenv("LEADER_LEASE_SECONDS", 15))
+        ## journal mode of every sqlite file under the data dir. WAL needs shared memory between
+        ## the processes, which a volume shared by several hosts does not give, use DELETE there
+        self.sqlite_journal_mode = os.getenv("SQLITE_JOURNAL_MODE", "WAL").upper()
+        ## article retention, a TTL of 0 keeps articles forever
+        self.retention_default_ttl_hours = float(os.getenv("RETENTION_DEFAULT_TTL_HOURS", 0))
+        ## e.g. {"sports": 72, "business": 720}
+        self.retention_category_ttl_hours = json.loads(os.getenv("RETENTION_CATEGORY_TTL_HOURS", "{}"))
+        self.retention_interval_seconds = float(os.getenv("RETENTION_INTERVAL_SECONDS", 3600))
+        self.retention_batch_size = int(os.getenv("RETENTION_BATCH_SIZE", 500))
+        ## expired articles are archived here as zstd compressed JSONL, empty disables the archive
+        self.retention_archive_path = os.getenv("RETENTION_ARCHIVE_PATH", "")
+        ## rehydrated articles are past their TTL, they are kept this long before being expired again
+        self.retention_rehydrate_hours = float(os.getenv("RETENTION_REHYDRATE_HOURS", 24))
 
 
 
@@ -31,14 +118,3 @@ class Config:
 class EnvironmentVariableNotFoundError(Exception):
     """Custom exception for missing environment variables."""
     pass
-
-config = Config()
-try:
-    config.validate_news_api_key()
-    print("NEWS_API_KEY is valid and loaded successfully.")
-    config.validate_groq_api_key()
-    print("GROQ_API_KEY is valid and loaded successfully.")
-except EnvironmentVariableNotFoundError as e:
-    print(f"Error: {e}")
-    exit(1)
-    
\ No newline at end of file
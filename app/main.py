@@ -1,17 +1,35 @@
+import asyncio
+import json
+import queue
 import time 
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from typing import Optional
+
+import orjson
+from fastapi import Depends, FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
 from prometheus_fastapi_instrumentator import Instrumentator
 
-from app.schemas import ArticleResponse, FetchNewsRequest, QuestionRequest, QuestionResponse, SearchRequest, SearchResponse, SearchResult, StatsResponse
+from app.schemas import ArticleResponse, BatchQuestionRequest, FetchNewsRequest, JobStatusResponse, JobSubmittedResponse, QuestionRequest, QuestionResponse, RehydrateRequest, RehydrateResponse, SearchRequest, SearchResponse, SearchResult, StatsResponse
+from app.services.ingestion import IngestionJob, IngestionWorker
 from app.services.llm_service import LLMService
-from app.services.news_fetcher import NewsFetcher
 from app.services.rag_service import RAGService
-from app.services.storage import ArticleStorage
+from app.services.retention import Compactor
+from app.services.registry import get_compactor, get_ingestion_worker, get_llm_service, get_rag_service, get_storage, registry
+from app.services.storage import ARTICLE_COLUMNS, ArticleStorage, decode_cursor
+
+from app.metrics import rag_query_latency, rag_queries
 
-from app.metrics import articles_fetched, articles_stored, llm_api_latency, rag_query_latency, rag_queries
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    ## build the embedding model, vector store and llm client once per process,
+    ## in the background so the server listens right away and /readyz gates traffic
+    registry.start_background()
+    yield
+    registry.shutdown()
 
-app = FastAPI(title="AI News Research Assistant",description="An application that leverages LLMs and RAG to provide answers based on the latest news articles.",version="1.0.0")
+app = FastAPI(lifespan=lifespan,title="AI News Research Assistant",description="An application that leverages LLMs and RAG to provide answers based on the latest news articles.",version="1.0.0")
 
 ## add cors middleware if needed
 app.add_middleware(
@@ -20,6 +38,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 ## add prometheus instrumentation]
@@ -35,51 +54,54 @@ instrumentator = Instrumentator(
 )
 instrumentator.instrument(app).expose(app,endpoint="/metrics")
 
-## intialize services
-news_fetcher = NewsFetcher()
-storage = ArticleStorage(storage_path="../data/storage.json")
-rag_service = RAGService()
-llm_service = LLMService()
-
 @app.get("/")
-def root():
+async def root():
     return {"message": "Welcome to the AI News Research Assistant API!", "version": "1.0.0", "status": "running"}
 
+@app.get("/healthz")
+async def healthz():
+    ## liveness: the process is up and serving, independent of the model loading
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    if not registry.ready:
+        raise HTTPException(status_code=503, detail={"status": registry.status, "error": registry.startup_error})
+    return {"status": registry.status}
+
 @app.get("/stats",response_model=StatsResponse)
-def get_status():
-    rag_stas = rag_service.get_status()
-    storage_stats = storage.get_stats()
+async def get_status(rag_service: RAGService = Depends(get_rag_service), storage: ArticleStorage = Depends(get_storage)):
+    rag_stas, storage_stats = await asyncio.gather(rag_service.aget_status(), asyncio.to_thread(storage.get_stats))
     return{
         "total_articles_in_rag": rag_stas['total_documents'],
         "total_articles_in_vectordb": storage_stats
     }
 
-@app.post("/fetch-news",response_model=list[ArticleResponse])
-def fetch_news(request: FetchNewsRequest):
-    articles =news_fetcher.fetch_news(query=request.query, country=request.country, category=request.category, page_size=request.page_size,page=request.page)
-    print("length of articles fetched:",len(articles))
-    if not articles:
-        print("No articles fetched from the news API.")
-        raise HTTPException(status_code=404, detail="No articles found for the given parameters.")
-    
-    articles_fetched.labels(source="newsapi",category=request.category).inc(len(articles))
-    ## save to storage 
-    saved_articles_len = storage.write_articles(articles)
-    articles_stored.inc(saved_articles_len)
-    ## save to vector db
-    rag_service.add_articles(articles)
-
-    ## convert to response model
-    response_articles = [ArticleResponse(**article.to_dict()) for article in articles]
-    return response_articles
+@app.post("/fetch-news",response_model=JobSubmittedResponse,status_code=202)
+async def fetch_news(request: FetchNewsRequest, ingestion_worker: IngestionWorker = Depends(get_ingestion_worker)):
+    ## ingestion runs in the background, the client polls /jobs/{job_id}
+    job = IngestionJob(query=request.query, country=request.country, category=request.category, page_size=request.page_size, page=request.page)
+    try:
+        ingestion_worker.submit(job)
+    except queue.Full:
+        raise HTTPException(status_code=503, detail="Ingestion queue is full, try again later.")
+    return JobSubmittedResponse(job_id=job.id, status=job.status)
+
+@app.get("/jobs/{job_id}",response_model=JobStatusResponse)
+async def get_job(job_id: str, ingestion_worker: IngestionWorker = Depends(get_ingestion_worker)):
+    job = ingestion_worker.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return JobStatusResponse(**job.to_dict())
 
 @app.post("/search",response_model=SearchResponse)
-def search_articles(request: SearchRequest):
+async def search_articles(request: SearchRequest, rag_service: RAGService = Depends(get_rag_service)):
     try:
         rag_queries.labels(query_type='search').inc(1)
-        start_time = time.time()
-        results = rag_service.search_articles(query=request.query,top_k=request.top_k)
-        end_time = time.time()
+        start_time = time.perf_counter()
+        results = await rag_service.asearch_articles(query=request.query,top_k=request.top_k,mode=request.mode,
+                                                     filters=request.filters(),recency_half_life_hours=request.recency_half_life_hours)
+        end_time = time.perf_counter()
         duration = end_time - start_time
         rag_query_latency.labels(query_type='search').observe(duration)
         formatted_results = [
@@ -104,33 +126,99 @@ def search_articles(request: SearchRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/ask",response_model=QuestionResponse)
-def ask_question(request: QuestionRequest):
+async def ask_question(request: QuestionRequest, llm_service: LLMService = Depends(get_llm_service)):
     try:
-        start_time = time.time()
-        result = llm_service.ask_question(question=request.question,top_k=request.top_k)
-        end_time = time.time()
+        rag_queries.labels(query_type='qa').inc(1)
+        start_time = time.perf_counter()
+        result = await llm_service.aask_question(question=request.question,top_k=request.top_k,
+                                                 filters=request.filters(),recency_half_life_hours=request.recency_half_life_hours)
+        end_time = time.perf_counter()
         duration = end_time - start_time
         rag_query_latency.labels(query_type='qa').observe(duration)
         return QuestionResponse(**result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/ask/stream")
+async def ask_question_stream(request: QuestionRequest, llm_service: LLMService = Depends(get_llm_service)):
+    ## server-sent events: sources first, then answer tokens as they arrive
+    async def event_stream():
+        rag_queries.labels(query_type='qa_stream').inc(1)
+        start_time = time.perf_counter()
+        try:
+            async for event in llm_service.astream_answer(question=request.question, top_k=request.top_k,
+                                                          filters=request.filters(), recency_half_life_hours=request.recency_half_life_hours):
+                yield f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+            rag_query_latency.labels(query_type='qa_stream').observe(time.perf_counter() - start_time)
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps(str(e))}\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.post("/ask/batch")
+async def ask_questions_batch(request: BatchQuestionRequest, llm_service: LLMService = Depends(get_llm_service)):
+    ## newline-delimited json, one answer per line in completion order, each with the index of its question
+    async def answer_stream():
+        rag_queries.labels(query_type='qa_batch').inc(len(request.questions))
+        start_time = time.perf_counter()
+        try:
+            async for answer in llm_service.aask_batch(questions=request.questions, top_k=request.top_k,
+                                                       filters=request.filters(), recency_half_life_hours=request.recency_half_life_hours):
+                yield json.dumps(answer) + "\n"
+            rag_query_latency.labels(query_type='qa_batch').observe(time.perf_counter() - start_time)
+        except Exception as e:
+            yield json.dumps({"error": str(e)}) + "\n"
+
+    return StreamingResponse(answer_stream(), media_type="application/x-ndjson", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+## rows are serialized straight from sqlite with orjson, ArticleResponse only documents the shape
+ARTICLE_RESPONSE_COLUMNS = tuple(ArticleResponse.model_fields)
 
 @app.get("/articles",response_model=list[ArticleResponse])
-def get_all_articles(limit: int =10):
+async def get_all_articles(limit: int = Query(10, ge=1, le=1000), cursor: Optional[str] = None,
+                           offset: int = Query(0, ge=0, deprecated=True, description="Use the X-Next-Cursor header instead"),
+                           storage: ArticleStorage = Depends(get_storage)):
+    ## pages are newest first, the X-Next-Cursor response header is the cursor of the next page
     try:
-        articles = storage.read_articles()
-        articles = articles[:limit]
-        response = [ArticleResponse(**article.to_dict()) for article in articles]
-        return response
+        if cursor is not None:
+            decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        ## a cursor wins over the deprecated offset
+        rows, next_cursor = await asyncio.to_thread(storage.read_page, limit, cursor=cursor, columns=ARTICLE_RESPONSE_COLUMNS,
+                                                    offset=offset if cursor is None else 0)
+        return Response(content=orjson.dumps(rows), media_type="application/json",
+                        headers={"X-Next-Cursor": next_cursor} if next_cursor else None)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/articles/export")
+async def export_articles(storage: ArticleStorage = Depends(get_storage)):
+    ## the whole corpus as NDJSON, one article per line. The sync generator runs in
+    ## starlette's threadpool and holds one batch at a time, whatever the corpus size
+    def ndjson():
+        for rows in storage.iter_rows(columns=ARTICLE_COLUMNS):
+            yield b"".join(orjson.dumps(row) + b"\n" for row in rows)
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson",
+                             headers={"Content-Disposition": 'attachment; filename="articles.ndjson"'})
     
+@app.post("/archive/rehydrate",response_model=RehydrateResponse)
+async def rehydrate_archive(request: RehydrateRequest, compactor: Compactor = Depends(get_compactor)):
+    if compactor.archive is None:
+        raise HTTPException(status_code=404, detail="The cold archive is not enabled, set RETENTION_ARCHIVE_PATH.")
+    try:
+        restored = await asyncio.to_thread(compactor.rehydrate, request.start_date, request.end_date)
+        return RehydrateResponse(restored=restored)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.delete("/clear")
-def clear_all_data():
+async def clear_all_data(storage: ArticleStorage = Depends(get_storage), rag_service: RAGService = Depends(get_rag_service)):
     try:
-        storage.clear_storage()
-        rag_service.clear_storage()
+        await asyncio.to_thread(storage.clear_storage)
+        await rag_service.aclear_storage()
         print("Cleared all data from storage and vector DB.")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,102 @@
+import sys
+sys.path.append("../../")
+
+import asyncio
+import os
+import tempfile
+import time
+
+import chromadb
+import numpy as np
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+
+TMP_DIR = tempfile.mkdtemp(prefix="bench_ask_batch_")
+os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(TMP_DIR, "embedding_cache.sqlite3")
+os.environ["LEXICAL_INDEX_PATH"] = os.path.join(TMP_DIR, "lexical_index.sqlite3")
+os.environ["NEAR_DUPLICATE_ENABLED"] = "false"
+os.environ["QUERY_BATCHING_ENABLED"] = "false"
+os.environ.setdefault("LLM_BATCH_CONCURRENCY", "8")
+
+from app.models import Article
+from app.services.llm_service import LLMService
+from app.services.rag_service import RAGService
+from app.services.rate_limiter import TokenRateLimiter
+
+## Wall time of answering 50 questions one /ask at a time against one
+## /ask/batch call (LLMService.aask_batch). The embedder charges a fixed cost
+## per forward pass plus a per-text cost, and the LLM is a stub that sleeps
+## for LLM_LATENCY seconds, so no Groq key is needed. The batch is also run
+## under a tokens-per-minute budget to show the limiter at work.
+
+NUM_QUESTIONS = 50
+NUM_ARTICLES = 2_000
+LLM_LATENCY = 0.5
+FORWARD_PASS_SECONDS = 0.02
+PER_TEXT_SECONDS = 0.001
+
+
+class StubEmbedder:
+    def encode(self, texts, batch_size=32, convert_to_numpy=True):
+        time.sleep(FORWARD_PASS_SECONDS + PER_TEXT_SECONDS * len(texts))
+        rng = np.random.default_rng(abs(hash(tuple(texts))) % (2 ** 32))
+        return rng.random((len(texts), 384), dtype=np.float32)
+
+
+async def stub_llm(prompt):
+    await asyncio.sleep(LLM_LATENCY)
+    return AIMessage(content="Stub answer citing the stub source.")
+
+
+articles = [Article(title=f"Headline {i}", description=f"Description {i}", content=f"Content of article {i} about topic {i % 25}",
+                    url=f"https://bench.local/{i}", source_name=f"source-{i % 10}", published_at="2025-01-01T00:00:00Z")
+            for i in range(NUM_ARTICLES)]
+rag = RAGService(db_path=os.path.join(TMP_DIR, "chroma"), embedding_model=StubEmbedder(), client=chromadb.EphemeralClient())
+rag.add_articles(articles)
+questions = [f"What happened with topic {i}?" for i in range(NUM_QUESTIONS)]
+llm = RunnableLambda(lambda prompt: asyncio.run(stub_llm(prompt)), afunc=stub_llm)
+
+
+async def sequential(llm_service):
+    for question in questions:
+        await llm_service.aask_question(question)
+
+
+async def batch(llm_service):
+    first = None
+    start = time.perf_counter()
+    answers = []
+    async for answer in llm_service.aask_batch(questions):
+        first = first or time.perf_counter() - start
+        answers.append(answer)
+    assert sorted(answer["index"] for answer in answers) == list(range(NUM_QUESTIONS))
+    assert not [answer for answer in answers if "error" in answer]
+    return first
+
+
+async def main():
+    ## a fresh service per run, the semantic answer cache would serve the repeats
+    start = time.perf_counter()
+    await sequential(LLMService(rag_service=rag, llm=llm))
+    sequential_seconds = time.perf_counter() - start
+    ## the batch has to pay for its own question embeddings
+    rag.embedding_cache.clear()
+
+    start = time.perf_counter()
+    first = await batch(LLMService(rag_service=rag, llm=llm))
+    batch_seconds = time.perf_counter() - start
+
+    print(f"{NUM_QUESTIONS} questions, llm latency {LLM_LATENCY*1000:.0f}ms, concurrency {os.environ['LLM_BATCH_CONCURRENCY']}")
+    print(f"sequential /ask   {sequential_seconds:6.2f}s")
+    print(f"/ask/batch        {batch_seconds:6.2f}s  first answer after {first:.2f}s  ({sequential_seconds / batch_seconds:.1f}x)")
+
+    limited = LLMService(rag_service=rag, llm=llm)
+    ## most but not all of the reserved prompt + answer tokens fit in the bucket
+    limited.token_limiter = TokenRateLimiter(tokens_per_minute=100_000)
+    rag.embedding_cache.clear()
+    start = time.perf_counter()
+    await batch(limited)
+    print(f"/ask/batch at 100k tokens/min {time.perf_counter() - start:6.2f}s")
+
+
+asyncio.run(main())
@@ -0,0 +1,60 @@
+import sys
+sys.path.append("../../")
+
+import statistics
+import time
+
+from app.models import Article
+from app.services.rag_service import RAGService
+
+## Compares the retrieval part of /ask when a new RAGService is built per question
+## (old behaviour) against a single shared RAGService (service registry).
+## The Groq call is identical in both cases, so it is left out of the measurement.
+
+DB_PATH = "../data/bench_chroma_db"
+QUESTIONS = [
+    "What are the latest advancements in artificial intelligence?",
+    "How is climate change impacting global weather patterns?",
+    "What are the recent highlights in the world of sports?",
+]
+ROUNDS = 10
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def report(name, latencies):
+    print(f"{name:<28} p50={statistics.median(latencies)*1000:9.1f}ms  p99={percentile(latencies, 99)*1000:9.1f}ms  n={len(latencies)}")
+
+
+def seed(rag):
+    articles = [
+        Article(title=f"Synthetic headline {i}", description=f"Description {i}", content=f"Body of article {i} about AI, sport and climate.",
+                url=f"https://example.com/article/{i}", source_name="bench", published_at="2025-01-01T00:00:00Z")
+        for i in range(50)
+    ]
+    rag.add_articles(articles)
+
+
+shared = RAGService(db_path=DB_PATH)
+seed(shared)
+
+per_request = []
+for _ in range(ROUNDS):
+    for question in QUESTIONS:
+        start = time.perf_counter()
+        RAGService(db_path=DB_PATH).search_articles(query=question, top_k=5)
+        per_request.append(time.perf_counter() - start)
+
+shared_latencies = []
+for _ in range(ROUNDS):
+    for question in QUESTIONS:
+        start = time.perf_counter()
+        shared.search_articles(query=question, top_k=5)
+        shared_latencies.append(time.perf_counter() - start)
+
+report("before (RAGService per /ask)", per_request)
+report("after (shared registry)", shared_latencies)
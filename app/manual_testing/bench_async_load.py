@@ -0,0 +1,98 @@
+import sys
+sys.path.append("../../")
+
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+import chromadb
+import httpx
+import numpy as np
+from langchain_core.runnables import RunnableLambda
+
+## Load test of /search and /ask with a stubbed embedder and LLM, reporting
+## throughput and latency at 1/16/64/256 concurrent clients. The stubs sleep to
+## model the real costs: encode is CPU-like (blocking), the LLM is I/O (async).
+
+TMP_DIR = tempfile.mkdtemp(prefix="bench_async_")
+os.environ.setdefault("NEWS_API_KEY", "stub")
+os.environ.setdefault("GROQ_API_KEY", "stub")
+os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(TMP_DIR, "embedding_cache.sqlite3")
+## never serve answers from the semantic cache during the load test
+os.environ["ANSWER_CACHE_THRESHOLD"] = "2"
+
+from app.main import app
+from app.models import Article
+from app.services.llm_service import LLMService
+from app.services.rag_service import RAGService
+from app.services.registry import registry
+from app.services.storage import ArticleStorage
+
+CONCURRENCY_LEVELS = [1, 16, 64, 256]
+REQUESTS_PER_LEVEL = 256
+ENCODE_SECONDS = 0.005
+LLM_SECONDS = 0.5
+
+
+class StubEmbedder:
+    def encode(self, texts, batch_size=32, convert_to_numpy=True):
+        time.sleep(ENCODE_SECONDS)
+        rng = np.random.default_rng(abs(hash(tuple(texts))) % (2 ** 32))
+        return rng.random((len(texts), 384), dtype=np.float32)
+
+
+def _stub_llm(prompt):
+    time.sleep(LLM_SECONDS)
+    return "stub answer"
+
+
+async def _astub_llm(prompt):
+    await asyncio.sleep(LLM_SECONDS)
+    return "stub answer"
+
+
+def start_stub_services():
+    rag_service = RAGService(db_path=os.path.join(TMP_DIR, "chroma"), embedding_model=StubEmbedder(), client=chromadb.EphemeralClient())
+    rag_service.add_articles([
+        Article(title=f"Headline {i}", description=f"Description {i}", content=f"Content {i}",
+                url=f"https://stub.local/{i}", source_name="stub", published_at="2025-01-01T00:00:00Z")
+        for i in range(200)
+    ])
+    registry.rag_service = rag_service
+    registry.storage = ArticleStorage(storage_path=os.path.join(TMP_DIR, "articles.db"))
+    registry.llm_service = LLMService(rag_service=rag_service, llm=RunnableLambda(_stub_llm, afunc=_astub_llm))
+
+
+async def run_level(client, path, concurrency):
+    latencies = []
+    counter = iter(range(REQUESTS_PER_LEVEL))
+
+    async def worker():
+        for i in counter:
+            body = {"query": f"query {concurrency} {i}", "top_k": 5} if path == "/search" else {"question": f"question {concurrency} {i}", "top_k": 5}
+            start = time.perf_counter()
+            response = await client.post(path, json=body)
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    duration = time.perf_counter() - start
+    latencies.sort()
+    print(f"{path:<8} clients={concurrency:<4} {len(latencies)/duration:8.1f} req/s  "
+          f"p50={statistics.median(latencies)*1000:8.1f}ms  p99={latencies[int(0.99*(len(latencies)-1))]*1000:8.1f}ms")
+
+
+async def main():
+    start_stub_services()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for path in ["/search", "/ask"]:
+            for concurrency in CONCURRENCY_LEVELS:
+                await run_level(client, path, concurrency)
+    registry.shutdown()
+
+
+asyncio.run(main())
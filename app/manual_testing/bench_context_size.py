@@ -0,0 +1,71 @@
+import sys
+sys.path.append("../../")
+
+import json
+import os
+import statistics
+import tempfile
+import time
+
+import chromadb
+
+TMP_DIR = tempfile.mkdtemp(prefix="bench_context_")
+os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(TMP_DIR, "embedding_cache.sqlite3")
+os.environ["LEXICAL_INDEX_PATH"] = os.path.join(TMP_DIR, "lexical_index.sqlite3")
+os.environ["NEAR_DUPLICATE_INDEX_PATH"] = os.path.join(TMP_DIR, "near_duplicates.sqlite3")
+## every question must reach the LLM
+os.environ["ANSWER_CACHE_THRESHOLD"] = "2"
+
+from app.models import Article
+from app.services.context_builder import estimate_tokens
+from app.services.llm_service import LLMService
+from app.services.rag_service import RAGService
+
+## Answer latency against context size on the relevance fixture corpus, using
+## the real Groq model (needs GROQ_API_KEY). Each context token budget is
+## compared with the old behaviour of sending every retrieved article in full.
+
+FIXTURE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "relevance_corpus.json")
+TOKEN_BUDGETS = [250, 500, 1000, 2000, 4000]
+
+with open(FIXTURE_PATH, 'r', encoding='utf-8') as f:
+    fixture = json.load(f)
+
+articles = [Article(title=a['title'], description=a['description'], content=a['content'], url=a['url'],
+                    source_name=a['source_name'], published_at=a['published_at'], author=a['author'])
+            for a in fixture['articles']]
+rag = RAGService(db_path=os.path.join(TMP_DIR, "chroma"), client=chromadb.EphemeralClient())
+rag.add_articles(articles)
+llm_service = LLMService(rag_service=rag)
+questions = [item['query'] for item in fixture['queries']]
+
+
+def full_context(search_results):
+    return "\n".join(f"Article {i+1} Title: {result['title']}\nContent: {result['content']}\nSource: {result['source_name']}\nURL: {result['url']}\n"
+                     for i, result in enumerate(search_results))
+
+
+def run(label, budget):
+    prompt_tokens, build_times, latencies = [], [], []
+    for question in questions:
+        start = time.perf_counter()
+        search_results = rag.search_articles(question, top_k=5)
+        question_embedding = rag.embed([question])[0]
+        build_start = time.perf_counter()
+        if budget is None:
+            context = full_context(search_results)
+        else:
+            llm_service.context_builder.token_budget = budget
+            passages = rag.search_passages(question_embedding, [result['id'] for result in search_results])
+            context = llm_service._build_context(question, question_embedding, search_results, passages, build_start)
+        build_times.append(time.perf_counter() - build_start)
+        prompt_tokens.append(estimate_tokens(llm_service.prompt_template.format(context=context, question=question)))
+        (llm_service.prompt_template | llm_service.llm).invoke({"context": context, "question": question})
+        latencies.append(time.perf_counter() - start)
+    print(f"{label:<12} prompt tokens={statistics.mean(prompt_tokens):>6.0f}  context build={statistics.median(build_times)*1000:>6.1f}ms  "
+          f"answer p50={statistics.median(latencies):.2f}s  max={max(latencies):.2f}s")
+
+
+run("full", None)
+for budget in TOKEN_BUDGETS:
+    run(f"budget {budget}", budget)
@@ -0,0 +1,110 @@
+import sys
+sys.path.append("../../")
+
+import json
+import os
+import shutil
+import time
+import tracemalloc
+
+import numpy as np
+
+from app.models import Article
+from app.services.corpus_snapshot import CorpusSnapshot, write_snapshot
+
+## Memory per 100k articles and full-scan time of
+##   - the JSON-backed objects bulk jobs used to build (storage.json loaded
+##     into dict-backed Articles that rebuild their full text on every call),
+##   - the same JSON loaded into today's slotted Articles with cached full text,
+##   - the memory-mapped columnar snapshot (app/services/corpus_snapshot.py).
+## The scan counts the articles mentioning a keyword and sums the full text
+## size, what a stats or reindex pass touches. Memory is the python heap as
+## seen by tracemalloc; the snapshot lives in the page cache instead.
+
+DATA_DIR = "../data/bench_corpus_snapshot"
+NUM_ARTICLES = 100_000
+DIM = 384
+KEYWORD = "election"
+FULL_TEXT_FIELDS = ("title", "description", "content", "url", "source_name", "published_at", "author")
+## the "Title: ", "Description: " ... labels and the newlines get_full_text() adds around the fields
+FULL_TEXT_OVERHEAD = len("\n".join(f"{label}: " for label in ("Title", "Description", "Content", "URL", "Source", "Published At", "Author")))
+
+
+class DictArticle:
+    ## the Article class before __slots__, kept here as the baseline
+    def __init__(self, title, description, content, url, source_name, published_at, author=None, category=None):
+        self.title = title
+        self.description = description
+        self.content = content
+        self.url = url
+        self.source_name = source_name
+        self.published_at = published_at
+        self.author = author
+        self.category = category
+        self.id = Article.id_for_url(url)
+
+    def get_full_text(self):
+        return "\n".join([f"Title: {self.title}", f"Description: {self.description}", f"Content: {self.content}", f"URL: {self.url}",
+                          f"Source: {self.source_name}", f"Published At: {self.published_at}", f"Author: {self.author}"]).strip()
+
+
+def synthetic_rows(n):
+    return [{"id": Article.id_for_url(f"https://example.com/bench/{i}"), "title": f"Synthetic headline {i}", "description": f"Description {i}",
+             "content": f"Body of synthetic article {i} about the {KEYWORD if i % 10 == 0 else 'market'}. " * 10,
+             "url": f"https://example.com/bench/{i}", "source_name": f"source-{i % 25}", "published_at": f"2025-01-{1 + i % 28:02d}T00:00:00Z",
+             "author": "bench", "category": "business"} for i in range(n)]
+
+
+def load_json(cls):
+    with open(json_path, "r", encoding="utf-8") as f:
+        return [cls(**{key: value for key, value in row.items() if key != "id"}) for row in json.load(f)]
+
+
+def scan_objects(articles):
+    return sum(KEYWORD in article.content for article in articles), sum(len(article.get_full_text()) for article in articles)
+
+
+def scan_snapshot(snapshot):
+    ## the synthetic text is ascii, byte lengths are character lengths
+    size = sum(int(snapshot[column].lengths().sum()) for column in FULL_TEXT_FIELDS)
+    return len(snapshot["content"].contains(KEYWORD)), size + FULL_TEXT_OVERHEAD * len(snapshot)
+
+
+def measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - start
+    current = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, seconds, current / 2**20
+
+
+shutil.rmtree(DATA_DIR, ignore_errors=True)
+os.makedirs(DATA_DIR)
+rows = synthetic_rows(NUM_ARTICLES)
+json_path = os.path.join(DATA_DIR, "storage.json")
+with open(json_path, "w", encoding="utf-8") as f:
+    json.dump(rows, f)
+vectors = np.random.default_rng(0).random((NUM_ARTICLES, DIM), dtype=np.float32)
+embeddings = dict(zip((row["id"] for row in rows), vectors))
+snapshot_path = os.path.join(DATA_DIR, "snapshot")
+write_snapshot(snapshot_path, (rows[start:start+1000] for start in range(0, NUM_ARTICLES, 1000)),
+               embeddings_for=lambda ids: {article_id: embeddings[article_id] for article_id in ids})
+del rows, embeddings, vectors
+snapshot_mb = sum(entry.stat().st_size for entry in os.scandir(snapshot_path)) / 2**20
+
+print(f"{NUM_ARTICLES} articles, snapshot on disk {snapshot_mb:.0f}MB (of which {NUM_ARTICLES * DIM * 4 / 2**20:.0f}MB {DIM}d embeddings)")
+for name, cls in (("dict-backed Article", DictArticle), ("slotted Article", Article)):
+    articles, load_seconds, heap_mb = measure(lambda: load_json(cls))
+    (first, first_seconds, _), (second, second_seconds, _) = measure(lambda: scan_objects(articles)), measure(lambda: scan_objects(articles))
+    print(f"{name:<20} load {load_seconds:6.2f}s  heap {heap_mb:7.1f}MB  scan {first_seconds:6.3f}s  rescan {second_seconds:6.3f}s")
+    del articles
+
+snapshot, load_seconds, heap_mb = measure(lambda: CorpusSnapshot(snapshot_path))
+(result, first_seconds, _), (_, second_seconds, _) = measure(lambda: scan_snapshot(snapshot)), measure(lambda: scan_snapshot(snapshot))
+print(f"{'columnar snapshot':<20} load {load_seconds:6.2f}s  heap {heap_mb:7.1f}MB  scan {first_seconds:6.3f}s  rescan {second_seconds:6.3f}s")
+assert result == first == second, (result, first)
+snapshot.close()
+
+shutil.rmtree(DATA_DIR, ignore_errors=True)
@@ -0,0 +1,45 @@
+import sys
+sys.path.append("../../")
+
+import resource
+import subprocess
+import time
+
+## Compares the embedding backends on cold-load time, encode throughput and
+## peak RSS. Each backend runs in its own process so RSS and import costs
+## are not shared: `python bench_embedding_backends.py` runs them all.
+
+BACKENDS = ["torch", "onnx", "onnx-int8"]
+NUM_TEXTS = 2000
+BATCH_SIZE = 64
+
+
+def peak_rss_mb():
+    ## ru_maxrss is reported in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run(backend_label):
+    start = time.perf_counter()
+    from app.config import Config
+    from app.services.embedding_backends import OnnxEmbeddingBackend, TorchEmbeddingBackend
+    model_name = Config().embedding_model
+    if backend_label == "torch":
+        backend = TorchEmbeddingBackend(model_name)
+    else:
+        backend = OnnxEmbeddingBackend(model_name, quantized=backend_label == "onnx-int8")
+    backend.encode(["warm up"])
+    load_seconds = time.perf_counter() - start
+
+    texts = [f"Synthetic headline {i}. A short description of synthetic news article number {i} about markets and sports." for i in range(NUM_TEXTS)]
+    start = time.perf_counter()
+    backend.encode(texts, batch_size=BATCH_SIZE)
+    duration = time.perf_counter() - start
+    print(f"{backend_label:<10} cold load={load_seconds:5.1f}s  throughput={NUM_TEXTS/duration:7.0f} texts/sec  peak RSS={peak_rss_mb():5.0f} MB")
+
+
+if len(sys.argv) > 1:
+    run(sys.argv[1])
+else:
+    for backend_label in BACKENDS:
+        subprocess.run([sys.executable, __file__, backend_label], check=True)
@@ -0,0 +1,76 @@
+import sys
+sys.path.append("../../")
+
+import json
+import os
+import shutil
+import time
+import tracemalloc
+
+from app.models import Article
+from app.schemas import ArticleResponse
+from app.services.storage import ARTICLE_COLUMNS, ArticleStorage
+
+import orjson
+
+## Exporting 100k stored articles the old way (read every row into an Article,
+## validate an ArticleResponse per row, json.dumps the list) against the
+## streamed /articles/export path (keyset batches of raw rows, orjson per row).
+## Also compares a deep /articles page by offset against the same page by
+## cursor. Peak memory is the python heap as seen by tracemalloc.
+
+DATA_DIR = "../data/bench_export"
+NUM_ARTICLES = 100_000
+PAGE_SIZE = 100
+
+
+def synthetic_articles(n):
+    return [
+        Article(title=f"Synthetic headline {i}", description=f"Description {i}", content=f"Body of synthetic article {i}. " * 10,
+                url=f"https://example.com/bench/{i}", source_name=f"source-{i % 25}",
+                published_at=f"2025-01-{1 + i % 28:02d}T{i % 24:02d}:00:00Z", author="bench", category="technology")
+        for i in range(n)
+    ]
+
+
+def measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = fn()
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak / 2**20, size
+
+
+def export_pydantic():
+    articles = storage.read_articles()
+    return len(json.dumps([ArticleResponse(**article.to_dict()).model_dump() for article in articles]))
+
+
+def export_stream():
+    ## what the client receives, chunk by chunk
+    return sum(len(b"".join(orjson.dumps(row) + b"\n" for row in rows)) for rows in storage.iter_rows(columns=ARTICLE_COLUMNS))
+
+
+def deep_offset():
+    return len(storage.read_articles(limit=PAGE_SIZE, offset=NUM_ARTICLES - 2 * PAGE_SIZE))
+
+
+shutil.rmtree(DATA_DIR, ignore_errors=True)
+storage = ArticleStorage(storage_path=os.path.join(DATA_DIR, "articles.db"))
+storage.save_articles(synthetic_articles(NUM_ARTICLES))
+
+for name, fn in (("pydantic + json.dumps", export_pydantic), ("streamed orjson", export_stream)):
+    seconds, peak_mb, size = measure(fn)
+    print(f"export {name:<22} {seconds:6.2f}s  peak heap {peak_mb:7.1f}MB  {size / 2**20:.0f}MB of json")
+
+## walk to the same deep page by cursor, then time fetching it
+cursor = None
+for _ in range(NUM_ARTICLES // PAGE_SIZE - 2):
+    _, cursor = storage.read_page(PAGE_SIZE, cursor=cursor)
+offset_ms = measure(deep_offset)[0] * 1000
+cursor_ms = measure(lambda: storage.read_page(PAGE_SIZE, cursor=cursor))[0] * 1000
+print(f"page {NUM_ARTICLES // PAGE_SIZE - 1} of {NUM_ARTICLES // PAGE_SIZE}  offset: {offset_ms:6.1f}ms  cursor: {cursor_ms:6.1f}ms")
+
+shutil.rmtree(DATA_DIR, ignore_errors=True)
@@ -0,0 +1,59 @@
+import sys
+sys.path.append("../../")
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sentence_transformers import SentenceTransformer
+
+from app.config import Config
+from app.services.embedding_batcher import EmbeddingBatcher
+
+## Query embedding QPS for concurrent callers, one encode per query on the
+## embedding executor versus the dynamic micro-batcher.
+
+CONCURRENCY_LEVELS = [1, 8, 32, 128]
+QUERIES_PER_LEVEL = 512
+WORKERS = 2
+
+config = Config()
+model = SentenceTransformer(config.embedding_model)
+executor = ThreadPoolExecutor(max_workers=WORKERS)
+
+
+def encode(texts):
+    return model.encode(texts, batch_size=len(texts), convert_to_numpy=True)
+
+
+async def run(embed_one, concurrency):
+    queries = iter(f"what happened in story number {i} today?" for i in range(QUERIES_PER_LEVEL))
+
+    async def worker():
+        for query in queries:
+            await embed_one(query)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return QUERIES_PER_LEVEL / (time.perf_counter() - start)
+
+
+async def main():
+    loop = asyncio.get_running_loop()
+    batcher = EmbeddingBatcher(encode, executor, max_batch_size=config.query_batch_max_size,
+                               max_wait_ms=config.query_batch_max_wait_ms, max_concurrent_batches=WORKERS)
+
+    async def unbatched(query):
+        return (await loop.run_in_executor(executor, encode, [query]))[0]
+
+    ## warm up the model
+    encode(["warm up"])
+    for concurrency in CONCURRENCY_LEVELS:
+        direct_qps = await run(unbatched, concurrency)
+        batched_qps = await run(batcher.embed, concurrency)
+        print(f"clients={concurrency:<4} unbatched={direct_qps:8.1f} qps  batched={batched_qps:8.1f} qps  speedup={batched_qps/direct_qps:4.1f}x")
+    await batcher.close()
+
+
+asyncio.run(main())
+executor.shutdown()
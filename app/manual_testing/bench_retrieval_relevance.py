@@ -0,0 +1,51 @@
+import sys
+sys.path.append("../../")
+
+import json
+import os
+import statistics
+import tempfile
+import time
+
+import chromadb
+
+TMP_DIR = tempfile.mkdtemp(prefix="bench_relevance_")
+os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(TMP_DIR, "embedding_cache.sqlite3")
+os.environ["LEXICAL_INDEX_PATH"] = os.path.join(TMP_DIR, "lexical_index.sqlite3")
+
+from app.models import Article
+from app.services.rag_service import RAGService
+
+## Offline relevance benchmark on a small fixture corpus: recall@k and query
+## latency for dense, lexical (BM25) and hybrid (reciprocal-rank fusion) retrieval.
+
+FIXTURE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "relevance_corpus.json")
+K_VALUES = [1, 3, 5]
+
+with open(FIXTURE_PATH, 'r', encoding='utf-8') as f:
+    fixture = json.load(f)
+
+articles = [Article(title=a['title'], description=a['description'], content=a['content'], url=a['url'],
+                    source_name=a['source_name'], published_at=a['published_at'], author=a['author'])
+            for a in fixture['articles']]
+## the fixture refers to articles by name, the service by id
+fixture_id_by_article_id = {article.id: a['id'] for article, a in zip(articles, fixture['articles'])}
+
+rag = RAGService(db_path=os.path.join(TMP_DIR, "chroma"), client=chromadb.EphemeralClient())
+rag.add_articles(articles)
+
+for mode in ["dense", "lexical", "hybrid"]:
+    recalls = {k: [] for k in K_VALUES}
+    latencies = []
+    for item in fixture['queries']:
+        start = time.perf_counter()
+        results = rag.search_articles(item['query'], top_k=max(K_VALUES), mode=mode)
+        latencies.append(time.perf_counter() - start)
+        retrieved = [fixture_id_by_article_id[result['id']] for result in results]
+        relevant = set(item['relevant'])
+        for k in K_VALUES:
+            recalls[k].append(len(relevant & set(retrieved[:k])) / len(relevant))
+    recall_report = "  ".join(f"recall@{k}={statistics.mean(recalls[k]):.2f}" for k in K_VALUES)
+    print(f"{mode:<8} {recall_report}  p50 latency={statistics.median(latencies)*1000:.1f}ms")
+
+rag.close()
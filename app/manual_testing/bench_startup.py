@@ -0,0 +1,96 @@
+import sys
+sys.path.append("../../")
+
+import os
+import socket
+import subprocess
+import time
+
+import httpx
+
+## Import-time and cold-start budget check. Imports app.main under
+## `python -X importtime` and fails when the import takes longer than the
+## budget or pulls in one of the heavy libraries that must stay lazy, then
+## starts uvicorn and measures the time until /healthz and /readyz answer.
+## Exits non-zero on a budget regression.
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+IMPORT_BUDGET_SECONDS = float(os.getenv("IMPORT_BUDGET_SECONDS", 2.0))
+HEALTHZ_BUDGET_SECONDS = float(os.getenv("HEALTHZ_BUDGET_SECONDS", 5.0))
+READYZ_TIMEOUT_SECONDS = float(os.getenv("READYZ_TIMEOUT_SECONDS", 120.0))
+LAZY_MODULES = ["torch", "sentence_transformers", "chromadb", "langchain_groq", "langchain_core", "opentelemetry.sdk"]
+
+env = {**os.environ, "PYTHONPATH": REPO_ROOT}
+env.setdefault("NEWS_API_KEY", "stub")
+env.setdefault("GROQ_API_KEY", "stub")
+
+
+def import_times():
+    """Return {module: cumulative seconds} from `python -X importtime -c 'import app.main'`."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app.main"],
+                            cwd=REPO_ROOT, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        print(result.stderr[-2000:])
+        raise SystemExit("import app.main failed")
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = [part.strip() for part in line[len("import time:"):].split("|")]
+        times[module.strip()] = int(cumulative) / 1e6
+    return times
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(url, timeout, start):
+    """Seconds from `start` until url answers 200, None on timeout."""
+    while time.perf_counter() - start < timeout:
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return time.perf_counter() - start
+        except httpx.TransportError:
+            pass
+        time.sleep(0.05)
+    return None
+
+
+failures = []
+
+times = import_times()
+total = times.get("app.main", 0.0)
+print(f"import app.main: {total:.2f}s (budget {IMPORT_BUDGET_SECONDS:.2f}s)")
+for module, seconds in sorted(times.items(), key=lambda item: item[1], reverse=True)[:15]:
+    print(f"  {seconds:7.3f}s  {module}")
+if total > IMPORT_BUDGET_SECONDS:
+    failures.append(f"import app.main took {total:.2f}s")
+eager = [module for module in LAZY_MODULES if module in times]
+if eager:
+    failures.append(f"imported eagerly: {', '.join(eager)}")
+
+port = free_port()
+start = time.perf_counter()
+server = subprocess.Popen([sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port)],
+                          cwd=os.path.join(REPO_ROOT, "app"), env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+try:
+    healthz = wait_for(f"http://127.0.0.1:{port}/healthz", HEALTHZ_BUDGET_SECONDS, start)
+    readyz = wait_for(f"http://127.0.0.1:{port}/readyz", READYZ_TIMEOUT_SECONDS, start)
+finally:
+    server.terminate()
+    server.wait()
+
+print(f"cold start to /healthz: {healthz:.2f}s (budget {HEALTHZ_BUDGET_SECONDS:.2f}s)" if healthz is not None else "cold start to /healthz: timed out")
+print(f"cold start to /readyz: {readyz:.2f}s" if readyz is not None else "cold start to /readyz: timed out")
+if healthz is None:
+    failures.append("/healthz did not answer within budget")
+if readyz is None:
+    failures.append("/readyz never became ready")
+
+if failures:
+    print("FAILED: " + "; ".join(failures))
+    sys.exit(1)
+print("OK")
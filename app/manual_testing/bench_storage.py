@@ -0,0 +1,66 @@
+import sys
+sys.path.append("../../")
+
+import json
+import os
+import shutil
+import statistics
+import time
+
+from app.models import Article
+from app.services.storage import ArticleStorage
+
+## Latency of the /articles (limit=10) and /stats storage calls at 100k stored
+## articles, for the old whole-file JSON layout and the SQLite store.
+
+DATA_DIR = "../data/bench_storage"
+NUM_ARTICLES = 100_000
+ROUNDS = 20
+
+
+def synthetic_articles(n):
+    return [
+        Article(title=f"Synthetic headline {i}", description=f"Description {i}", content=f"Body of synthetic article {i}. " * 10,
+                url=f"https://example.com/bench/{i}", source_name=f"source-{i % 25}",
+                published_at=f"2025-01-{1 + i % 28:02d}T00:00:00Z", author="bench")
+        for i in range(n)
+    ]
+
+
+def timed(fn):
+    latencies = []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    return statistics.median(latencies) * 1000
+
+
+def json_read_all(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return [Article(title=d['title'], description=d['description'], content=d['content'], url=d['url'],
+                    source_name=d['source_name'], published_at=d['published_at'], author=d['author']) for d in data]
+
+
+shutil.rmtree(DATA_DIR, ignore_errors=True)
+os.makedirs(DATA_DIR)
+articles = synthetic_articles(NUM_ARTICLES)
+
+json_path = os.path.join(DATA_DIR, "storage.json")
+with open(json_path, 'w', encoding='utf-8') as f:
+    json.dump([article.to_dict() for article in articles], f)
+
+storage = ArticleStorage(storage_path=os.path.join(DATA_DIR, "articles.db"))
+start = time.perf_counter()
+storage.save_articles(articles)
+print(f"SQLite bulk upsert of {NUM_ARTICLES} articles: {time.perf_counter() - start:.1f}s")
+
+start = time.perf_counter()
+storage.save_articles(articles[:20])
+print(f"SQLite upsert of a 20 article batch: {(time.perf_counter() - start)*1000:.1f}ms")
+
+print(f"/articles?limit=10  json: {timed(lambda: json_read_all(json_path)[:10]):8.1f}ms  sqlite: {timed(lambda: storage.read_articles(limit=10)):8.1f}ms")
+print(f"/stats              json: {timed(lambda: len(json_read_all(json_path))):8.1f}ms  sqlite: {timed(storage.get_stats):8.1f}ms")
+
+shutil.rmtree(DATA_DIR, ignore_errors=True)
@@ -0,0 +1,102 @@
+import sys
+sys.path.append("../../")
+
+import multiprocessing
+import os
+import resource
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+## Chroma (PersistentClient) against the NumPy memory-mapped vector index,
+## exact and with an HNSW graph when hnswlib is installed. Both are built on
+## disk from the same clustered 384-d corpus, then each backend is opened in
+## a fresh process to measure load time, resident memory, single-query QPS
+## and recall@k against brute-force ground truth.
+
+NUM_VECTORS = int(os.getenv("NUM_VECTORS", 200_000))
+DIM = 384
+NUM_QUERIES = 500
+TOP_K = 10
+WRITE_BATCH = 5000
+
+
+def corpus():
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(500, DIM)).astype(np.float32)
+    vectors = centers[rng.integers(0, len(centers), NUM_VECTORS)] + 0.5 * rng.normal(size=(NUM_VECTORS, DIM)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    queries = vectors[rng.choice(NUM_VECTORS, NUM_QUERIES, replace=False)] + 0.1 * rng.normal(size=(NUM_QUERIES, DIM)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    return vectors, queries
+
+
+def open_store(backend, root):
+    if backend == "chroma":
+        import chromadb
+        import chromadb.config
+        return chromadb.PersistentClient(path=os.path.join(root, "chroma"), settings=chromadb.config.Settings(anonymized_telemetry=False))
+    from app.services.vector_index import NumpyVectorStore
+    return NumpyVectorStore(os.path.join(root, backend), hnsw_min_size=NUM_VECTORS // 2 if backend == "numpy-hnsw" else 0)
+
+
+def build(backend, root, vectors):
+    store = open_store(backend, root)
+    collection = store.get_or_create_collection("bench")
+    start = time.perf_counter()
+    for offset in range(0, len(vectors), WRITE_BATCH):
+        batch = vectors[offset:offset+WRITE_BATCH]
+        collection.add(ids=[str(i) for i in range(offset, offset + len(batch))], embeddings=batch,
+                       documents=[f"doc {i}" for i in range(offset, offset + len(batch))],
+                       metadatas=[{"bucket": i % 10} for i in range(offset, offset + len(batch))])
+    return time.perf_counter() - start
+
+
+def measure(backend, root, queries, truth, results):
+    start = time.perf_counter()
+    collection = open_store(backend, root).get_collection("bench")
+    collection.count()
+    load_seconds = time.perf_counter() - start
+    hits = 0
+    start = time.perf_counter()
+    for query, expected in zip(queries, truth):
+        ids = collection.query(query_embeddings=[query], n_results=TOP_K)["ids"][0]
+        hits += len(set(map(int, ids)) & set(expected))
+    qps = len(queries) / (time.perf_counter() - start)
+    start = time.perf_counter()
+    for query in queries[:100]:
+        collection.query(query_embeddings=[query], n_results=TOP_K, where={"bucket": {"$eq": 3}})
+    filtered_qps = 100 / (time.perf_counter() - start)
+    ## ru_maxrss is in KiB on linux
+    results.put({"backend": backend, "load": load_seconds, "qps": qps, "filtered_qps": filtered_qps,
+                 "recall": hits / (len(queries) * TOP_K), "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024})
+
+
+if __name__ == "__main__":
+    ctx = multiprocessing.get_context("spawn")
+    ## created here, a spawned child re-imports this module
+    tmp_dir = tempfile.mkdtemp(prefix="bench_vector_index_")
+    vectors, queries = corpus()
+    truth = [np.argsort(-(vectors @ query))[:TOP_K].tolist() for query in queries]
+    backends = ["chroma", "numpy"]
+    try:
+        import hnswlib  # noqa: F401
+        backends.append("numpy-hnsw")
+    except ImportError:
+        print("hnswlib is not installed, skipping the HNSW run")
+
+    print(f"{NUM_VECTORS} vectors x {DIM}d, {NUM_QUERIES} queries, recall@{TOP_K}")
+    try:
+        for backend in backends:
+            build_seconds = build(backend, tmp_dir, vectors)
+            results = ctx.Queue()
+            process = ctx.Process(target=measure, args=(backend, tmp_dir, queries, truth, results))
+            process.start()
+            result = results.get()
+            process.join()
+            print(f"{backend:<11} build={build_seconds:6.1f}s  load={result['load']:6.2f}s  qps={result['qps']:8.1f}  "
+                  f"filtered qps={result['filtered_qps']:8.1f}  recall={result['recall']:.3f}  max rss={result['rss_mb']:7.0f}MB")
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
@@ -0,0 +1,106 @@
+import sys
+sys.path.append("../../")
+
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+## Local OpenAI-compatible chat completions server for testing the LLM gateway
+## without API keys. Answers any POST ending in /chat/completions, so both
+## ChatOpenAI (base_url=http://127.0.0.1:<port>/v1) and ChatGroq
+## (base_url=http://127.0.0.1:<port>) can point at it, streamed or not.
+## Latency, stalls and failures are adjustable while it runs:
+##
+##   python stub_openai_server.py --port 8011 --delay 0.3
+##   LLM_FALLBACK_MODEL=stub LLM_FALLBACK_BASE_URL=http://127.0.0.1:8011/v1 uvicorn app.main:app
+
+
+class StubOpenAIServer:
+    def __init__(self, port=0, delay=0.2, stall_rate=0.0, stall_seconds=5.0, fail_rate=0.0, fail_status=429, answer="Stub answer."):
+        self.delay = delay
+        self.stall_rate = stall_rate
+        self.stall_seconds = stall_seconds
+        self.fail_rate = fail_rate
+        self.fail_status = fail_status
+        self.answer = answer
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _json(self, status, body):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if not self.path.endswith("/chat/completions"):
+                    return self._json(404, {"error": {"message": f"unknown path {self.path}"}})
+                with stub._lock:
+                    stub.requests += 1
+                if random.random() < stub.fail_rate:
+                    return self._json(stub.fail_status, {"error": {"message": "stub failure", "type": "rate_limit_exceeded" if stub.fail_status == 429 else "server_error"}})
+                time.sleep(stub.stall_seconds if random.random() < stub.stall_rate else stub.delay)
+                completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+                model = request.get("model", "stub")
+                if not request.get("stream"):
+                    return self._json(200, {"id": completion_id, "object": "chat.completion", "created": int(time.time()), "model": model,
+                                            "choices": [{"index": 0, "message": {"role": "assistant", "content": stub.answer}, "finish_reason": "stop"}],
+                                            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}})
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.end_headers()
+                for i, token in enumerate(stub.answer.split(" ")):
+                    chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                             "choices": [{"index": 0, "delta": {"role": "assistant", "content": token if i == 0 else " " + token}, "finish_reason": None}]}
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                    self.wfile.flush()
+                done = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                        "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+                self.wfile.write(f"data: {json.dumps(done)}\n\ndata: [DONE]\n\n".encode())
+                self.wfile.flush()
+
+        return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible chat completions stub.")
+    parser.add_argument("--port", type=int, default=8011)
+    parser.add_argument("--delay", type=float, default=0.2)
+    parser.add_argument("--stall-rate", type=float, default=0.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    server = StubOpenAIServer(port=args.port, delay=args.delay, stall_rate=args.stall_rate, fail_rate=args.fail_rate)
+    print(f"Stub OpenAI server on http://127.0.0.1:{server.port}/v1")
+    server._server.serve_forever()
@@ -0,0 +1,91 @@
+import sys
+sys.path.append("../../")
+
+import asyncio
+
+import numpy as np
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+from app.services.llm_service import LLMService
+
+## Streams an answer through LLMService.astream_answer using a fake streaming
+## chat model and a canned retriever, so no Groq key or vector store is needed.
+## Then runs aask_question and aask_batch end to end (retrieval, context
+## building, the gateway) against the same stubs.
+
+
+class StubRAGService:
+    def __init__(self):
+        self.listeners = []
+
+    def add_change_listener(self, listener):
+        self.listeners.append(listener)
+
+    def embed(self, texts, batch_size=None):
+        ## crude bag-of-characters embedding, enough for near-identical questions
+        matrix = np.zeros((len(texts), 64), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for char in text.lower():
+                matrix[row, ord(char) % 64] += 1
+        return matrix
+
+    async def aembed_query(self, query):
+        return self.embed([query])
+
+    async def aembed(self, texts, batch_size=None):
+        return self.embed(texts)
+
+    async def asearch_articles_batch(self, queries, top_k=5, filters=None, recency_half_life_hours=None, query_embeddings=None):
+        return [self.search_articles(query, top_k=top_k) for query in queries]
+
+    async def asearch_articles(self, query, top_k=5, filters=None, recency_half_life_hours=None):
+        return self.search_articles(query, top_k=top_k)
+
+    async def asearch_passages(self, query_embedding, article_ids, n_results=40):
+        return [{"article_id": "abc123", "text": "Stub article content.", "embedding": self.embed(["Stub article content."])[0]}]
+
+    def search_articles(self, query, top_k=5):
+        return [{
+            "id": "abc123",
+            "title": "Stub headline",
+            "content": "Stub article content.",
+            "source_name": "stub",
+            "url": "https://stub.local/article",
+            "similarity_score": 1.0,
+        }]
+
+
+async def main():
+    answers = ["The stub article says hello world.", "An unrelated answer.", "First batch answer.", "Second batch answer."]
+    fake_llm = GenericFakeChatModel(messages=iter([AIMessage(content=answer) for answer in answers]))
+    llm_service = LLMService(rag_service=StubRAGService(), llm=fake_llm)
+
+    events = [event async for event in llm_service.astream_answer("What does the stub say?")]
+    for event in events:
+        print(event)
+
+    assert events[0]["event"] == "sources"
+    assert events[-1]["event"] == "done"
+    tokens = [event["data"] for event in events if event["event"] == "token"]
+    assert len(tokens) > 1, "expected the answer to arrive in several chunks"
+    assert "".join(tokens) == "The stub article says hello world."
+
+    ## a near-identical question with the same sources is served from the semantic cache,
+    ## the fake model would answer with the next canned message instead
+    cached = [event async for event in llm_service.astream_answer("What does the stub say ?")]
+    assert [event["data"] for event in cached if event["event"] == "token"] == ["The stub article says hello world."]
+
+    ## a different question goes through context building and the gateway
+    result = await llm_service.aask_question("Tell me about zebras and quantum physics")
+    print(result)
+    assert result["answer"] == "An unrelated answer.", result
+    assert result["sources"]
+
+    batch = [item async for item in llm_service.aask_batch(["Which xylophone brand won?", "Jupiter weather forecast, 12 km/h winds"])]
+    print(batch)
+    assert not [item for item in batch if "error" in item], batch
+    assert sorted(item["answer"] for item in batch) == ["First batch answer.", "Second batch answer."]
+
+
+asyncio.run(main())
@@ -0,0 +1,88 @@
+import sys
+sys.path.append("../../")
+
+import asyncio
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+## Runs AsyncNewsFetcher.fetch_many against a local stub NewsAPI server.
+## The stub fails the first request of every query with a 429 to exercise retries.
+
+os.environ.setdefault("NEWS_API_KEY", "stub")
+os.environ.setdefault("GROQ_API_KEY", "stub")
+
+seen = set()
+seen_lock = threading.Lock()
+
+
+class StubNewsAPI(BaseHTTPRequestHandler):
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(parsed.query).items()}
+        topic = params.get("q") or params.get("category")
+        page = int(params.get("page", 1))
+
+        with seen_lock:
+            first_hit = (topic, page) not in seen
+            seen.add((topic, page))
+        if first_hit:
+            self._send(429, {"status": "error", "code": "rateLimited"}, {"Retry-After": "0"})
+            return
+
+        ## every topic also returns the same syndicated "shared" story, which fetch_many must dedup
+        articles = [{
+            "title": f"{topic} story {page}-{i}",
+            "description": f"About {topic}",
+            "content": f"Content about {topic}",
+            "url": f"https://stub.local/{topic}/{page}/{i}",
+            "source": {"name": "stub"},
+            "publishedAt": "2025-01-01T00:00:00Z",
+            "author": "stub",
+        } for i in range(int(params.get("pageSize", 5)))]
+        articles.append({"title": "shared", "description": "", "content": "", "url": "https://stub.local/shared",
+                         "source": {"name": "stub"}, "publishedAt": "2025-01-01T00:00:00Z", "author": None})
+        self._send(200, {"status": "ok", "totalResults": len(articles), "articles": articles})
+
+    def _send(self, status, body, headers=None):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+server = ThreadingHTTPServer(("127.0.0.1", 0), StubNewsAPI)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+os.environ["NEWS_API_BASE"] = f"http://127.0.0.1:{server.server_address[1]}/v2"
+
+from app.services.news_fetcher import AsyncNewsFetcher
+
+
+async def main():
+    async with AsyncNewsFetcher(max_concurrency=4, backoff_base=0.01) as fetcher:
+        articles = await fetcher.fetch_many(queries=["artificial intelligence", "sports", "climate change"],
+                                            categories=["technology"], pages=2, page_size=5)
+    ## 4 topics * 2 pages * 5 articles + 1 shared story
+    expected = 4 * 2 * 5 + 1
+    print(f"Fetched {len(articles)} unique articles (expected {expected})")
+    assert len(articles) == expected
+    assert len({article.id for article in articles}) == len(articles)
+    ## headlines carry the category they were fetched for, /everything searches have none
+    for article in articles:
+        if "/technology/" in article.url:
+            assert article.category == "technology", (article.url, article.category)
+        elif article.url != "https://stub.local/shared":
+            assert article.category is None, (article.url, article.category)
+
+
+asyncio.run(main())
+server.shutdown()
@@ -0,0 +1,44 @@
+import sys
+sys.path.append("../../")
+
+import json
+import os
+
+import numpy as np
+
+from app.config import Config
+from app.services.embedding_backends import OnnxEmbeddingBackend, TorchEmbeddingBackend
+
+## Parity check of the onnx embedding backends against the PyTorch model on the
+## relevance fixture corpus: per-text cosine similarity between the vectors of
+## the two backends, and agreement of the top-5 neighbours of each query.
+
+FIXTURE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "relevance_corpus.json")
+MIN_COSINE = {"onnx": 0.999, "onnx int8": 0.97}
+MIN_TOP5_OVERLAP = {"onnx": 1.0, "onnx int8": 0.8}
+
+with open(FIXTURE_PATH, 'r', encoding='utf-8') as f:
+    fixture = json.load(f)
+documents = [" ".join([a['title'], a['description'], a['content']]) for a in fixture['articles']]
+queries = [item['query'] for item in fixture['queries']]
+
+model_name = Config().embedding_model
+reference = TorchEmbeddingBackend(model_name)
+reference_docs = reference.encode(documents)
+reference_queries = reference.encode(queries)
+
+
+def top5(query_vectors, doc_vectors):
+    return [set(row) for row in np.argsort(-(query_vectors @ doc_vectors.T), axis=1)[:, :5]]
+
+
+failed = False
+for label, backend in [("onnx", OnnxEmbeddingBackend(model_name)), ("onnx int8", OnnxEmbeddingBackend(model_name, quantized=True))]:
+    docs = backend.encode(documents)
+    cosines = np.sum(docs * reference_docs, axis=1) / (np.linalg.norm(docs, axis=1) * np.linalg.norm(reference_docs, axis=1))
+    overlap = np.mean([len(a & b) / 5 for a, b in zip(top5(backend.encode(queries), docs), top5(reference_queries, reference_docs))])
+    ok = cosines.min() >= MIN_COSINE[label] and overlap >= MIN_TOP5_OVERLAP[label]
+    failed |= not ok
+    print(f"{label:<10} cosine min={cosines.min():.4f} mean={cosines.mean():.4f}  top-5 overlap={overlap:.2f}  {'OK' if ok else 'FAILED'}")
+
+assert not failed, "onnx backend drifted from the PyTorch model"
@@ -0,0 +1,125 @@
+import sys
+sys.path.append("../../")
+
+import asyncio
+import os
+import statistics
+import time
+
+os.environ.setdefault("LLM_HEDGE_MIN_SECONDS", "0.5")
+os.environ.setdefault("LLM_TIMEOUT_SECONDS", "5")
+os.environ.setdefault("LLM_CIRCUIT_RESET_SECONDS", "5")
+
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_groq import ChatGroq
+from prometheus_client import REGISTRY
+
+from app.config import Config
+from app.services.llm_gateway import create_llm_gateway
+from stub_openai_server import StubOpenAIServer
+
+## The LLM gateway against two local OpenAI-compatible stubs: a primary reached
+## through the real ChatGroq client that stalls and rate limits now and then,
+## and a healthy fallback reached through ChatOpenAI. Checks that
+##   - identical concurrent prompts reach the provider once,
+##   - hedging and fallback cut the p99 and the error rate of the plain chain,
+##   - the circuit opens on a dead primary, everything is served by the
+##     fallback, and the circuit closes again once the primary recovers,
+## and prints the per-provider counters. No API key is needed.
+
+NUM_REQUESTS = 200
+CONCURRENCY = 20
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+async def run(call, questions):
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    latencies, errors = [], 0
+
+    async def one(question):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await call({"context": "Stub context.", "question": question})
+                latencies.append(time.perf_counter() - start)
+            except Exception:
+                errors += 1
+
+    await asyncio.gather(*(one(question) for question in questions))
+    latencies.sort()
+    return statistics.median(latencies), latencies[int(len(latencies) * 0.99) - 1], errors
+
+
+async def main():
+    primary = StubOpenAIServer(delay=0.2, stall_rate=0.05, stall_seconds=4, fail_rate=0.05).start()
+    fallback = StubOpenAIServer(delay=0.3).start()
+    os.environ["LLM_FALLBACK_MODEL"] = "stub"
+    os.environ["LLM_FALLBACK_BASE_URL"] = f"http://127.0.0.1:{fallback.port}/v1"
+    config = Config()
+    prompt = ChatPromptTemplate.from_template("{context}\n{question}")
+    ## max_retries=0 on the plain chain as well, the comparison is about the gateway not the client's retries
+    groq = ChatGroq(model=config.model, api_key="unused", base_url=f"http://127.0.0.1:{primary.port}", timeout=config.llm_timeout_seconds, max_retries=0)
+    gateway = create_llm_gateway(config, prompt, groq, StrOutputParser())
+    failures = []
+    try:
+        ## coalescing
+        before = primary.requests
+        await asyncio.gather(*(gateway.agenerate({"context": "same", "question": "same"}) for _ in range(10)))
+        print(f"10 identical concurrent prompts -> {primary.requests - before} upstream request(s)")
+        if primary.requests - before != 1:
+            failures.append("identical prompts were not coalesced")
+
+        ## tail latency and errors, plain chain against the gateway
+        questions = [f"question {i}" for i in range(NUM_REQUESTS)]
+        plain = await run((prompt | groq | StrOutputParser()).ainvoke, questions)
+        gated = await run(gateway.agenerate, [f"gateway {question}" for question in questions])
+        print(f"plain chain  p50 {plain[0]*1000:6.0f}ms  p99 {plain[1]*1000:6.0f}ms  errors {plain[2]}")
+        print(f"gateway      p50 {gated[0]*1000:6.0f}ms  p99 {gated[1]*1000:6.0f}ms  errors {gated[2]}")
+        if gated[2] or gated[1] >= plain[1]:
+            failures.append("the gateway did not improve the tail")
+
+        ## circuit breaker: a dead primary is skipped, then probed and closed again
+        primary.fail_rate = 1.0
+        await run(gateway.agenerate, [f"dead {i}" for i in range(50)])
+        before = primary.requests
+        await run(gateway.agenerate, [f"open {i}" for i in range(50)])
+        print(f"primary down: {primary.requests - before} requests reached it while the circuit was open")
+        if primary.requests - before:
+            failures.append("the open circuit still let requests through")
+        primary.fail_rate = 0.0
+        await asyncio.sleep(config.llm_circuit_reset_seconds)
+        await gateway.agenerate({"context": "probe", "question": "probe"})
+        if gateway.providers[0].breaker.state != 0:
+            failures.append("the circuit did not close after the primary recovered")
+
+        ## streaming falls back before the first token
+        primary.fail_rate = 1.0
+        tokens = [token async for token in gateway.astream({"context": "stream", "question": "stream"})]
+        primary.fail_rate = 0.0
+        if "".join(tokens) != fallback.answer:
+            failures.append("streaming did not fall back")
+
+        for provider in ("groq", "fallback"):
+            print(f"{provider:<9} calls {sample('llm_queries_total', model=provider):5.0f}  "
+                  f"errors {sample('llm_provider_errors_total', provider=provider, reason='error'):4.0f}  "
+                  f"timeouts {sample('llm_provider_errors_total', provider=provider, reason='timeout'):3.0f}  "
+                  f"circuit open {sample('llm_provider_errors_total', provider=provider, reason='circuit_open'):4.0f}  "
+                  f"hedges won {sample('llm_hedged_requests_total', provider=provider, outcome='won'):3.0f}")
+        print(f"fallbacks groq -> fallback {sample('llm_fallbacks_total', from_provider='groq', to_provider='fallback'):.0f}, "
+              f"coalesced {sample('llm_coalesced_requests_total'):.0f}")
+    finally:
+        primary.stop()
+        fallback.stop()
+
+    if failures:
+        print("FAILED: " + "; ".join(failures))
+        sys.exit(1)
+    print("OK")
+
+
+asyncio.run(main())
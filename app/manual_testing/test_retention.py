@@ -0,0 +1,67 @@
+import sys
+sys.path.append("../../")
+
+import os
+import shutil
+import sqlite3
+import tempfile
+from datetime import datetime, timezone
+
+from app.models import Article
+from app.services.retention import RetentionPolicy
+from app.services.storage import ArticleStorage
+
+## Expiry against publish dates in the formats sources actually send: Z and
+## +00:00 suffixes, fractional seconds and non-UTC offsets. As strings these
+## sort in the wrong order, the store has to compare them as instants. Also
+## checks that a store created before the published_ts column is backfilled.
+
+NOW = datetime(2025, 1, 10, 12, 0, 0, tzinfo=timezone.utc)
+## 24h TTL, so the cutoff is 2025-01-09T12:00:00Z
+CASES = {
+    "https://example.com/z-expired": ("2025-01-09T11:59:59Z", True),
+    "https://example.com/z-kept": ("2025-01-09T12:00:01Z", False),
+    "https://example.com/offset-expired": ("2025-01-09T11:30:00+00:00", True),
+    "https://example.com/fraction-kept": ("2025-01-09T12:00:00.500Z", False),
+    ## 13:30 in UTC+2 is 11:30 UTC, as a string it sorts after the cutoff
+    "https://example.com/plus-two-expired": ("2025-01-09T13:30:00+02:00", True),
+    ## 07:30 in UTC-5 is 12:30 UTC, as a string it sorts before the cutoff
+    "https://example.com/minus-five-kept": ("2025-01-09T07:30:00-05:00", False),
+    "https://example.com/naive-expired": ("2025-01-09T11:00:00", True),
+    "https://example.com/garbage-kept": ("yesterday", False),
+    "https://example.com/undated-kept": (None, False),
+}
+
+
+def article(url, published_at):
+    return Article(title=url, description="", content="", url=url, source_name="test", published_at=published_at)
+
+
+def expired_urls(storage):
+    category_cutoffs, default_cutoff = RetentionPolicy(default_ttl_hours=24).cutoffs(NOW)
+    return {item.url for item in storage.expired_articles(category_cutoffs, default_cutoff, limit=100, now=NOW.timestamp())}
+
+
+expected = {url for url, (_, expired) in CASES.items() if expired}
+tmp_dir = tempfile.mkdtemp()
+try:
+    storage = ArticleStorage(storage_path=os.path.join(tmp_dir, "articles.db"))
+    storage.save_articles([article(url, published_at) for url, (published_at, _) in CASES.items()])
+    got = expired_urls(storage)
+    print(f"expired: {sorted(got)}")
+    assert got == expected, (got ^ expected)
+
+    ## a store written before published_ts existed
+    legacy_path = os.path.join(tmp_dir, "legacy.db")
+    conn = sqlite3.connect(legacy_path)
+    conn.execute("CREATE TABLE articles (id TEXT PRIMARY KEY, title TEXT, description TEXT, content TEXT, url TEXT, "
+                 "source_name TEXT, published_at TEXT, author TEXT, category TEXT)")
+    conn.executemany("INSERT INTO articles VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                     [(Article.id_for_url(url), url, "", "", url, "test", published_at, None, None) for url, (published_at, _) in CASES.items()])
+    conn.commit()
+    conn.close()
+    got = expired_urls(ArticleStorage(storage_path=legacy_path))
+    assert got == expected, (got ^ expected)
+    print("OK")
+finally:
+    shutil.rmtree(tmp_dir, ignore_errors=True)
@@ -0,0 +1,233 @@
+import sys
+sys.path.append("../../")
+
+import hashlib
+import multiprocessing
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+import time
+
+import httpx
+import numpy as np
+
+## Integration test for the shared-state deployment mode. Starts a local chroma
+## server as the stand-in for the chroma service and runs several worker
+## processes against it and one shared data directory, the way uvicorn workers
+## or k8s replicas run. Checks that
+##   - every worker accepts ingestion jobs but only the elected leader ingests,
+##   - each article ends up exactly once in ArticleStorage, chroma and the lexical index,
+##   - every worker returns the same search results,
+##   - a new leader takes over the queue when the leader dies,
+## then compares search throughput of one worker against all of them.
+## Needs the `chroma` CLI that ships with chromadb.
+
+NUM_WORKERS = int(os.getenv("NUM_WORKERS", 4))
+JOBS_PER_WORKER = 5
+ARTICLES_PER_JOB = 20
+LEASE_SECONDS = 2.0
+THROUGHPUT_SECONDS = 5.0
+
+TMP_DIR = tempfile.mkdtemp(prefix="shared_state_")
+DATA_DIR = os.path.join(TMP_DIR, "data")
+os.environ["COORDINATION_DB_PATH"] = os.path.join(DATA_DIR, "coordination.sqlite3")
+os.environ["LEXICAL_INDEX_PATH"] = os.path.join(DATA_DIR, "lexical_index.sqlite3")
+os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(DATA_DIR, "embedding_cache.sqlite3")
+os.environ["NEAR_DUPLICATE_ENABLED"] = "false"
+os.environ["QUERY_BATCHING_ENABLED"] = "false"
+os.environ["LEADER_LEASE_SECONDS"] = str(LEASE_SECONDS)
+STORAGE_PATH = os.path.join(DATA_DIR, "articles.db")
+
+
+def make_article(i):
+    from app.models import Article
+    return Article(title=f"Headline {i} about topic {i % 7}", description=f"Description {i}", content=f"Content of article {i} on topic {i % 7}",
+                   url=f"https://shared.local/{i}", source_name=f"source-{i % 5}", published_at=f"2025-01-{1 + i % 28:02d}T00:00:00Z",
+                   category="technology")
+
+
+class StubEmbedder:
+    ## seeded from the text so every process produces the same vectors
+    def encode(self, texts, batch_size=32, convert_to_numpy=True):
+        return np.stack([np.random.default_rng(int(hashlib.sha256(text.encode()).hexdigest()[:8], 16)).random(384, dtype=np.float32)
+                         for text in texts]) if texts else np.zeros((0, 384), dtype=np.float32)
+
+
+class StubNewsFetcher:
+    ## job `query` k returns articles k*10 .. k*10+20, neighbouring jobs overlap by half
+    def fetch_raw(self, query=None, country="us", category=None, page_size=10, page=1):
+        start = int(query) * ARTICLES_PER_JOB // 2
+        return list(range(start, start + ARTICLES_PER_JOB))
+
+    def category_for(self, query, category):
+        return category
+
+    def parse_articles(self, data, category=None):
+        return [make_article(i) for i in data]
+
+
+def build_services():
+    from app.config import Config
+    from app.services.coordination import LeaderLease, SharedJobQueue
+    from app.services.ingestion import IngestionWorker
+    from app.services.rag_service import RAGService
+    from app.services.storage import ArticleStorage
+
+    config = Config()
+    storage = ArticleStorage(storage_path=STORAGE_PATH)
+    rag = RAGService(db_path=os.path.join(DATA_DIR, "unused"), embedding_model=StubEmbedder())
+    worker = IngestionWorker(StubNewsFetcher(), storage, rag,
+                             job_queue=SharedJobQueue(config.coordination_db_path),
+                             lease=LeaderLease(config.coordination_db_path, ttl_seconds=config.leader_lease_seconds))
+    return storage, rag, worker
+
+
+def ingest_and_search(index, results):
+    from app.services.ingestion import IngestionJob
+    storage, rag, worker = build_services()
+    worker.start()
+    jobs = [worker.submit(IngestionJob(query=str(index * JOBS_PER_WORKER + k), category="technology")) for k in range(JOBS_PER_WORKER)]
+    deadline = time.time() + 120
+    while time.time() < deadline and any(worker.get_job(job.id).status in ("queued", "running") for job in jobs):
+        time.sleep(0.2)
+    statuses = [worker.get_job(job.id).status for job in jobs]
+    ## give the other workers' jobs time to finish before reading the corpus
+    while time.time() < deadline and worker.job_queue.qsize():
+        time.sleep(0.2)
+    time.sleep(1)
+    search = [result['id'] for result in rag.search_articles("headline topic 3", top_k=5, mode="hybrid")]
+    results.put({"index": index, "pid": os.getpid(), "statuses": statuses, "was_leader": worker.lease.is_leader, "search": search})
+    worker.stop()
+
+
+def idle_worker(index, ready):
+    _, _, worker = build_services()
+    worker.start()
+    ready.put(os.getpid())
+    while True:
+        time.sleep(1)
+
+
+def search_load(index, barrier, results):
+    _, rag, _ = build_services()
+    queries = [f"headline topic {i % 7}" for i in range(100)]
+    barrier.wait()
+    count = 0
+    end = time.perf_counter() + THROUGHPUT_SECONDS
+    while time.perf_counter() < end:
+        rag.search_articles(queries[count % len(queries)], top_k=5, mode="hybrid")
+        count += 1
+    results.put(count)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def throughput(processes):
+    barrier = ctx.Barrier(processes)
+    results = ctx.Queue()
+    workers = [ctx.Process(target=search_load, args=(i, barrier, results)) for i in range(processes)]
+    for process in workers:
+        process.start()
+    total = sum(results.get(timeout=300) for _ in workers)
+    for process in workers:
+        process.join()
+    return total / THROUGHPUT_SECONDS
+
+
+if __name__ == "__main__":
+    ctx = multiprocessing.get_context("spawn")
+    port = free_port()
+    os.environ["CHROMA_HOST"] = "127.0.0.1"
+    os.environ["CHROMA_PORT"] = str(port)
+    server = subprocess.Popen(["chroma", "run", "--path", os.path.join(TMP_DIR, "chroma"), "--port", str(port)],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    failures = []
+    try:
+        deadline = time.time() + 60
+        while True:
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/api/v2/heartbeat", timeout=1).status_code == 200:
+                    break
+            except httpx.TransportError:
+                pass
+            if time.time() > deadline:
+                raise SystemExit("chroma server did not start")
+            time.sleep(0.2)
+
+        ## consistency: every worker submits jobs, the leader processes all of them
+        results = ctx.Queue()
+        workers = [ctx.Process(target=ingest_and_search, args=(i, results)) for i in range(NUM_WORKERS)]
+        for process in workers:
+            process.start()
+        reports = [results.get(timeout=300) for _ in workers]
+        for process in workers:
+            process.join()
+
+        from app.services.lexical_index import LexicalIndex
+        from app.services.storage import ArticleStorage
+        import chromadb
+        expected = len({i for job in range(NUM_WORKERS * JOBS_PER_WORKER)
+                        for i in range(job * ARTICLES_PER_JOB // 2, job * ARTICLES_PER_JOB // 2 + ARTICLES_PER_JOB)})
+        stored = ArticleStorage(storage_path=STORAGE_PATH).get_stats()
+        vectors = chromadb.HttpClient(host="127.0.0.1", port=port).get_collection("rag_collection").count()
+        lexical = len(LexicalIndex(db_path=os.environ["LEXICAL_INDEX_PATH"]))
+        leaders = [report["index"] for report in reports if report["was_leader"]]
+        print(f"articles expected={expected} storage={stored} chroma={vectors} lexical={lexical}")
+        print(f"leaders at the end: {leaders}")
+        if not (expected == stored == vectors == lexical):
+            failures.append("stores disagree on the corpus size")
+        if any(status != "completed" for report in reports for status in report["statuses"]):
+            failures.append(f"jobs not completed: {[report['statuses'] for report in reports]}")
+        if len(leaders) > 1:
+            failures.append("more than one leader")
+        if len({tuple(report["search"]) for report in reports}) != 1:
+            failures.append("workers return different search results")
+
+        ## failover: kill the leader, a job queued afterwards must still be processed
+        from app.services.coordination import LeaderLease, SharedJobQueue
+        from app.services.ingestion import IngestionJob
+        ready = ctx.Queue()
+        idle = [ctx.Process(target=idle_worker, args=(i, ready)) for i in range(2)]
+        for process in idle:
+            process.start()
+        for _ in idle:
+            ready.get(timeout=120)
+        observer = LeaderLease(os.environ["COORDINATION_DB_PATH"])
+        while observer.current_holder() is None:
+            time.sleep(0.1)
+        leader_pid = int(observer.current_holder().split(":")[1])
+        leader = next(process for process in idle if process.pid == leader_pid)
+        leader.kill()
+        killed_at = time.perf_counter()
+        job = IngestionJob(query=str(NUM_WORKERS * JOBS_PER_WORKER + 1), category="technology")
+        job_queue = SharedJobQueue(os.environ["COORDINATION_DB_PATH"])
+        job_queue.put(job.to_dict(), max_queued=100)
+        while job_queue.get(job.id)["status"] != "completed" and time.perf_counter() - killed_at < LEASE_SECONDS * 10:
+            time.sleep(0.1)
+        failover = time.perf_counter() - killed_at
+        print(f"job processed {failover:.2f}s after the leader was killed (lease {LEASE_SECONDS:.0f}s)")
+        if job_queue.get(job.id)["status"] != "completed":
+            failures.append("no new leader took over the queue")
+        for process in idle:
+            process.kill()
+            process.join()
+
+        ## throughput: search qps of one worker against all of them on the shared store
+        single = throughput(1)
+        multi = throughput(NUM_WORKERS)
+        print(f"search throughput: 1 worker {single:.0f} qps, {NUM_WORKERS} workers {multi:.0f} qps ({multi / single:.2f}x)")
+    finally:
+        server.terminate()
+        server.wait()
+        shutil.rmtree(TMP_DIR, ignore_errors=True)
+
+    if failures:
+        print("FAILED: " + "; ".join(failures))
+        sys.exit(1)
+    print("OK")
@@ -5,7 +5,8 @@ from app.services.news_fetcher import NewsFetcher
 from app.services.storage import ArticleStorage
 
 fetcher = NewsFetcher()
-storage = ArticleStorage(storage_path="../data/storage.json")
+## same paths as the app: the sqlite store, and the old json file imported into it once if it is still there
+storage = ArticleStorage(storage_path="../data/articles.db", legacy_json_path="../data/storage.json")
 
 ## fetch some articles
 articles = fetcher.fetch_news(country="us", category="sports", page_size=5, page=1)
@@ -28,7 +28,8 @@ rag_query_latency = Histogram(
     'rag_query_latency_seconds',
     'Latency for RAG queries in seconds',
     ['query_type'],
-    buckets=[0.1, 0.5, 1, 2.5, 5,]
+    ## /search is tens of milliseconds, /ask includes the llm call
+    buckets=[0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30]
 )
 
 ## track llm api latency
@@ -36,9 +37,177 @@ llm_api_latency = Histogram(
     'llm_api_latency_seconds',
     'Latency for LLM API calls in seconds',
     ['model'],
-    buckets=[0.5, 1, 2.5, 5, 10, 20]
+    buckets=[0.25, 0.5, 1, 2, 3, 5, 8, 13, 20, 30]
 )
 
+## time until the first streamed llm token
+llm_time_to_first_token = Histogram(
+    'llm_time_to_first_token_seconds',
+    'Time to first token for streamed LLM responses in seconds',
+    ['model'],
+    buckets=[0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+)
+
+## time taken to build the shared services (embedding model, vector store, llm client)
+service_startup_seconds = Gauge(
+    'service_startup_seconds',
+    'Time taken to initialize the shared application services in seconds'
+)
+
+## embedding cache
+embedding_cache_hits = Counter(
+    'embedding_cache_hits_total',
+    'Total number of embedding cache hits',
+    ['tier']
+)
+
+embedding_cache_misses = Counter(
+    'embedding_cache_misses_total',
+    'Total number of embedding cache misses'
+)
+
+embedding_cache_evictions = Counter(
+    'embedding_cache_evictions_total',
+    'Total number of entries evicted from the embedding cache',
+    ['tier']
+)
+
+## query embedding micro-batching
+embedding_batch_size = Histogram(
+    'embedding_batch_size',
+    'Number of query texts encoded per micro-batch',
+    buckets=[1, 2, 4, 8, 16, 32, 64]
+)
+
+embedding_batch_queue_delay = Histogram(
+    'embedding_batch_queue_delay_seconds',
+    'Time a query text waits in the micro-batcher before encoding starts',
+    buckets=[0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1]
+)
+
+## background ingestion pipeline
+ingestion_queue_depth = Gauge(
+    'ingestion_queue_depth',
+    'Number of ingestion jobs waiting in the queue'
+)
+
+## semantic answer cache for /ask
+answer_cache_requests = Counter(
+    'answer_cache_requests_total',
+    'Total number of semantic answer cache lookups',
+    ['result']
+)
+
+answer_cache_hit_ratio = Gauge(
+    'answer_cache_hit_ratio',
+    'Ratio of semantic answer cache lookups that were hits'
+)
+
+answer_cache_saved_llm_seconds = Counter(
+    'answer_cache_saved_llm_seconds_total',
+    'LLM seconds saved by serving answers from the semantic answer cache'
+)
+
+## near-duplicate (syndicated story) detection during ingestion
+near_duplicates_seen = Counter(
+    'near_duplicates_seen_total',
+    'Total number of articles checked for near duplicates'
+)
+
+near_duplicates_found = Counter(
+    'near_duplicates_found_total',
+    'Total number of articles collapsed into an existing story cluster'
+)
+
+near_duplicate_ratio = Gauge(
+    'near_duplicate_ratio',
+    'Share of checked articles that were near duplicates of an existing story'
+)
+
+## token budgeted /ask context
+llm_prompt_tokens = Histogram(
+    'llm_prompt_tokens',
+    'Estimated number of prompt tokens sent to the LLM',
+    ['model'],
+    buckets=[128, 256, 512, 1024, 2048, 4096, 8192, 16384]
+)
+
+context_build_latency = Histogram(
+    'context_build_latency_seconds',
+    'Time spent retrieving passages and packing the LLM context in seconds',
+    buckets=[0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25]
+)
+
+## per-stage breakdown of the fetch, embed, retrieve and generate hot paths
+stage_latency = Histogram(
+    'stage_latency_seconds',
+    'Latency of each traced hot-path stage in seconds',
+    ['stage'],
+    ## from sub-millisecond sqlite reads up to multi-second llm generations
+    buckets=[0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30]
+)
+
+## article retention
+corpus_size = Gauge(
+    'corpus_articles',
+    'Number of articles held in each store',
+    ['store']
+)
 
+compaction_duration_seconds = Gauge(
+    'compaction_duration_seconds',
+    'Duration of the last retention compaction run in seconds'
+)
 
+compaction_removed = Counter(
+    'compaction_removed_articles_total',
+    'Total number of expired articles removed by the retention compactor'
+)
+
+## /ask/batch llm fan-out
+llm_rate_limit_wait = Histogram(
+    'llm_rate_limit_wait_seconds',
+    'Time an LLM call waited for the tokens-per-minute budget in seconds',
+    buckets=[0.001, 0.01, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60]
+)
 
+## llm gateway, `model` of llm_queries_total and llm_api_latency_seconds is the provider
+llm_provider_errors = Counter(
+    'llm_provider_errors_total',
+    'Total number of failed LLM calls per provider',
+    ['provider', 'reason']
+)
+
+llm_fallbacks = Counter(
+    'llm_fallbacks_total',
+    'Total number of LLM calls retried on the next provider',
+    ['from_provider', 'to_provider']
+)
+
+llm_hedged_requests = Counter(
+    'llm_hedged_requests_total',
+    'Total number of hedged LLM requests by provider and whether the hedge answered first',
+    ['provider', 'outcome']
+)
+
+llm_coalesced_requests = Counter(
+    'llm_coalesced_requests_total',
+    'Total number of LLM calls served by an identical in-flight call'
+)
+
+llm_circuit_state = Gauge(
+    'llm_circuit_state',
+    'Circuit breaker state per LLM provider (0 closed, 1 half open, 2 open)',
+    ['provider']
+)
+
+llm_queue_wait = Histogram(
+    'llm_gateway_queue_seconds',
+    'Time an LLM call waited for a free gateway concurrency slot in seconds',
+    buckets=[0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30]
+)
+
+llm_inflight = Gauge(
+    'llm_gateway_inflight_requests',
+    'Number of LLM calls currently running'
+)
@@ -1,7 +1,50 @@
 import hashlib
+from datetime import datetime, timezone
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+## query parameters that only track the click and never change the article
+TRACKING_PARAMS = {"fbclid", "gclid", "dclid", "msclkid", "mc_cid", "mc_eid", "igshid", "ref", "ref_src", "cmpid", "ocid", "smid", "at_medium", "at_campaign"}
+
+def normalize_url(url: str) -> str:
+    """Canonical form of an article url: lowercase scheme/host, no fragment, default port, trailing slash or tracking params."""
+    if not url:
+        return ""
+    try:
+        parts = urlsplit(url.strip())
+        port = parts.port
+    except ValueError:
+        ## malformed port or ipv6 literal, keep the url as it came rather than failing the whole batch
+        return url.strip()
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if ":" in host:
+        ## hostname drops the brackets of ipv6 literals
+        host = f"[{host}]"
+    if port and not (scheme == "http" and port == 80) and not (scheme == "https" and port == 443):
+        host = f"{host}:{port}"
+    query = sorted((key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+                   if not key.lower().startswith("utm_") and key.lower() not in TRACKING_PARAMS)
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((scheme, host, path, urlencode(query), ""))
+
+def parse_published_at(published_at) -> Optional[int]:
+    """Epoch seconds of an ISO 8601 timestamp such as NewsAPI's publishedAt, None when it can't be parsed."""
+    if not published_at:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(published_at).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp())
 
 class Article:
-    def __init__(self, title, description, content, url,source_name, published_at,author=None):
+    ## fixed slots instead of a per-instance __dict__, bulk jobs hold hundreds of thousands of these
+    __slots__ = ("title", "description", "content", "url", "source_name", "published_at", "author", "category", "id", "_full_text")
+
+    def __init__(self, title, description, content, url,source_name, published_at,author=None,category=None):
         self.title = title
         self.description = description
         self.content = content
@@ -9,12 +52,23 @@ class Article:
         self.source_name = source_name
         self.published_at = published_at
         self.author = author
+        ## newsapi category of the top-headlines request the article came from, if any
+        self.category = category
         self.id = self._generate_id()
+        ## like the id, the full text is derived once, articles aren't edited after they are built
+        self._full_text = None
 
     def _generate_id(self):
-        return hashlib.md5(self.url.encode('utf-8')).hexdigest()[:6]  ## use hashilib instead of hash for consistent hashing
+        return self.id_for_url(self.url)
+
+    @staticmethod
+    def id_for_url(url: str) -> str:
+        ## full 128 bit digest, truncated ids collide at our corpus sizes
+        return hashlib.md5(normalize_url(url).encode('utf-8')).hexdigest()  ## use hashilib instead of hash for consistent hashing
     
     def get_full_text(self):
+        if self._full_text is not None:
+            return self._full_text
         parts = [
             f"Title: {self.title}",
             f"Description: {self.description}",
@@ -24,7 +78,8 @@ class Article:
             f"Published At: {self.published_at}",
             f"Author: {self.author}"
         ]
-        return "\n".join(parts).strip() 
+        self._full_text = "\n".join(parts).strip()
+        return self._full_text
     
     def to_dict(self):
         return {
@@ -35,6 +90,7 @@ class Article:
             "url": self.url,
             "source_name": self.source_name,
             "published_at": self.published_at,
-            "author": self.author
+            "author": self.author,
+            "category": self.category
         }
     
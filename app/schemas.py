@@ -1,4 +1,5 @@
-from typing import List, Optional
+from datetime import date, datetime, timezone
+from typing import List, Literal, Optional
 from pydantic import BaseModel, Field
 
 class ArticleResponse(BaseModel):
@@ -9,6 +10,7 @@ class ArticleResponse(BaseModel):
     source_name: str
     author: Optional[str] = None
     published_at: Optional[str] = None
+    category: Optional[str] = None
 
 class FetchNewsRequest(BaseModel):
     query: Optional[str] = Field(None, description="Search query")
@@ -17,14 +19,40 @@ class FetchNewsRequest(BaseModel):
     page_size: Optional[int] = Field(10,ge=1,le=20, description="Number of articles to fetch")
     page: Optional[int] = Field(1,ge=1, description="Page number for pagination")
     
-class SearchRequest(BaseModel):
+class RetrievalFilters(BaseModel):
+    """Metadata filters applied inside the vector store, shared by search and question requests"""
+    published_after: Optional[datetime] = Field(None, description="Only articles published at or after this time (ISO 8601)")
+    published_before: Optional[datetime] = Field(None, description="Only articles published at or before this time (ISO 8601)")
+    source_name: Optional[str] = Field(None, description="Only articles from this source")
+    category: Optional[str] = Field(None, description="Only articles fetched for this category")
+    recency_half_life_hours: Optional[float] = Field(None, ge=0, description="Decay scores by article age, halving every this many hours, 0 turns the configured decay off")
+
+    def filters(self) -> dict:
+        def epoch(value: Optional[datetime]) -> Optional[int]:
+            if value is None:
+                return None
+            return int((value if value.tzinfo else value.replace(tzinfo=timezone.utc)).timestamp())
+        return {
+            "published_after": epoch(self.published_after),
+            "published_before": epoch(self.published_before),
+            "source_name": self.source_name,
+            "category": self.category,
+        }
+
+class SearchRequest(RetrievalFilters):
     query: str = Field(..., description="Search query")
     top_k: int = Field(5, ge=1, le=20, description="Number of top relevant articles to retrieve(1-20)")
+    mode: Optional[Literal["dense", "lexical", "hybrid"]] = Field(None, description="Retrieval mode, defaults to the configured RETRIEVAL_MODE")
 
-class QuestionRequest(BaseModel):
+class QuestionRequest(RetrievalFilters):
     question: str = Field(..., description="Question to ask!")
     top_k: int = Field(5, ge=1, le=20, description="Number of top relevant articles to consider for answering the question(1-20)")
 
+class BatchQuestionRequest(RetrievalFilters):
+    """Many questions answered with shared retrieval, the filters apply to all of them"""
+    questions: List[str] = Field(..., min_length=1, max_length=100, description="Questions to ask (1-100)")
+    top_k: int = Field(5, ge=1, le=20, description="Number of top relevant articles to consider for each question(1-20)")
+
 class SearchResult(BaseModel):
     """Single search result"""
     id: str
@@ -56,3 +84,32 @@ class StatsResponse(BaseModel):
     """Database statistics"""
     total_articles_in_rag: int
     total_articles_in_vectordb: int
+
+class JobSubmittedResponse(BaseModel):
+    """Response for an enqueued ingestion job"""
+    job_id: str
+    status: str
+
+class JobStatusResponse(BaseModel):
+    """Status of an ingestion job"""
+    id: str
+    status: str
+    query: Optional[str] = None
+    country: Optional[str] = None
+    category: Optional[str] = None
+    error: Optional[str] = None
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    fetched: int
+    new_articles: int
+    articles: List[ArticleResponse]
+
+class RehydrateRequest(BaseModel):
+    """Publish days to restore from the cold archive"""
+    start_date: date = Field(..., description="First publish day to restore (YYYY-MM-DD)")
+    end_date: date = Field(..., description="Last publish day to restore (YYYY-MM-DD)")
+
+class RehydrateResponse(BaseModel):
+    """Number of archived articles restored"""
+    restored: int
@@ -0,0 +1,91 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+from app.metrics import answer_cache_hit_ratio, answer_cache_requests, answer_cache_saved_llm_seconds
+
+
+class _CacheEntry:
+    def __init__(self, embedding: np.ndarray, source_ids: frozenset, response: dict, llm_seconds: float):
+        self.embedding = embedding
+        self.source_ids = source_ids
+        self.response = response
+        self.llm_seconds = llm_seconds
+        self.created_at = time.monotonic()
+
+
+class SemanticAnswerCache:
+    """Cache of /ask answers keyed by question embedding similarity.
+
+    A cached answer is reused when the new question is within `threshold`
+    cosine similarity of a cached question and retrieval returned the same set
+    of source ids. Entries expire after `ttl_seconds` and the least recently
+    used entry is evicted beyond `max_entries`.
+    """
+
+    def __init__(self, threshold=0.95, ttl_seconds=3600, max_entries=1000):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: OrderedDict[int, _CacheEntry] = OrderedDict()
+        self._next_key = 0
+        self._hits = 0
+        self._requests = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        embedding = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(embedding)
+        return embedding / norm if norm else embedding
+
+    def get(self, embedding, source_ids) -> Optional[dict]:
+        query = self._normalize(embedding)
+        source_ids = frozenset(source_ids)
+        with self._lock:
+            self._expire()
+            hit = None
+            if self._entries:
+                keys = list(self._entries)
+                matrix = np.vstack([self._entries[key].embedding for key in keys])
+                similarities = matrix @ query
+                for index in np.argsort(-similarities):
+                    if similarities[index] < self.threshold:
+                        break
+                    entry = self._entries[keys[index]]
+                    if entry.source_ids == source_ids:
+                        self._entries.move_to_end(keys[index])
+                        hit = entry
+                        break
+            self._record(hit)
+            if hit is None:
+                return None
+            answer_cache_saved_llm_seconds.inc(hit.llm_seconds)
+            return hit.response
+
+    def put(self, embedding, source_ids, response: dict, llm_seconds: float) -> None:
+        with self._lock:
+            self._entries[self._next_key] = _CacheEntry(self._normalize(embedding), frozenset(source_ids), response, llm_seconds)
+            self._next_key += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _expire(self) -> None:
+        cutoff = time.monotonic() - self.ttl_seconds
+        expired = [key for key, entry in self._entries.items() if entry.created_at < cutoff]
+        for key in expired:
+            del self._entries[key]
+
+    def _record(self, hit: Optional[_CacheEntry]) -> None:
+        self._requests += 1
+        if hit is not None:
+            self._hits += 1
+        answer_cache_requests.labels(result='hit' if hit is not None else 'miss').inc()
+        answer_cache_hit_ratio.set(self._hits / self._requests)
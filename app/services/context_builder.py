@@ -0,0 +1,126 @@
+import math
+import re
+from typing import Optional
+
+import numpy as np
+
+from app.models import Article
+
+## newsapi truncates content with a "[+1234 chars]" tail
+_TRUNCATION_PATTERN = re.compile(r"\s*\[\+\d+ chars\]\s*$")
+_SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English text), good enough for budgeting."""
+    return math.ceil(len(text) / 4) if text else 0
+
+
+def chunk_article(article: Article, max_tokens=128) -> list[str]:
+    """Split an article's description and content into passages of at most ~max_tokens.
+
+    Boilerplate (url, author, source, the truncation tail) is left out, it is
+    carried in the passage metadata instead.
+    """
+    body = " ".join(part.strip() for part in (article.description, _TRUNCATION_PATTERN.sub("", article.content or "")) if part and part.strip())
+    if not body:
+        body = article.title or ""
+    passages = []
+    current = []
+    current_tokens = 0
+    for sentence in _SENTENCE_PATTERN.split(body):
+        sentence_tokens = estimate_tokens(sentence)
+        if current and current_tokens + sentence_tokens > max_tokens:
+            passages.append(" ".join(current))
+            current, current_tokens = [], 0
+        ## a single overlong sentence is hard wrapped
+        while sentence_tokens > max_tokens:
+            cut = max_tokens * 4
+            passages.append(sentence[:cut])
+            sentence = sentence[cut:]
+            sentence_tokens = estimate_tokens(sentence)
+        if sentence:
+            current.append(sentence)
+            current_tokens += sentence_tokens
+    if current:
+        passages.append(" ".join(current))
+    return passages
+
+
+def mmr_select(query_embedding: np.ndarray, embeddings: np.ndarray, token_counts: list[int], token_budget: int, diversity_lambda=0.7) -> list[int]:
+    """Maximal marginal relevance selection of passages under a token budget.
+
+    Returns the indexes of the selected passages in selection order.
+    """
+    if not len(embeddings):
+        return []
+    vectors = embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+    query = query_embedding / max(np.linalg.norm(query_embedding), 1e-12)
+    relevance = vectors @ query
+    max_redundancy = np.full(len(vectors), -np.inf)
+    remaining = token_budget
+    selected: list[int] = []
+    available = np.ones(len(vectors), dtype=bool)
+    while available.any():
+        redundancy = np.where(np.isfinite(max_redundancy), max_redundancy, 0.0)
+        scores = np.where(available, diversity_lambda * relevance - (1 - diversity_lambda) * redundancy, -np.inf)
+        best = int(np.argmax(scores))
+        available[best] = False
+        if token_counts[best] > remaining:
+            continue
+        selected.append(best)
+        remaining -= token_counts[best]
+        max_redundancy = np.maximum(max_redundancy, vectors @ vectors[best])
+    return selected
+
+
+class ContextBuilder:
+    """Packs the most relevant, diverse passages of the retrieved articles into a token budget.
+
+    Passages of the retrieved articles are picked with MMR until the budget is
+    spent, then grouped back under their article in retrieval order. Articles
+    without passages (ingested before chunking) fall back to their stored text.
+    """
+
+    def __init__(self, token_budget=1500, diversity_lambda=0.7):
+        self.token_budget = token_budget
+        self.diversity_lambda = diversity_lambda
+
+    def build(self, query_embedding, search_results: list[dict], passages: list[dict], token_budget: Optional[int] = None) -> str:
+        """`passages` are dicts with article_id, text and embedding, as returned by RAGService.search_passages."""
+        remaining = token_budget if token_budget is not None else self.token_budget
+        articles = {result['id']: result for result in search_results}
+        passages = [passage for passage in passages if passage['article_id'] in articles]
+        with_passages = {passage['article_id'] for passage in passages}
+        selected: dict[str, list[str]] = {}
+
+        if passages:
+            ## reserve the headers of every article that may contribute a passage
+            remaining -= sum(estimate_tokens(self._header(0, articles[article_id])) for article_id in with_passages)
+            embeddings = np.asarray([passage['embedding'] for passage in passages], dtype=np.float32)
+            token_counts = [estimate_tokens(passage['text']) for passage in passages]
+            chosen = mmr_select(np.asarray(query_embedding, dtype=np.float32).reshape(-1), embeddings, token_counts, remaining, self.diversity_lambda)
+            for index in chosen:
+                selected.setdefault(passages[index]['article_id'], []).append(passages[index]['text'])
+            remaining -= sum(token_counts[index] for index in chosen)
+            ## give back the headers of articles that got no passage
+            remaining += sum(estimate_tokens(self._header(0, articles[article_id])) for article_id in with_passages - selected.keys())
+
+        for result in search_results:
+            if result['id'] in with_passages:
+                continue
+            room = remaining - estimate_tokens(self._header(0, result))
+            if room <= 0:
+                break
+            text = _TRUNCATION_PATTERN.sub("", result['content'])[:room * 4]
+            selected[result['id']] = [text]
+            remaining -= estimate_tokens(self._header(0, result)) + estimate_tokens(text)
+
+        ## keep the retrieval order of the articles
+        ordered = [result for result in search_results if result['id'] in selected]
+        return "\n".join(self._header(i + 1, result) + " ... ".join(selected[result['id']]) + "\n"
+                         for i, result in enumerate(ordered))
+
+    @staticmethod
+    def _header(number: int, result: dict) -> str:
+        return f"Article {number} Title: {result['title']}\nSource: {result['source_name']}\nContent: "
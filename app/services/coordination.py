@@ -0,0 +1,146 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Optional
+
+
+def _connect(db_path: str, journal_mode="WAL", timeout=30.0) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    ## autocommit, every write below opens its own BEGIN IMMEDIATE transaction
+    conn = sqlite3.connect(db_path, timeout=timeout, isolation_level=None, check_same_thread=False)
+    conn.execute(f"PRAGMA journal_mode={journal_mode}")
+    return conn
+
+
+class LeaderLease:
+    """Time-bound lease in a shared SQLite file, electing a single writer among workers and replicas.
+
+    Every process calls `acquire()` periodically. The holder renews its lease
+    while it is alive, the others take it over once it has expired, so a
+    crashed leader is replaced after at most `ttl_seconds`. `is_leader` turns
+    false as soon as the lease this process last wrote has expired, even when
+    the renewal is still stuck behind a lock.
+    """
+
+    def __init__(self, db_path: str, name="ingestion", ttl_seconds=15.0, holder: Optional[str] = None, journal_mode="WAL"):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.holder = holder or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._expires_at = 0.0
+        ## a renewal waiting on the file lock must give up well before the lease runs out
+        self._conn = _connect(db_path, journal_mode, timeout=ttl_seconds / 3)
+        self._lock = threading.Lock()
+        self._conn.execute("CREATE TABLE IF NOT EXISTS leases (name TEXT PRIMARY KEY, holder TEXT NOT NULL, expires_at REAL NOT NULL)")
+
+    def acquire(self) -> bool:
+        """Take or renew the lease, returns whether this process is the leader."""
+        now = time.time()
+        with self._lock:
+            try:
+                self._conn.execute("BEGIN IMMEDIATE")
+                row = self._conn.execute("SELECT holder, expires_at FROM leases WHERE name = ?", (self.name,)).fetchone()
+                leader = row is None or row[0] == self.holder or row[1] < now
+                if leader:
+                    self._conn.execute("INSERT OR REPLACE INTO leases (name, holder, expires_at) VALUES (?, ?, ?)",
+                                       (self.name, self.holder, now + self.ttl_seconds))
+                self._conn.execute("COMMIT")
+            except Exception:
+                if self._conn.in_transaction:
+                    self._conn.execute("ROLLBACK")
+                self._expires_at = 0.0
+                raise
+        if leader and not self.is_leader:
+            print(f"{self.holder} became the {self.name} leader")
+        ## counted from before the lock wait, never later than what other processes see
+        self._expires_at = now + self.ttl_seconds if leader else 0.0
+        return leader
+
+    @property
+    def is_leader(self) -> bool:
+        return time.time() < self._expires_at
+
+    def release(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM leases WHERE name = ? AND holder = ?", (self.name, self.holder))
+        self._expires_at = 0.0
+
+    def current_holder(self) -> Optional[str]:
+        row = self._conn.execute("SELECT holder FROM leases WHERE name = ? AND expires_at >= ?", (self.name, time.time())).fetchone()
+        return row[0] if row else None
+
+
+class SharedJobQueue:
+    """Ingestion job queue in a shared SQLite file.
+
+    Any worker can enqueue a job or read its status; the elected leader claims
+    queued jobs one at a time. Jobs are stored as their `to_dict()` payload.
+    """
+
+    def __init__(self, db_path: str, journal_mode="WAL"):
+        self._conn = _connect(db_path, journal_mode)
+        self._lock = threading.Lock()
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, status TEXT NOT NULL, worker TEXT, created_at REAL NOT NULL, payload TEXT NOT NULL);
+            CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created_at);
+        """)
+
+    def put(self, job: dict, max_queued: int) -> bool:
+        """Enqueue a job, returns False when `max_queued` jobs are already waiting."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                queued = self._conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+                if queued < max_queued:
+                    self._conn.execute("INSERT INTO jobs (id, status, created_at, payload) VALUES (?, ?, ?, ?)",
+                                       (job["id"], job["status"], job["created_at"], json.dumps(job)))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return queued < max_queued
+
+    def claim(self, worker: str) -> Optional[dict]:
+        """Mark the oldest queued job as running on `worker` and return it."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT id, payload FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1").fetchone()
+                if row is not None:
+                    self._conn.execute("UPDATE jobs SET status = 'running', worker = ? WHERE id = ?", (worker, row[0]))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return json.loads(row[1]) if row is not None else None
+
+    def update(self, job: dict, worker: Optional[str] = None) -> bool:
+        """Store the job, only while it is still claimed by `worker` when one is given."""
+        with self._lock:
+            if worker is None:
+                return self._conn.execute("UPDATE jobs SET status = ?, payload = ? WHERE id = ?", (job["status"], json.dumps(job), job["id"])).rowcount > 0
+            return self._conn.execute("UPDATE jobs SET status = ?, payload = ? WHERE id = ? AND worker = ?",
+                                      (job["status"], json.dumps(job), job["id"], worker)).rowcount > 0
+
+    def get(self, job_id: str) -> Optional[dict]:
+        row = self._conn.execute("SELECT status, payload FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        ## the status column is the source of truth, the payload is only rewritten on start and finish
+        return {**json.loads(row[1]), "status": row[0]}
+
+    def qsize(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+
+    def requeue_orphans(self, worker: str) -> int:
+        """Put jobs left running by a previous leader back on the queue."""
+        with self._lock:
+            return self._conn.execute("UPDATE jobs SET status = 'queued', worker = NULL WHERE status = 'running' AND worker != ?", (worker,)).rowcount
+
+    def trim(self, max_jobs_kept: int) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM jobs WHERE status IN ('completed', 'failed') AND id NOT IN "
+                               "(SELECT id FROM jobs ORDER BY created_at DESC LIMIT ?)", (max_jobs_kept,))
@@ -0,0 +1,221 @@
+import argparse
+import json
+import mmap
+import os
+import shutil
+from typing import Iterable, Iterator, Optional
+
+import numpy as np
+
+from app.models import Article, parse_published_at
+from app.services.storage import ARTICLE_COLUMNS, ArticleStorage
+
+## Columnar, memory-mapped snapshot of the corpus for bulk jobs (reindexing,
+## stats, dedup) that would otherwise build hundreds of thousands of Articles.
+## A snapshot is a directory with
+##   meta.json                  row count, embedding dim, format version
+##   <column>.heap              utf-8 text of every row of a text column, back to back
+##   <column>.offsets.npy       int64 (rows + 1), row i is heap[offsets[i]:offsets[i+1]]
+##   <column>.nulls.npy         bool, rows whose value is None
+##   published_ts.npy           int64 epoch seconds, MISSING_TS when undated
+##   embeddings.f32             float32 (rows, dim) article vectors, zeros when missing
+##   has_embedding.npy          bool
+## Everything is opened with mmap, so loading is O(1) and the page cache holds
+## the data instead of the python heap.
+##
+##   python -m app.services.corpus_snapshot --storage-path ../data/articles.db --db-path ../data/chroma_db --out ../data/corpus_snapshot
+
+FORMAT_VERSION = 1
+MISSING_TS = np.iinfo(np.int64).min
+
+
+class TextColumn:
+    """One text column of a snapshot, values are decoded only when read."""
+
+    def __init__(self, heap, offsets: np.ndarray, nulls: np.ndarray):
+        self.heap = heap
+        self.offsets = offsets
+        self.nulls = nulls
+
+    def __len__(self):
+        return len(self.nulls)
+
+    def __getitem__(self, i) -> Optional[str]:
+        if self.nulls[i]:
+            return None
+        return self.heap[self.offsets[i]:self.offsets[i + 1]].decode("utf-8")
+
+    def view(self, i) -> memoryview:
+        """The utf-8 bytes of row `i` without copying them out of the map."""
+        return memoryview(self.heap)[self.offsets[i]:self.offsets[i + 1]]
+
+    def lengths(self) -> np.ndarray:
+        """Byte length of every row."""
+        return np.diff(self.offsets)
+
+    def contains(self, needle: str) -> np.ndarray:
+        """Indices of the rows containing `needle` (case sensitive), found in one pass over the heap."""
+        needle = needle.encode("utf-8")
+        rows = []
+        position = self.heap.find(needle) if needle else -1
+        while position != -1:
+            row = int(np.searchsorted(self.offsets, position, side="right")) - 1
+            ## a match straddling two rows belongs to neither
+            if position + len(needle) <= self.offsets[row + 1]:
+                rows.append(row)
+                position = self.heap.find(needle, int(self.offsets[row + 1]))
+            else:
+                position = self.heap.find(needle, position + 1)
+        return np.asarray(rows, dtype=np.int64)
+
+
+class CorpusSnapshot:
+    """Read side of a snapshot directory written by `write_snapshot`."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta["version"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported corpus snapshot version {self.meta['version']} in {path}")
+        self._files = []
+        self.columns = {column: self._open_column(column) for column in self.meta["columns"]}
+        self.published_ts = np.load(os.path.join(path, "published_ts.npy"), mmap_mode="r")
+        self.has_embedding = np.load(os.path.join(path, "has_embedding.npy"), mmap_mode="r")
+        rows, dim = self.meta["rows"], self.meta["dim"]
+        self.embeddings = np.memmap(os.path.join(path, "embeddings.f32"), dtype=np.float32, mode="r", shape=(rows, dim)) if rows and dim else np.zeros((rows, dim), dtype=np.float32)
+
+    def _open_column(self, column) -> TextColumn:
+        heap_path = os.path.join(self.path, f"{column}.heap")
+        if os.path.getsize(heap_path):
+            f = open(heap_path, "rb")
+            self._files.append(f)
+            heap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            ## mmap refuses empty files
+            heap = b""
+        return TextColumn(heap,
+                          np.load(os.path.join(self.path, f"{column}.offsets.npy"), mmap_mode="r"),
+                          np.load(os.path.join(self.path, f"{column}.nulls.npy"), mmap_mode="r"))
+
+    def __len__(self):
+        return self.meta["rows"]
+
+    def __getitem__(self, column) -> TextColumn:
+        return self.columns[column]
+
+    def article(self, i) -> Article:
+        return Article(**{column: self.columns[column][i] for column in ARTICLE_COLUMNS if column != "id"})
+
+    def iter_articles(self, start=0, stop=None) -> Iterator[Article]:
+        for i in range(start, len(self) if stop is None else stop):
+            yield self.article(i)
+
+    def close(self):
+        for column in self.columns.values():
+            if isinstance(column.heap, mmap.mmap):
+                column.heap.close()
+        for f in self._files:
+            f.close()
+        self._files = []
+
+
+def write_snapshot(path, batches: Iterable[list[dict]], embeddings_for=None) -> int:
+    """Write a snapshot of the row batches (as yielded by ArticleStorage.iter_rows) to `path`.
+
+    `embeddings_for(ids)` returns {id: vector} for the ids it knows. The snapshot
+    is built in `path`.tmp and swapped in once complete, readers of the previous
+    snapshot keep their maps. Returns the number of rows written.
+    """
+    tmp_path = path + ".tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    heaps = {column: open(os.path.join(tmp_path, f"{column}.heap"), "wb") for column in ARTICLE_COLUMNS}
+    sizes = {column: 0 for column in ARTICLE_COLUMNS}
+    offsets = {column: [np.zeros(1, dtype=np.int64)] for column in ARTICLE_COLUMNS}
+    nulls = {column: [] for column in ARTICLE_COLUMNS}
+    published_ts, has_embedding = [], []
+    dim = 0
+    rows = 0
+    try:
+        with open(os.path.join(tmp_path, "embeddings.f32"), "wb") as embeddings_file:
+            for batch in batches:
+                for column in ARTICLE_COLUMNS:
+                    encoded = [(row[column] or "").encode("utf-8") for row in batch]
+                    heaps[column].write(b"".join(encoded))
+                    lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+                    offsets[column].append(sizes[column] + np.cumsum(lengths))
+                    sizes[column] += int(lengths.sum())
+                    nulls[column].append(np.fromiter((row[column] is None for row in batch), dtype=bool, count=len(batch)))
+                published_ts.append(np.fromiter((MISSING_TS if (ts := parse_published_at(row["published_at"])) is None else ts for row in batch),
+                                                dtype=np.int64, count=len(batch)))
+                vectors = embeddings_for([row["id"] for row in batch]) if embeddings_for is not None else {}
+                if vectors and not dim:
+                    dim = len(next(iter(vectors.values())))
+                    ## rows written before the dimension was known get zero vectors
+                    embeddings_file.write(np.zeros((rows, dim), dtype=np.float32).tobytes())
+                if dim:
+                    matrix = np.zeros((len(batch), dim), dtype=np.float32)
+                    for i, row in enumerate(batch):
+                        if row["id"] in vectors:
+                            matrix[i] = vectors[row["id"]]
+                    embeddings_file.write(matrix.tobytes())
+                has_embedding.append(np.fromiter((row["id"] in vectors for row in batch), dtype=bool, count=len(batch)))
+                rows += len(batch)
+    finally:
+        for heap in heaps.values():
+            heap.close()
+
+    for column in ARTICLE_COLUMNS:
+        np.save(os.path.join(tmp_path, f"{column}.offsets.npy"), np.concatenate(offsets[column]))
+        np.save(os.path.join(tmp_path, f"{column}.nulls.npy"), np.concatenate(nulls[column]) if nulls[column] else np.zeros(0, dtype=bool))
+    np.save(os.path.join(tmp_path, "published_ts.npy"), np.concatenate(published_ts) if published_ts else np.zeros(0, dtype=np.int64))
+    np.save(os.path.join(tmp_path, "has_embedding.npy"), np.concatenate(has_embedding) if has_embedding else np.zeros(0, dtype=bool))
+    with open(os.path.join(tmp_path, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"version": FORMAT_VERSION, "rows": rows, "dim": dim, "columns": list(ARTICLE_COLUMNS)}, f)
+
+    ## a directory can't be replaced atomically, move the old one aside first
+    old_path = path + ".old"
+    shutil.rmtree(old_path, ignore_errors=True)
+    if os.path.exists(path):
+        os.replace(path, old_path)
+    os.replace(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+    print(f"Wrote a corpus snapshot of {rows} articles to {path}")
+    return rows
+
+
+def collection_embeddings(collection):
+    """`embeddings_for` reading the article vectors of a vector store collection."""
+    def embeddings_for(ids):
+        result = collection.get(ids=ids, include=["embeddings"])
+        return dict(zip(result["ids"], result["embeddings"]))
+    return embeddings_for
+
+
+def build_snapshot(storage: ArticleStorage, path, collection=None, batch_size=1000) -> CorpusSnapshot:
+    """Snapshot every stored article, with its vector when `collection` is given, and open it."""
+    write_snapshot(path, storage.iter_rows(batch_size=batch_size),
+                   embeddings_for=collection_embeddings(collection) if collection is not None else None)
+    return CorpusSnapshot(path)
+
+
+def main():
+    from app.config import Config
+    from app.services.vector_index import create_vector_store
+
+    parser = argparse.ArgumentParser(description="Write a columnar, memory-mapped snapshot of the stored articles and their vectors.")
+    parser.add_argument("--storage-path", default="../data/articles.db")
+    parser.add_argument("--db-path", default="../data/chroma_db")
+    parser.add_argument("--out", default="../data/corpus_snapshot")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--no-embeddings", action="store_true")
+    args = parser.parse_args()
+
+    collection = None if args.no_embeddings else create_vector_store(Config(), db_path=args.db_path).get_or_create_collection("rag_collection")
+    snapshot = build_snapshot(ArticleStorage(storage_path=args.storage_path), args.out, collection=collection, batch_size=args.batch_size)
+    print(f"Snapshot: {len(snapshot)} articles, {int(snapshot.has_embedding.sum())} with embeddings")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+from typing import Optional
+
+import numpy as np
+
+from app.config import Config
+
+## pre-exported graphs shipped in the sentence-transformers model repos
+ONNX_FILE = "onnx/model.onnx"
+ONNX_QUANTIZED_FILE = "onnx/model_quint8_avx2.onnx"
+
+
+class EmbeddingBackend:
+    """Sentence embedding model behind the SentenceTransformer `encode()` signature.
+
+    RAGService only calls `encode`, so any object with that method (including
+    a plain SentenceTransformer) can be used as a backend.
+    """
+
+    ## identifies the vectors the backend produces, used to key the embedding cache
+    name = "base"
+
+    def encode(self, texts: list[str], batch_size=32, convert_to_numpy=True) -> np.ndarray:
+        raise NotImplementedError
+
+
+class TorchEmbeddingBackend(EmbeddingBackend):
+    """The PyTorch SentenceTransformer model."""
+
+    def __init__(self, model_name: str, device: Optional[str] = None):
+        ## pulls in torch
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name, device=device)
+        ## the original backend, keeps the cache keys of existing deployments
+        self.name = model_name
+
+    def encode(self, texts: list[str], batch_size=32, convert_to_numpy=True) -> np.ndarray:
+        return self.model.encode(texts, batch_size=batch_size, convert_to_numpy=convert_to_numpy)
+
+
+class OnnxEmbeddingBackend(EmbeddingBackend):
+    """The same model exported to ONNX and run on onnxruntime, optionally int8 quantized.
+
+    Only needs onnxruntime and tokenizers, so torch is never loaded. Mean
+    pooling and L2 normalisation reproduce the SentenceTransformer pipeline of
+    the MiniLM models.
+    """
+
+    def __init__(self, model_name: str, quantized=False, onnx_file: Optional[str] = None, max_length=256, threads=0):
+        import onnxruntime
+        from huggingface_hub import hf_hub_download
+        from tokenizers import Tokenizer
+
+        onnx_file = onnx_file or (ONNX_QUANTIZED_FILE if quantized else ONNX_FILE)
+        self.tokenizer = Tokenizer.from_file(hf_hub_download(model_name, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(hf_hub_download(model_name, onnx_file), options, providers=["CPUExecutionProvider"])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+        self.name = f"{model_name}:onnx:{onnx_file}"
+
+    def encode(self, texts: list[str], batch_size=32, convert_to_numpy=True) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.session.get_outputs()[0].shape[-1]), dtype=np.float32)
+        batches = [self._encode_batch(texts[start:start+batch_size]) for start in range(0, len(texts), batch_size)]
+        return np.vstack(batches)
+
+    def _encode_batch(self, texts: list[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        inputs = {
+            "input_ids": np.array([encoding.ids for encoding in encodings], dtype=np.int64),
+            "attention_mask": np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64),
+            "token_type_ids": np.array([encoding.type_ids for encoding in encodings], dtype=np.int64),
+        }
+        token_embeddings = self.session.run(None, {name: value for name, value in inputs.items() if name in self.input_names})[0]
+        mask = inputs["attention_mask"][:, :, None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        return (pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)).astype(np.float32)
+
+
+def create_embedding_backend(config: Optional[Config] = None) -> EmbeddingBackend:
+    """Build the backend selected by EMBEDDING_BACKEND (torch | onnx)."""
+    config = config or Config()
+    if config.embedding_backend == "torch":
+        return TorchEmbeddingBackend(config.embedding_model)
+    if config.embedding_backend == "onnx":
+        return OnnxEmbeddingBackend(config.embedding_model,
+                                    quantized=config.embedding_quantized,
+                                    onnx_file=config.embedding_onnx_file,
+                                    threads=config.embedding_onnx_threads)
+    raise ValueError(f"Unknown embedding backend: {config.embedding_backend}")
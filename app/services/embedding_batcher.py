@@ -0,0 +1,93 @@
+import asyncio
+import time
+from concurrent.futures import Executor
+from typing import Callable, Optional
+
+import numpy as np
+
+from app.metrics import embedding_batch_queue_delay, embedding_batch_size
+
+
+class EmbeddingBatcher:
+    """Dynamic micro-batcher for query embeddings.
+
+    Concurrent callers of `embed()` are collected for at most `max_wait_ms`
+    (or until `max_batch_size` texts are waiting) and encoded together in one
+    forward pass on `executor`. Up to `max_concurrent_batches` batches are
+    encoded at the same time, and each caller's future is resolved with its
+    own row of the result.
+    """
+
+    def __init__(self, encode: Callable[[list[str]], np.ndarray], executor: Executor,
+                 max_batch_size=32, max_wait_ms=5.0, max_concurrent_batches=1):
+        self.encode = encode
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._batch_slots_size = max_concurrent_batches
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def embed(self, text: str) -> np.ndarray:
+        self._ensure_started()
+        future = self._loop.create_future()
+        await self._queue.put((text, future, time.perf_counter()))
+        return await future
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    def _ensure_started(self) -> None:
+        ## the batcher is bound to the loop it was first used on
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._batch_slots = asyncio.Semaphore(self._batch_slots_size)
+            self._task = loop.create_task(self._collect())
+
+    async def _collect(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            deadline = self._loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - self._loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            ## don't start collecting the next batch until an encode slot is free,
+            ## requests arriving meanwhile join that next batch
+            await self._batch_slots.acquire()
+            self._loop.create_task(self._encode_batch(batch))
+
+    async def _encode_batch(self, batch) -> None:
+        try:
+            now = time.perf_counter()
+            embedding_batch_size.observe(len(batch))
+            for _, _, enqueued_at in batch:
+                embedding_batch_queue_delay.observe(now - enqueued_at)
+
+            texts = [text for text, _, _ in batch]
+            try:
+                vectors = await self._loop.run_in_executor(self.executor, self.encode, texts)
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+            for (_, future, _), vector in zip(batch, vectors):
+                if not future.done():
+                    future.set_result(vector)
+        finally:
+            self._batch_slots.release()
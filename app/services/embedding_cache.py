@@ -0,0 +1,137 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+import numpy as np
+
+from app.metrics import embedding_cache_evictions, embedding_cache_hits, embedding_cache_misses
+
+
+class EmbeddingCache:
+    """Content-addressed embedding cache.
+
+    Vectors are keyed by a hash of (model name, text). Lookups go through an
+    in-memory LRU first and then a SQLite blob store on disk. Both tiers are
+    size bounded and evict the least recently used entries. Disk hits only
+    refresh an entry's last access when it is older than `touch_interval`
+    seconds, and those refreshes are written with the next insert (or once
+    `touch_batch_size` are pending), so reads don't take the shared write lock.
+    """
+
+    def __init__(self, model_name: str, db_path="../data/embedding_cache.sqlite3", memory_size=10_000, disk_size=500_000, journal_mode="WAL",
+                 touch_interval=3600.0, touch_batch_size=1000):
+        self.model_name = model_name
+        self.memory_size = memory_size
+        self.disk_size = disk_size
+        self.touch_interval = touch_interval
+        self.touch_batch_size = touch_batch_size
+        self._touched: dict[str, float] = {}
+        self._memory: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        ## shared between workers, wait on their write locks instead of failing
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.execute(f"PRAGMA journal_mode={journal_mode}")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_access REAL NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings(last_access)")
+        self._conn.commit()
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode('utf-8')).hexdigest()
+
+    def get_many(self, texts: list[str]) -> list[Optional[np.ndarray]]:
+        keys = [self.key(text) for text in texts]
+        results: list[Optional[np.ndarray]] = [None] * len(texts)
+        disk_lookup = {}
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    results[i] = vector
+                    embedding_cache_hits.labels(tier='memory').inc()
+                else:
+                    disk_lookup.setdefault(key, []).append(i)
+
+            if disk_lookup:
+                found = self._read_disk(list(disk_lookup))
+                for key, vector in found.items():
+                    for i in disk_lookup[key]:
+                        results[i] = vector
+                    self._remember(key, vector)
+                embedding_cache_hits.labels(tier='disk').inc(sum(len(disk_lookup[key]) for key in found))
+                embedding_cache_misses.inc(sum(len(idx) for key, idx in disk_lookup.items() if key not in found))
+        return results
+
+    def put_many(self, texts: list[str], vectors) -> None:
+        now = time.time()
+        rows = []
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                key = self.key(text)
+                vector = np.asarray(vector, dtype=np.float32)
+                self._remember(key, vector)
+                rows.append((key, vector.tobytes(), now))
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings (key, vector, last_access) VALUES (?, ?, ?)", rows)
+            self._flush_touched()
+            self._evict_disk()
+            self._conn.commit()
+
+    def encode(self, texts: list[str], encoder: Callable[[list[str]], np.ndarray]) -> np.ndarray:
+        """Return a (len(texts), dim) float32 matrix, calling `encoder` only for cache misses."""
+        cached = self.get_many(texts)
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, cached) if vector is None))
+        if missing:
+            encoded = dict(zip(missing, np.asarray(encoder(missing), dtype=np.float32)))
+            self.put_many(missing, [encoded[text] for text in missing])
+            cached = [vector if vector is not None else encoded[text] for text, vector in zip(texts, cached)]
+        return np.vstack(cached) if cached else np.empty((0, 0), dtype=np.float32)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self._touched.clear()
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+            embedding_cache_evictions.labels(tier='memory').inc()
+
+    def _read_disk(self, keys: list[str]) -> dict[str, np.ndarray]:
+        found = {}
+        ## stay below sqlite's bound parameter limit
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start+500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self._conn.execute(f"SELECT key, vector, last_access FROM embeddings WHERE key IN ({placeholders})", chunk).fetchall()
+            now = time.time()
+            for key, blob, last_access in rows:
+                found[key] = np.frombuffer(blob, dtype=np.float32)
+                ## eviction only needs a rough order, an entry touched recently is recent enough
+                if now - last_access > self.touch_interval:
+                    self._touched[key] = now
+        if len(self._touched) >= self.touch_batch_size:
+            self._flush_touched()
+            self._conn.commit()
+        return found
+
+    def _flush_touched(self) -> None:
+        if self._touched:
+            self._conn.executemany("UPDATE embeddings SET last_access = ? WHERE key = ?", [(now, key) for key, now in self._touched.items()])
+            self._touched.clear()
+
+    def _evict_disk(self) -> None:
+        total = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        overflow = total - self.disk_size
+        if overflow > 0:
+            self._conn.execute("DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_access LIMIT ?)", (overflow,))
+            embedding_cache_evictions.labels(tier='disk').inc(overflow)
@@ -0,0 +1,36 @@
+import argparse
+
+from app.services.rag_service import RAGService
+from app.services.storage import ArticleStorage
+
+## One-off migration from the truncated 24 bit url hash ids to the full 128 bit
+## digest of the normalized url. Streams both stores in bounded batches and
+## reuses the stored vectors, nothing is re-embedded.
+##
+##   python -m app.services.id_migration --storage-path ../data/articles.db --db-path ../data/chroma_db
+
+
+def migrate_ids(rag_service: RAGService, storage: ArticleStorage, batch_size=500) -> dict:
+    ## alternates of near duplicate clusters only live in the article store, so
+    ## their new ids are staged from the storage pass. The cluster index is only
+    ## rewritten at the end of the vector pass, after both stores swapped, so an
+    ## interrupted run can simply be started again.
+    on_storage_batch = rag_service.near_duplicates.stage_rekey if rag_service.near_duplicates is not None else None
+    stored = storage.rekey_ids(batch_size=batch_size, on_batch=on_storage_batch)
+    vectors = rag_service.rekey_ids(batch_size=batch_size)
+    return {"articles_rekeyed": stored, "vectors_rekeyed": vectors}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-key stored articles and vectors to the collision safe id scheme.")
+    parser.add_argument("--storage-path", default="../data/articles.db")
+    parser.add_argument("--db-path", default="../data/chroma_db")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    result = migrate_ids(RAGService(db_path=args.db_path), ArticleStorage(storage_path=args.storage_path), batch_size=args.batch_size)
+    print(f"Migration finished: {result}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional
+
+from app.metrics import articles_fetched, articles_stored, ingestion_queue_depth
+from app.models import Article
+from app.services.coordination import LeaderLease, SharedJobQueue
+from app.services.news_fetcher import NewsFetcher
+from app.services.rag_service import RAGService
+from app.services.storage import ArticleStorage
+from app.tracing import stage, tracer
+
+
+class IngestionJob:
+    """A single fetch request moving through the ingestion pipeline."""
+
+    def __init__(self, query=None, country="us", category="sports", page_size=10, page=1):
+        self.id = uuid.uuid4().hex
+        self.query = query
+        self.country = country
+        self.category = category
+        self.page_size = page_size
+        self.page = page
+        self.status = "queued"
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.fetched = 0
+        self.new_articles = 0
+        self.articles: list[Article] = []
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "status": self.status,
+            "query": self.query,
+            "country": self.country,
+            "category": self.category,
+            "page_size": self.page_size,
+            "page": self.page,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "fetched": self.fetched,
+            "new_articles": self.new_articles,
+            "articles": [article.to_dict() for article in self.articles],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "IngestionJob":
+        job = cls(query=data["query"], country=data["country"], category=data["category"],
+                  page_size=data.get("page_size", 10), page=data.get("page", 1))
+        for field in ("id", "status", "error", "created_at", "started_at", "finished_at", "fetched", "new_articles"):
+            setattr(job, field, data[field])
+        job.articles = [Article(**{key: value for key, value in article.items() if key != "id"}) for article in data["articles"]]
+        return job
+
+
+class Subscription:
+    """A (country, category, query) tuple fetched on a fixed interval."""
+
+    def __init__(self, country="us", category=None, query=None, page_size=20, interval_seconds=900):
+        self.country = country
+        self.category = category
+        self.query = query
+        self.page_size = page_size
+        self.interval_seconds = interval_seconds
+        self.next_run = 0.0
+
+
+class IngestionWorker:
+    """Background fetch -> parse -> dedup -> embed -> persist pipeline.
+
+    Jobs are put on a bounded queue and processed by a single worker thread, so
+    request handlers only pay for the enqueue. A scheduler thread enqueues the
+    configured subscriptions when they are due.
+
+    With a shared job queue and a leader lease (several uvicorn workers or
+    replicas on one store) every process accepts jobs, but only the elected
+    leader runs the scheduler and processes them, so each article is embedded
+    and written once.
+    """
+
+    def __init__(self, news_fetcher: NewsFetcher, storage: ArticleStorage, rag_service: RAGService,
+                 max_queue_size=100, max_jobs_kept=1000, subscriptions: Optional[list[Subscription]] = None,
+                 job_queue: Optional[SharedJobQueue] = None, lease: Optional[LeaderLease] = None):
+        self.news_fetcher = news_fetcher
+        self.storage = storage
+        self.rag_service = rag_service
+        self.max_queue_size = max_queue_size
+        self.max_jobs_kept = max_jobs_kept
+        self.subscriptions = subscriptions or []
+        self.job_queue = job_queue
+        self.lease = lease
+        self._queue: queue.Queue[Optional[IngestionJob]] = queue.Queue(maxsize=max_queue_size)
+        self._jobs: OrderedDict[str, IngestionJob] = OrderedDict()
+        self._jobs_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads: list[threading.Thread] = []
+
+    @property
+    def is_leader(self) -> bool:
+        return self.lease is None or self.lease.is_leader
+
+    def start(self):
+        self._stop.clear()
+        self._threads = [threading.Thread(target=self._run if self.job_queue is None else self._run_shared, name="ingestion-worker", daemon=True)]
+        if self.lease is not None:
+            self._threads.append(threading.Thread(target=self._elect, name="ingestion-election", daemon=True))
+        if self.subscriptions:
+            self._threads.append(threading.Thread(target=self._schedule, name="ingestion-scheduler", daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout=10):
+        self._stop.set()
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        if self.lease is not None:
+            self.lease.release()
+
+    def submit(self, job: IngestionJob) -> IngestionJob:
+        """Enqueue a job, raises queue.Full when the pipeline is saturated."""
+        if self.job_queue is not None:
+            if not self.job_queue.put(job.to_dict(), self.max_queue_size):
+                raise queue.Full
+            ingestion_queue_depth.set(self.job_queue.qsize())
+            return job
+        self._queue.put_nowait(job)
+        with self._jobs_lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.max_jobs_kept:
+                self._jobs.popitem(last=False)
+        ingestion_queue_depth.set(self._queue.qsize())
+        return job
+
+    def get_job(self, job_id: str) -> Optional[IngestionJob]:
+        if self.job_queue is not None:
+            data = self.job_queue.get(job_id)
+            return IngestionJob.from_dict(data) if data is not None else None
+        with self._jobs_lock:
+            return self._jobs.get(job_id)
+
+    def _elect(self):
+        ## renew well within the ttl so a live leader never loses the lease
+        while not self._stop.is_set():
+            was_leader = self.lease.is_leader
+            try:
+                if self.lease.acquire() and not was_leader:
+                    requeued = self.job_queue.requeue_orphans(self.lease.holder) if self.job_queue is not None else 0
+                    if requeued:
+                        print(f"Requeued {requeued} ingestion jobs left running by the previous leader.")
+            except Exception as e:
+                print(f"Leader election failed: {e}")
+            self._stop.wait(self.lease.ttl_seconds / 3)
+
+    def _schedule(self):
+        while not self._stop.is_set():
+            if not self.is_leader:
+                self._stop.wait(1)
+                continue
+            now = time.time()
+            for subscription in self.subscriptions:
+                if now < subscription.next_run:
+                    continue
+                try:
+                    self.submit(IngestionJob(query=subscription.query, country=subscription.country,
+                                             category=subscription.category, page_size=subscription.page_size))
+                    subscription.next_run = now + subscription.interval_seconds
+                except queue.Full:
+                    print("Ingestion queue is full, retrying subscription later.")
+            self._stop.wait(1)
+
+    def _run(self):
+        while not self._stop.is_set():
+            job = self._queue.get()
+            ingestion_queue_depth.set(self._queue.qsize())
+            if job is None:
+                break
+            self._execute(job)
+
+    def _run_shared(self):
+        while not self._stop.is_set():
+            if not self.is_leader:
+                self._stop.wait(1)
+                continue
+            worker = self.lease.holder if self.lease is not None else "local"
+            data = self.job_queue.claim(worker)
+            ingestion_queue_depth.set(self.job_queue.qsize())
+            if data is None:
+                self._stop.wait(0.5)
+                continue
+            job = IngestionJob.from_dict(data)
+            self._execute(job, on_start=lambda job: self.job_queue.update(job.to_dict(), worker))
+            ## a leader that lost its lease mid-job leaves the result alone, the new
+            ## leader has requeued the job and owns it now
+            if not self.is_leader or not self.job_queue.update(job.to_dict(), worker):
+                print(f"Lost the ingestion lease while running job {job.id}, not recording its result.")
+                continue
+            self.job_queue.trim(self.max_jobs_kept)
+
+    def _execute(self, job: IngestionJob, on_start=None):
+        job.status = "running"
+        job.started_at = time.time()
+        if on_start is not None:
+            on_start(job)
+        try:
+            with tracer.start_as_current_span("ingestion.job", attributes={"job.id": job.id}):
+                self.process(job)
+            job.status = "completed"
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            print(f"Ingestion job {job.id} failed: {e}")
+        finally:
+            job.finished_at = time.time()
+
+    def process(self, job: IngestionJob):
+        with stage("ingestion.fetch"):
+            raw_articles = self.news_fetcher.fetch_raw(query=job.query, country=job.country, category=job.category,
+                                                       page_size=job.page_size, page=job.page)
+
+        with stage("ingestion.parse"):
+            articles = self.news_fetcher.parse_articles(raw_articles, category=self.news_fetcher.category_for(job.query, job.category))
+        job.fetched = len(articles)
+        job.articles = articles
+        articles_fetched.labels(source="newsapi", category=job.category).inc(len(articles))
+
+        with stage("ingestion.dedup"):
+            unique_articles = {}
+            for article in articles:
+                unique_articles.setdefault(article.id, article)
+            existing_ids = self.rag_service.existing_ids(list(unique_articles))
+            new_articles = [article for article_id, article in unique_articles.items() if article_id not in existing_ids]
+            ## syndicated copies are not embedded, only recorded on their canonical article
+            new_articles, alternates, clusters = self.rag_service.collapse_near_duplicates(new_articles)
+
+        with stage("ingestion.embed"):
+            texts = [article.get_full_text() for article in new_articles]
+            embeddings = self.rag_service.embed(texts) if texts else None
+            passages = self.rag_service.embed_passages(new_articles)
+
+        with stage("ingestion.persist"):
+            if not self.is_leader:
+                raise RuntimeError("lost the ingestion lease before persisting")
+            job.new_articles = self.storage.save_articles(articles)
+            articles_stored.inc(job.new_articles)
+            if new_articles:
+                self.rag_service.write_embeddings(new_articles, texts, embeddings)
+                self.rag_service.write_passages(passages)
+            self.rag_service.attach_alternates(alternates)
+            self.rag_service.record_near_duplicates(clusters)
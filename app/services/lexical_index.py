@@ -0,0 +1,126 @@
+import heapq
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have in is it its of on or that the this to was were will with
+title description content url source published author none
+""".split())
+
+
+def tokenize(text: str) -> list[str]:
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class LexicalIndex:
+    """Incrementally updated BM25 inverted index persisted in SQLite.
+
+    Postings are stored as (term, doc_id, tf) rows in a WITHOUT ROWID table, so
+    adding a batch of documents only writes that batch's postings and a query
+    only reads the postings of its own terms.
+    """
+
+    def __init__(self, db_path="../data/lexical_index.sqlite3", k1=1.5, b=0.75, journal_mode="WAL"):
+        self.k1 = k1
+        self.b = b
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        ## other workers may write concurrently, wait on their locks instead of failing
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._conn.execute(f"PRAGMA journal_mode={journal_mode}")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS postings (term TEXT NOT NULL, doc_id TEXT NOT NULL, tf INTEGER NOT NULL, PRIMARY KEY (term, doc_id)) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS docs (doc_id TEXT PRIMARY KEY, length INTEGER NOT NULL) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS stats (id INTEGER PRIMARY KEY CHECK (id = 0), num_docs INTEGER NOT NULL, total_length INTEGER NOT NULL);
+        """)
+        ## corpus statistics live in the database rather than in memory, so every
+        ## process sharing the index scores against the same counts
+        self._conn.execute("INSERT OR IGNORE INTO stats (id, num_docs, total_length) SELECT 0, COUNT(*), COALESCE(SUM(length), 0) FROM docs")
+        self._conn.commit()
+
+    def _stats(self) -> tuple[int, int]:
+        return self._conn.execute("SELECT num_docs, total_length FROM stats WHERE id = 0").fetchone()
+
+    def __len__(self):
+        return self._stats()[0]
+
+    def add(self, doc_ids: list[str], texts: list[str]) -> None:
+        with self._lock, self._conn:
+            ## take the write lock before checking what exists, another process may be adding the same documents
+            self._conn.execute("BEGIN IMMEDIATE")
+            existing = self._existing(doc_ids)
+            postings = []
+            docs = []
+            for doc_id, text in zip(doc_ids, texts):
+                if doc_id in existing:
+                    continue
+                existing.add(doc_id)
+                tokens = tokenize(text)
+                docs.append((doc_id, len(tokens)))
+                postings.extend((term, doc_id, tf) for term, tf in Counter(tokens).items())
+            self._conn.executemany("INSERT INTO docs (doc_id, length) VALUES (?, ?)", docs)
+            self._conn.executemany("INSERT INTO postings (term, doc_id, tf) VALUES (?, ?, ?)", postings)
+            self._conn.execute("UPDATE stats SET num_docs = num_docs + ?, total_length = total_length + ? WHERE id = 0",
+                               (len(docs), sum(length for _, length in docs)))
+
+    def remove(self, doc_ids: list[str]) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            for start in range(0, len(doc_ids), 500):
+                chunk = doc_ids[start:start+500]
+                placeholders = ",".join("?" * len(chunk))
+                count, length = self._conn.execute(f"SELECT COUNT(*), COALESCE(SUM(length), 0) FROM docs WHERE doc_id IN ({placeholders})", chunk).fetchone()
+                self._conn.execute(f"DELETE FROM docs WHERE doc_id IN ({placeholders})", chunk)
+                self._conn.execute(f"DELETE FROM postings WHERE doc_id IN ({placeholders})", chunk)
+                self._conn.execute("UPDATE stats SET num_docs = num_docs - ?, total_length = total_length - ? WHERE id = 0", (count, length))
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM postings")
+            self._conn.execute("DELETE FROM docs")
+            self._conn.execute("UPDATE stats SET num_docs = 0, total_length = 0 WHERE id = 0")
+
+    def search(self, query: str, top_k=5) -> list[tuple[str, float]]:
+        """Return up to top_k (doc_id, bm25 score) pairs, best first."""
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+        with self._lock:
+            num_docs, total_length = self._stats()
+            if not num_docs:
+                return []
+            avg_length = total_length / num_docs
+            scores: dict[str, float] = {}
+            for term in terms:
+                rows = self._conn.execute(
+                    "SELECT p.doc_id, p.tf, d.length FROM postings p JOIN docs d ON d.doc_id = p.doc_id WHERE p.term = ?", (term,)
+                ).fetchall()
+                if not rows:
+                    continue
+                idf = math.log(1 + (num_docs - len(rows) + 0.5) / (len(rows) + 0.5))
+                for doc_id, tf, length in rows:
+                    norm = tf + self.k1 * (1 - self.b + self.b * length / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / norm
+        return heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+
+    def _existing(self, doc_ids: list[str]) -> set[str]:
+        existing = set()
+        for start in range(0, len(doc_ids), 500):
+            chunk = doc_ids[start:start+500]
+            rows = self._conn.execute(f"SELECT doc_id FROM docs WHERE doc_id IN ({','.join('?' * len(chunk))})", chunk).fetchall()
+            existing.update(row[0] for row in rows)
+        return existing
+
+
+def reciprocal_rank_fusion(rankings: list[list[str]], k=60) -> list[tuple[str, float]]:
+    """Fuse several ranked id lists into one, scoring each id by sum(1 / (k + rank))."""
+    scores: dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
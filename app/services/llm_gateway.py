@@ -0,0 +1,331 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import AsyncIterator, Optional
+
+import numpy as np
+
+from app.metrics import (llm_api_latency, llm_circuit_state, llm_coalesced_requests, llm_fallbacks, llm_hedged_requests, llm_inflight,
+                         llm_provider_errors, llm_queries, llm_queue_wait, llm_time_to_first_token)
+from app.tracing import stage
+
+## recent latencies kept per provider for the hedging threshold, and how many are needed before it is trusted
+LATENCY_WINDOW = 200
+MIN_LATENCY_SAMPLES = 20
+
+
+class CircuitOpenError(Exception):
+    """No provider accepted the call, every circuit is open."""
+
+
+class CircuitBreaker:
+    """Stops calling a provider after `failure_threshold` consecutive failures.
+
+    Once open, calls are refused for `reset_seconds`, then a single probe call
+    is let through (half open): its success closes the circuit, its failure
+    opens it again.
+    """
+
+    CLOSED, HALF_OPEN, OPEN = 0, 1, 2
+
+    def __init__(self, name: str, failure_threshold=5, reset_seconds=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        ## the sync ask path calls in from threadpool threads
+        self._lock = threading.Lock()
+        self._set_state(self.CLOSED)
+
+    def _set_state(self, state: int) -> None:
+        self.state = state
+        llm_circuit_state.labels(provider=self.name).set(state)
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self._set_state(self.HALF_OPEN)
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self._probing = False
+            self._set_state(self.CLOSED)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                self._set_state(self.OPEN)
+
+    def release(self) -> None:
+        """The call was cancelled before it could tell anything about the provider."""
+        with self._lock:
+            self._probing = False
+
+
+class LLMProvider:
+    """One LLM backend: a prompt | model | parser chain, its circuit breaker and recent latencies."""
+
+    def __init__(self, name: str, chain, breaker: Optional[CircuitBreaker] = None):
+        self.name = name
+        self.chain = chain
+        self.breaker = breaker or CircuitBreaker(name)
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def hedge_delay(self, percentile: float, min_seconds: float) -> float:
+        if len(self.latencies) < MIN_LATENCY_SAMPLES:
+            return min_seconds
+        return max(min_seconds, float(np.percentile(self.latencies, percentile)))
+
+
+class LLMGateway:
+    """Every LLM call of the process goes through here.
+
+    - identical in-flight prompts share one upstream call (singleflight),
+    - a call running longer than the `hedge_percentile` of recent latencies is
+      hedged with a second request on the next provider, never the same one
+      since that only doubles the token spend on an already slow provider,
+    - each call is bounded by `timeout_seconds` and at most `max_concurrency`
+      run at once, the wait for a slot is recorded,
+    - a failed call falls back to the next provider, providers whose circuit
+      is open are skipped.
+    Providers are tried in the order given, the first one is the primary.
+    """
+
+    def __init__(self, providers: list[LLMProvider], max_concurrency=16, timeout_seconds=30.0, hedge_percentile=95.0, hedge_min_seconds=2.0):
+        if not providers:
+            raise ValueError("LLMGateway needs at least one provider")
+        self.providers = providers
+        self.timeout_seconds = timeout_seconds
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_seconds = hedge_min_seconds
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        ## the sync path runs on threads, it gets the same bound through its own semaphore
+        self._sync_semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._inflight: dict[tuple, asyncio.Task] = {}
+        self._waiters: dict[tuple, int] = {}
+
+    async def agenerate(self, inputs: dict) -> str:
+        key = tuple(sorted(inputs.items()))
+        task = self._inflight.get(key)
+        if task is None or task.done():
+            task = asyncio.create_task(self._generate(inputs))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            llm_coalesced_requests.inc()
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            ## one caller going away must not cancel the call the others wait for
+            return await asyncio.shield(task)
+        finally:
+            self._waiters[key] -= 1
+            if not self._waiters[key]:
+                del self._waiters[key]
+                ## nobody is waiting any more, stop spending tokens on it
+                if not task.done():
+                    task.cancel()
+                    self._inflight.pop(key, None)
+
+    def _forget(self, key: tuple, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            ## retrieved here so an error nobody awaited any more isn't logged as unhandled
+            task.exception()
+
+    def _next_provider(self, remaining: list[LLMProvider]) -> Optional[LLMProvider]:
+        while remaining:
+            provider = remaining.pop(0)
+            if provider.breaker.allow():
+                return provider
+            llm_provider_errors.labels(provider=provider.name, reason="circuit_open").inc()
+        return None
+
+    async def _generate(self, inputs: dict) -> str:
+        remaining = list(self.providers)
+        primary = self._next_provider(remaining)
+        if primary is None:
+            raise CircuitOpenError("Every LLM provider's circuit is open.")
+        attempts = {asyncio.create_task(self._attempt(primary, inputs)): primary}
+        pending = set(attempts)
+        hedge = None
+        ## set once the hedge was sent or skipped, or right away when hedging is off or there is nowhere to hedge to
+        hedge_done = not self.hedge_percentile or not remaining
+        hedge_at = time.perf_counter() + primary.hedge_delay(self.hedge_percentile, self.hedge_min_seconds)
+        last_error, last_provider = None, primary
+        try:
+            while True:
+                timeout = None if hedge_done else max(0.0, hedge_at - time.perf_counter())
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedge_done = True
+                    ## hedges add load, never when calls are already queueing for a slot
+                    if self._semaphore.locked():
+                        continue
+                    target = self._next_provider(remaining)
+                    if target is not None:
+                        hedge = asyncio.create_task(self._attempt(target, inputs))
+                        attempts[hedge] = target
+                        pending.add(hedge)
+                    continue
+                for task in done:
+                    if task.exception() is None:
+                        if hedge is not None:
+                            llm_hedged_requests.labels(provider=attempts[hedge].name, outcome="won" if task is hedge else "lost").inc()
+                        return task.result()
+                    last_error, last_provider = task.exception(), attempts[task]
+                if pending:
+                    continue
+                ## every running attempt failed, move on to the next provider
+                fallback = self._next_provider(remaining)
+                if fallback is None:
+                    raise last_error
+                llm_fallbacks.labels(from_provider=last_provider.name, to_provider=fallback.name).inc()
+                hedge_done = True
+                task = asyncio.create_task(self._attempt(fallback, inputs))
+                attempts[task] = fallback
+                pending.add(task)
+        finally:
+            ## the losing attempts, or all of them when the caller was cancelled
+            for task in attempts:
+                task.cancel()
+
+    async def _attempt(self, provider: LLMProvider, inputs: dict) -> str:
+        queued_at = time.perf_counter()
+        try:
+            async with self._semaphore:
+                llm_queue_wait.observe(time.perf_counter() - queued_at)
+                llm_queries.labels(model=provider.name).inc()
+                llm_inflight.inc()
+                start_time = time.perf_counter()
+                try:
+                    with stage("llm.generate", provider=provider.name):
+                        async with asyncio.timeout(self.timeout_seconds):
+                            response = await provider.chain.ainvoke(inputs)
+                finally:
+                    llm_inflight.dec()
+        except asyncio.CancelledError:
+            provider.breaker.release()
+            raise
+        except Exception as e:
+            self._record_failure(provider, e)
+            raise
+        self._record_success(provider, time.perf_counter() - start_time)
+        return response
+
+    def generate(self, inputs: dict) -> str:
+        """Blocking version for the sync ask path: timeouts, circuit breaking and fallback, no hedging or coalescing."""
+        remaining = list(self.providers)
+        last_error, last_provider = None, None
+        while (provider := self._next_provider(remaining)) is not None:
+            if last_provider is not None:
+                llm_fallbacks.labels(from_provider=last_provider.name, to_provider=provider.name).inc()
+            queued_at = time.perf_counter()
+            with self._sync_semaphore:
+                llm_queue_wait.observe(time.perf_counter() - queued_at)
+                llm_queries.labels(model=provider.name).inc()
+                llm_inflight.inc()
+                start_time = time.perf_counter()
+                try:
+                    with stage("llm.generate", provider=provider.name):
+                        ## the client enforces its own request timeout on this path
+                        response = provider.chain.invoke(inputs)
+                except Exception as e:
+                    self._record_failure(provider, e)
+                    last_error, last_provider = e, provider
+                    continue
+                finally:
+                    llm_inflight.dec()
+            self._record_success(provider, time.perf_counter() - start_time)
+            return response
+        raise last_error or CircuitOpenError("Every LLM provider's circuit is open.")
+
+    async def astream(self, inputs: dict) -> AsyncIterator[str]:
+        """Stream the answer tokens. Falls back to the next provider only until the first token, after that errors reach the caller."""
+        remaining = list(self.providers)
+        last_error, last_provider = None, None
+        while (provider := self._next_provider(remaining)) is not None:
+            if last_provider is not None:
+                llm_fallbacks.labels(from_provider=last_provider.name, to_provider=provider.name).inc()
+            queued_at = time.perf_counter()
+            async with self._semaphore:
+                llm_queue_wait.observe(time.perf_counter() - queued_at)
+                llm_queries.labels(model=provider.name).inc()
+                llm_inflight.inc()
+                start_time = time.perf_counter()
+                stream = provider.chain.astream(inputs)
+                try:
+                    try:
+                        async with asyncio.timeout(self.timeout_seconds):
+                            first = await anext(stream)
+                    except StopAsyncIteration:
+                        self._record_success(provider, time.perf_counter() - start_time)
+                        return
+                    except Exception as e:
+                        self._record_failure(provider, e)
+                        last_error, last_provider = e, provider
+                        continue
+                    llm_time_to_first_token.labels(model=provider.name).observe(time.perf_counter() - start_time)
+                    yield first
+                    try:
+                        async for token in stream:
+                            yield token
+                    except Exception as e:
+                        self._record_failure(provider, e)
+                        raise
+                    self._record_success(provider, time.perf_counter() - start_time)
+                    return
+                except (asyncio.CancelledError, GeneratorExit):
+                    provider.breaker.release()
+                    raise
+                finally:
+                    llm_inflight.dec()
+                    await stream.aclose()
+        raise last_error or CircuitOpenError("Every LLM provider's circuit is open.")
+
+    def _record_success(self, provider: LLMProvider, duration: float) -> None:
+        provider.latencies.append(duration)
+        provider.breaker.record_success()
+        llm_api_latency.labels(model=provider.name).observe(duration)
+
+    def _record_failure(self, provider: LLMProvider, error: Exception) -> None:
+        provider.breaker.record_failure()
+        reason = "timeout" if isinstance(error, TimeoutError) else "error"
+        llm_provider_errors.labels(provider=provider.name, reason=reason).inc()
+        print(f"LLM call to {provider.name} failed ({reason}): {error!r}")
+
+
+def create_llm_gateway(config, prompt_template, llm, output_parser) -> LLMGateway:
+    """Gateway with `llm` as the primary provider, followed by the OpenAI-compatible
+    fallback when LLM_FALLBACK_MODEL is set."""
+    providers = [LLMProvider(config.llm_provider, prompt_template | llm | output_parser,
+                             CircuitBreaker(config.llm_provider, config.llm_circuit_failures, config.llm_circuit_reset_seconds))]
+    if config.llm_fallback_model:
+        from langchain_openai import ChatOpenAI
+        fallback = ChatOpenAI(
+            model=config.llm_fallback_model,
+            base_url=config.llm_fallback_base_url,
+            ## local OpenAI-compatible servers usually ignore the key, the client still wants one
+            api_key=config.llm_fallback_api_key or "unused",
+            temperature=config.temperature,
+            max_tokens=config.llm_max_tokens,
+            timeout=config.llm_timeout_seconds,
+            max_retries=config.llm_max_retries,
+        )
+        providers.append(LLMProvider("fallback", prompt_template | fallback | output_parser,
+                                     CircuitBreaker("fallback", config.llm_circuit_failures, config.llm_circuit_reset_seconds)))
+    return LLMGateway(providers, max_concurrency=config.llm_max_concurrency, timeout_seconds=config.llm_timeout_seconds,
+                      hedge_percentile=config.llm_hedge_percentile, hedge_min_seconds=config.llm_hedge_min_seconds)
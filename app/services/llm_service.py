@@ -1,20 +1,55 @@
 
+import asyncio
 import time
-from langchain_groq import ChatGroq
-from langchain_core.prompts import ChatPromptTemplate
+from typing import TYPE_CHECKING, AsyncIterator, Optional
 from app import config
-from app.services import rag_service
-from langchain_core.output_parsers import StrOutputParser
-from app.metrics import llm_api_latency, llm_queries
+from app.services.answer_cache import SemanticAnswerCache
+from app.services.context_builder import ContextBuilder, estimate_tokens
+from app.services.llm_gateway import create_llm_gateway
+from app.services.rag_service import RAGService
+from app.services.rate_limiter import TokenRateLimiter
+from opentelemetry import trace
+from app.metrics import context_build_latency, llm_prompt_tokens, stage_latency
+from app.tracing import stage, tracer
+
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseChatModel
 
 class LLMService:
-    def __init__(self):
-        self.llm = ChatGroq(
-            model=config.Config().model,
-            api_key=config.Config().groq_api_key,
-            temperature=config.Config().temperature,
-            max_tokens=config.Config().llm_max_tokens,
-        )
+    NO_RESULTS_ANSWER = "No relevant articles found to answer the question."
+
+    def __init__(self, rag_service: Optional[RAGService] = None, llm: Optional["BaseChatModel"] = None):
+        ## langchain is imported when the service is built, not when the app module is imported
+        from langchain_core.output_parsers import StrOutputParser
+        from langchain_core.prompts import ChatPromptTemplate
+
+        ## reuse the shared RAGService so the embedding model is loaded only once
+        self.rag_service = rag_service if rag_service is not None else RAGService()
+        self.answer_cache = SemanticAnswerCache(threshold=config.Config().answer_cache_threshold,
+                                                ttl_seconds=config.Config().answer_cache_ttl_seconds,
+                                                max_entries=config.Config().answer_cache_max_entries)
+        ## cached answers are stale as soon as the corpus changes
+        self.rag_service.add_change_listener(self.answer_cache.clear)
+        self.context_builder = ContextBuilder(token_budget=config.Config().context_token_budget,
+                                              diversity_lambda=config.Config().context_mmr_lambda)
+        self.context_passage_candidates = config.Config().context_passage_candidates
+        self.model_context_window = config.Config().model_context_window
+        self.max_answer_tokens = config.Config().llm_max_tokens
+        ## shared by every /ask/batch request in the process
+        self.batch_semaphore = asyncio.Semaphore(config.Config().llm_batch_concurrency)
+        self.token_limiter = TokenRateLimiter(config.Config().llm_tokens_per_minute)
+        if llm is None:
+            from langchain_groq import ChatGroq
+            llm = ChatGroq(
+                model=config.Config().model,
+                api_key=config.Config().groq_api_key,
+                temperature=config.Config().temperature,
+                max_tokens=config.Config().llm_max_tokens,
+                timeout=config.Config().llm_timeout_seconds,
+                max_retries=config.Config().llm_max_retries,
+            )
+        self.llm = llm
+        self.output_parser = StrOutputParser()
 
         self.prompt_template = ChatPromptTemplate.from_template("""
         You are a helpful assistant that provides a summary of the news articles. Answer the question based on the context below.
@@ -29,33 +64,221 @@ class LLMService:
         5. Use bullet points if listing multiple points
         Answer:                                                             
         """)
+        ## timeouts, coalescing, hedging, circuit breaking and provider fallback for every llm call
+        self.gateway = create_llm_gateway(config.Config(), self.prompt_template, self.llm, self.output_parser)
 
-    def ask_question(self, question: str, top_k =5) -> dict:
+    def ask_question(self, question: str, top_k =5, filters=None, recency_half_life_hours=None) -> dict:
+        """`filters` and `recency_half_life_hours` restrict and re-score retrieval, see RAGService.search_articles."""
+        with tracer.start_as_current_span("llm.ask"):
+            return self._ask_question(question, top_k, filters, recency_half_life_hours)
+
+    def _ask_question(self, question: str, top_k =5, filters=None, recency_half_life_hours=None) -> dict:
         print("The question asked by the user: ", question)
-        search_results = rag_service.RAGService().search_articles(query=question, top_k=top_k)
+        search_results = self.rag_service.search_articles(query=question, top_k=top_k, filters=filters, recency_half_life_hours=recency_half_life_hours)
 
         if not search_results:
             return{
                 "question": question,
-                "answer": "No relevant articles found to answer the question.",
+                "answer": self.NO_RESULTS_ANSWER,
                 "sources": []
             }
         
-        context_parts = []
-        for i, result in enumerate(search_results):
-            context_parts.append(f"Article {i+1} Title: {result['title']}\nContent: {result['content']}\nSource: {result['source_name']}\nURL: {result['url']}\n")
-        context = "\n".join(context_parts)
+        question_embedding = self.rag_service.embed([question])[0]
+        source_ids = [result['id'] for result in search_results]
+        cached = self.answer_cache.get(question_embedding, source_ids)
+        if cached is not None:
+            return {**cached, "question": question}
 
-        start_time = time.time()
-        chain = self.prompt_template | self.llm | StrOutputParser()
+        start_time = time.perf_counter()
+        passages = self.rag_service.search_passages(question_embedding, source_ids, n_results=self.context_passage_candidates)
+        context = self._build_context(question, question_embedding, search_results, passages, start_time)
 
-        response = chain.invoke({
+        start_time = time.perf_counter()
+        response = self.gateway.generate({
             "context": context,
             "question": question
         })
-        end_time = time.time()
-        duration = end_time - start_time
-        llm_api_latency.labels(model='groq').observe(duration)
+        duration = time.perf_counter() - start_time
+        result = {
+            "question": question,
+            "answer": response,
+            "sources": self._sources(search_results)
+        }
+        self.answer_cache.put(question_embedding, source_ids, result, llm_seconds=duration)
+        return result
+
+    async def aask_question(self, question: str, top_k =5, filters=None, recency_half_life_hours=None) -> dict:
+        """Async version of ask_question, retrieval runs on the RAGService executors and the LLM call uses ainvoke."""
+        with tracer.start_as_current_span("llm.ask"):
+            return await self._aask_question(question, top_k, filters, recency_half_life_hours)
+
+    async def _aask_question(self, question: str, top_k =5, filters=None, recency_half_life_hours=None) -> dict:
+        print("The question asked by the user: ", question)
+        search_results = await self.rag_service.asearch_articles(query=question, top_k=top_k, filters=filters, recency_half_life_hours=recency_half_life_hours)
+
+        if not search_results:
+            return{
+                "question": question,
+                "answer": self.NO_RESULTS_ANSWER,
+                "sources": []
+            }
+
+        question_embedding = (await self.rag_service.aembed_query(question))[0]
+        source_ids = [result['id'] for result in search_results]
+        cached = self.answer_cache.get(question_embedding, source_ids)
+        if cached is not None:
+            return {**cached, "question": question}
+
+        start_time = time.perf_counter()
+        passages = await self.rag_service.asearch_passages(question_embedding, source_ids, n_results=self.context_passage_candidates)
+        context = self._build_context(question, question_embedding, search_results, passages, start_time)
+
+        response, duration = await self._agenerate(question, context)
+        result = {
+            "question": question,
+            "answer": response,
+            "sources": self._sources(search_results)
+        }
+        self.answer_cache.put(question_embedding, source_ids, result, llm_seconds=duration)
+        return result
+
+    async def _agenerate(self, question: str, context: str) -> tuple[str, float]:
+        """Run the LLM chain through the gateway, returns the answer and the seconds it took."""
+        start_time = time.perf_counter()
+        response = await self.gateway.agenerate({
+            "context": context,
+            "question": question
+        })
+        return response, time.perf_counter() - start_time
+
+    async def aask_batch(self, questions: list[str], top_k =5, filters=None, recency_half_life_hours=None) -> AsyncIterator[dict]:
+        """Answer many questions, yielding each answer as soon as it is ready.
+
+        All questions are embedded in one forward pass and retrieved with one
+        multi-query vector store call. The LLM calls then run concurrently, at
+        most LLM_BATCH_CONCURRENCY at a time and within LLM_TOKENS_PER_MINUTE.
+        Every answer carries the `index` of its question; a failed question
+        yields an `error` instead of an answer without failing the batch.
+        """
+        print(f"Answering a batch of {len(questions)} questions")
+        with tracer.start_as_current_span("llm.ask_batch", attributes={"questions": len(questions)}):
+            question_embeddings = await self.rag_service.aembed(questions)
+            batch_results = await self.rag_service.asearch_articles_batch(questions, top_k=top_k, filters=filters,
+                                                                          recency_half_life_hours=recency_half_life_hours,
+                                                                          query_embeddings=question_embeddings)
+            ## created inside the span so every answer is traced under the batch
+            tasks = [asyncio.create_task(self._answer_in_batch(index, question, question_embeddings[index], search_results))
+                     for index, (question, search_results) in enumerate(zip(questions, batch_results))]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            ## the client went away, don't keep spending llm tokens
+            for task in tasks:
+                task.cancel()
+
+    async def _answer_in_batch(self, index: int, question: str, question_embedding, search_results: list[dict]) -> dict:
+        try:
+            if not search_results:
+                return {"index": index, "question": question, "answer": self.NO_RESULTS_ANSWER, "sources": []}
+            source_ids = [result['id'] for result in search_results]
+            cached = self.answer_cache.get(question_embedding, source_ids)
+            if cached is not None:
+                return {**cached, "question": question, "index": index}
+
+            start_time = time.perf_counter()
+            passages = await self.rag_service.asearch_passages(question_embedding, source_ids, n_results=self.context_passage_candidates)
+            context = self._build_context(question, question_embedding, search_results, passages, start_time)
+            async with self.batch_semaphore:
+                ## reserve the worst case answer length, the unused part is given back below
+                reserved = estimate_tokens(self.prompt_template.format(context=context, question=question)) + self.max_answer_tokens
+                await self.token_limiter.acquire(reserved)
+                ## a failed or cancelled call produced no answer, its whole answer budget goes back
+                unused = self.max_answer_tokens
+                try:
+                    response, duration = await self._agenerate(question, context)
+                    unused = max(0, self.max_answer_tokens - estimate_tokens(response))
+                finally:
+                    self.token_limiter.refund(unused)
+            result = {
+                "question": question,
+                "answer": response,
+                "sources": self._sources(search_results)
+            }
+            self.answer_cache.put(question_embedding, source_ids, result, llm_seconds=duration)
+            return {**result, "index": index}
+        except Exception as e:
+            print(f"Batch question {index} failed: {e}")
+            return {"index": index, "question": question, "error": str(e)}
+
+    async def astream_answer(self, question: str, top_k =5, filters=None, recency_half_life_hours=None) -> AsyncIterator[dict]:
+        """Yield a `sources` event followed by one `token` event per streamed chunk and a final `done` event."""
+        print("The question asked by the user (streaming): ", question)
+        ## the span is only made current around the awaited stages, never across a yield,
+        ## so a client disconnect closing the generator elsewhere can't corrupt the trace context
+        root = tracer.start_span("llm.ask_stream")
+        try:
+            with trace.use_span(root):
+                search_results = await self.rag_service.asearch_articles(query=question, top_k=top_k, filters=filters, recency_half_life_hours=recency_half_life_hours)
+            yield {"event": "sources", "data": self._sources(search_results)}
+
+            if not search_results:
+                yield {"event": "token", "data": self.NO_RESULTS_ANSWER}
+                yield {"event": "done", "data": None}
+                return
+
+            with trace.use_span(root):
+                question_embedding = (await self.rag_service.aembed_query(question))[0]
+                source_ids = [result['id'] for result in search_results]
+                cached = self.answer_cache.get(question_embedding, source_ids)
+                if cached is None:
+                    start_time = time.perf_counter()
+                    passages = await self.rag_service.asearch_passages(question_embedding, source_ids, n_results=self.context_passage_candidates)
+                    context = self._build_context(question, question_embedding, search_results, passages, start_time)
+            if cached is not None:
+                yield {"event": "token", "data": cached["answer"]}
+                yield {"event": "done", "data": None}
+                return
+
+            generate_span = tracer.start_span("llm.generate", context=trace.set_span_in_context(root))
+            start_time = time.perf_counter()
+            first_token = True
+            answer_parts = []
+            try:
+                async for token in self.gateway.astream({
+                    "context": context,
+                    "question": question
+                }):
+                    if first_token:
+                        generate_span.add_event("first_token")
+                        first_token = False
+                    answer_parts.append(token)
+                    yield {"event": "token", "data": token}
+            finally:
+                duration = time.perf_counter() - start_time
+                generate_span.end()
+                stage_latency.labels(stage="llm.generate").observe(duration)
+            self.answer_cache.put(question_embedding, source_ids, {
+                "question": question,
+                "answer": "".join(answer_parts),
+                "sources": self._sources(search_results)
+            }, llm_seconds=duration)
+            yield {"event": "done", "data": None}
+        finally:
+            root.end()
+
+    def _build_context(self, question: str, question_embedding, search_results: list[dict], passages: list[dict], start_time: float) -> str:
+        """Pack the retrieved passages into the context budget, shrunk if needed to fit the model window."""
+        prompt_tokens = estimate_tokens(self.prompt_template.format(context="", question=question))
+        available = self.model_context_window - self.max_answer_tokens - prompt_tokens
+        with stage("llm.context", passages=len(passages)):
+            context = self.context_builder.build(question_embedding, search_results, passages,
+                                                 token_budget=max(0, min(self.context_builder.token_budget, available)))
+        context_build_latency.observe(time.perf_counter() - start_time)
+        llm_prompt_tokens.labels(model='groq').observe(prompt_tokens + estimate_tokens(context))
+        return context
+
+    def _sources(self, search_results: list[dict]) -> list[dict]:
         sources = []
         for result in search_results[:3]:
             sources.append({
@@ -63,9 +286,4 @@ class LLMService:
                 "url": result['url'],
                 "source_name": result['source_name']
             })  
-        return{
-            "question": question,
-            "answer": response,
-            "sources": sources
-        }
-
+        return sources
@@ -0,0 +1,184 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from typing import Optional
+
+import numpy as np
+
+from app.metrics import near_duplicate_ratio, near_duplicates_found, near_duplicates_seen
+from app.models import Article
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_WORD_PATTERN = re.compile(r"[a-z0-9]+")
+## newsapi truncates content with a "[+1234 chars]" tail that differs between copies
+_TRUNCATION_PATTERN = re.compile(r"\[\+\d+ chars\]")
+
+
+def shingles(article: Article, size=3) -> set[bytes]:
+    text = " ".join(part for part in (article.title, article.description, article.content) if part)
+    words = _WORD_PATTERN.findall(_TRUNCATION_PATTERN.sub(" ", text.lower()))
+    if len(words) < size:
+        return {" ".join(words).encode('utf-8')} if words else set()
+    return {" ".join(words[i:i+size]).encode('utf-8') for i in range(len(words) - size + 1)}
+
+
+class NearDuplicateIndex:
+    """MinHash/LSH index clustering syndicated copies of the same story.
+
+    Each article gets a MinHash signature over its word shingles. Signatures
+    are split into `bands` LSH bands, candidates sharing a band bucket are
+    verified against `threshold` estimated Jaccard similarity. The first
+    article of a cluster becomes its canonical representative. Buckets and
+    cluster membership are kept in SQLite so clusters survive restarts.
+    """
+
+    def __init__(self, db_path="../data/near_duplicates.sqlite3", threshold=0.8, num_perm=128, bands=16, seed=1, journal_mode="WAL"):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, int(_MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, int(_MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+        self._lock = threading.Lock()
+        self._seen = 0
+        self._duplicates = 0
+
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute(f"PRAGMA journal_mode={journal_mode}")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS members (doc_id TEXT PRIMARY KEY, canonical_id TEXT NOT NULL) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS signatures (doc_id TEXT PRIMARY KEY, signature BLOB NOT NULL) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS buckets (band INTEGER NOT NULL, bucket TEXT NOT NULL, doc_id TEXT NOT NULL, PRIMARY KEY (band, bucket, doc_id)) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_members_canonical ON members(canonical_id);
+        """)
+        self._conn.commit()
+
+    def signature(self, article: Article) -> Optional[np.ndarray]:
+        """MinHash signature of the article, None when it has no words to compare."""
+        hashed = np.array([int.from_bytes(hashlib.blake2b(shingle, digest_size=4).digest(), 'little') for shingle in shingles(article)], dtype=np.uint64)
+        if not len(hashed):
+            return None
+        ## (a*x + b) mod p for every permutation and shingle, then the min per permutation
+        permuted = np.bitwise_and((np.outer(hashed, self._a) + self._b) % _MERSENNE_PRIME, _MAX_HASH)
+        return permuted.min(axis=0)
+
+    def _band_keys(self, signature: np.ndarray) -> list[str]:
+        return [hashlib.blake2b(signature[band*self.rows:(band+1)*self.rows].tobytes(), digest_size=8).hexdigest()
+                for band in range(self.bands)]
+
+    def cluster(self, articles: list[Article]) -> tuple[list[Article], dict[str, list[Article]], dict]:
+        """Split articles into new canonical representatives and alternates keyed by canonical id.
+
+        Alternates may point at canonicals from earlier runs. Articles that were
+        already clustered by a previous call are dropped. Nothing is stored yet:
+        the returned pending rows are passed to `record` once the canonicals are
+        written, so a failed write leaves the articles unclustered for the retry.
+        Articles without any words are never clustered, they would all match.
+        """
+        canonicals: list[Article] = []
+        alternates: dict[str, list[Article]] = {}
+        pending = {"members": [], "signatures": {}, "buckets": {}}
+        batch_ids = set()
+        with self._lock:
+            for article in articles:
+                if article.id in batch_ids or self._conn.execute("SELECT 1 FROM members WHERE doc_id = ?", (article.id,)).fetchone():
+                    continue
+                batch_ids.add(article.id)
+                signature = self.signature(article)
+                if signature is None:
+                    canonicals.append(article)
+                    continue
+                band_keys = self._band_keys(signature)
+                canonical_id = self._find_canonical(signature, band_keys, pending)
+                self._seen += 1
+                near_duplicates_seen.inc()
+                if canonical_id is None:
+                    canonicals.append(article)
+                    pending["members"].append((article.id, article.id))
+                    pending["signatures"][article.id] = signature
+                    for band, key in enumerate(band_keys):
+                        pending["buckets"].setdefault((band, key), []).append(article.id)
+                else:
+                    self._duplicates += 1
+                    near_duplicates_found.inc()
+                    alternates.setdefault(canonical_id, []).append(article)
+                    pending["members"].append((article.id, canonical_id))
+        if self._seen:
+            near_duplicate_ratio.set(self._duplicates / self._seen)
+        return canonicals, alternates, pending
+
+    def record(self, pending: dict) -> None:
+        """Store the cluster membership computed by `cluster`."""
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR IGNORE INTO members (doc_id, canonical_id) VALUES (?, ?)", pending["members"])
+            self._conn.executemany("INSERT OR IGNORE INTO signatures (doc_id, signature) VALUES (?, ?)",
+                                   [(doc_id, signature.tobytes()) for doc_id, signature in pending["signatures"].items()])
+            self._conn.executemany("INSERT OR IGNORE INTO buckets (band, bucket, doc_id) VALUES (?, ?, ?)",
+                                   [(band, key, doc_id) for (band, key), doc_ids in pending["buckets"].items() for doc_id in doc_ids])
+
+    def _find_canonical(self, signature: np.ndarray, band_keys: list[str], pending: dict) -> Optional[str]:
+        candidates = set()
+        for band, key in enumerate(band_keys):
+            rows = self._conn.execute("SELECT doc_id FROM buckets WHERE band = ? AND bucket = ?", (band, key)).fetchall()
+            candidates.update(row[0] for row in rows)
+            ## canonicals of the same batch, not recorded yet
+            candidates.update(pending["buckets"].get((band, key), ()))
+        best_id, best_similarity = None, self.threshold
+        for doc_id in candidates:
+            if doc_id in pending["signatures"]:
+                other = pending["signatures"][doc_id]
+            else:
+                other = np.frombuffer(self._conn.execute("SELECT signature FROM signatures WHERE doc_id = ?", (doc_id,)).fetchone()[0], dtype=np.uint64)
+            similarity = float(np.mean(other == signature))
+            if similarity >= best_similarity:
+                best_id, best_similarity = doc_id, similarity
+        return best_id
+
+    def canonical_of(self, doc_id: str) -> Optional[str]:
+        row = self._conn.execute("SELECT canonical_id FROM members WHERE doc_id = ?", (doc_id,)).fetchone()
+        return row[0] if row else None
+
+    def remove(self, doc_ids: list[str]) -> None:
+        with self._lock, self._conn:
+            for start in range(0, len(doc_ids), 500):
+                chunk = doc_ids[start:start+500]
+                placeholders = ",".join("?" * len(chunk))
+                ## removing a canonical drops its whole cluster
+                self._conn.execute(f"DELETE FROM members WHERE doc_id IN ({placeholders}) OR canonical_id IN ({placeholders})", chunk + chunk)
+                self._conn.execute(f"DELETE FROM signatures WHERE doc_id IN ({placeholders})", chunk)
+                self._conn.execute(f"DELETE FROM buckets WHERE doc_id IN ({placeholders})", chunk)
+
+    def stage_rekey(self, mapping: dict[str, str]) -> None:
+        """Stage renamed doc ids, e.g. after an id scheme change, applied by `apply_rekey`.
+
+        Staging is idempotent, an interrupted migration can stage the same
+        batches again and the index keeps matching the stores until then.
+        """
+        rows = [(old_id, new_id) for old_id, new_id in mapping.items() if old_id != new_id]
+        with self._lock, self._conn:
+            self._conn.execute("CREATE TABLE IF NOT EXISTS rekey_staging (old_id TEXT PRIMARY KEY, new_id TEXT NOT NULL) WITHOUT ROWID")
+            self._conn.executemany("INSERT OR REPLACE INTO rekey_staging (old_id, new_id) VALUES (?, ?)", rows)
+
+    def apply_rekey(self) -> None:
+        """Rename every staged doc id in one transaction, once the stores have switched to the new ids."""
+        with self._lock, self._conn:
+            if not self._conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'rekey_staging'").fetchone():
+                return
+            for table, column in (("members", "doc_id"), ("members", "canonical_id"), ("signatures", "doc_id"), ("buckets", "doc_id")):
+                conflict = "" if column == "canonical_id" else " OR IGNORE"
+                self._conn.execute(f"UPDATE{conflict} {table} SET {column} = (SELECT new_id FROM rekey_staging WHERE old_id = {table}.{column}) "
+                                   f"WHERE {column} IN (SELECT old_id FROM rekey_staging)")
+            self._conn.execute("DROP TABLE rekey_staging")
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM members")
+            self._conn.execute("DELETE FROM signatures")
+            self._conn.execute("DELETE FROM buckets")
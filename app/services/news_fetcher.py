@@ -1,18 +1,59 @@
-from typing import Optional
+import asyncio
+import random
+from typing import Iterable, Optional
+import httpx
 import requests
 import sys
 sys.path.append("../")
 from app.config import Config
 from app.models import Article
+from app.tracing import stage
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+## a Retry-After longer than this is not waited out
+MAX_RETRY_AFTER_SECONDS = 30.0
+
+def _json_articles(response) -> list[dict]:
+    ## proxies and outages answer with html error pages, only parse what claims to be json
+    if response.status_code != 200 or "json" not in response.headers.get("Content-Type", ""):
+        raise Exception(f"API call failed with status code: {response.status_code}, Response: {response.text[:500]}")
+    return response.json().get("articles", [])
 
 class NewsFetcher:
     DEFAULT_QUERY = "top headlines"
-    
+
     def __init__(self):
         config = Config()
         self.api_key = config.news_api_key
         self.base_url = config.news_base_url
         self.everything_url = config.news_everything_url
+        self.timeout = config.news_request_timeout
+        ## reuse the TCP/TLS connection across calls
+        self.session = requests.Session()
+
+    def category_for(self, query, category):
+        """Category of the articles a fetch returns, searches go to /everything which has none."""
+        return None if query and query != self.DEFAULT_QUERY else category
+
+    def _headlines_request(self, query, country, category, page_size, page):
+        if query and query != self.DEFAULT_QUERY:
+            return self._everything_request(query, page_size=page_size, page=page)
+        return self.base_url, {
+            "apiKey": self.api_key,
+            "country": country,
+            "category": category,
+            "pageSize": page_size,
+            "page": page
+        }
+
+    def _everything_request(self, query, page_size=20, sort_by='relevancy', page=1):
+        return self.everything_url, {
+            "apiKey": self.api_key,
+            "q": query,
+            "pageSize": page_size,
+            "page": page,
+            "sortBy": sort_by
+        }
 
     def fetch_news(self,
                    query: Optional[str]=DEFAULT_QUERY,
@@ -20,38 +61,36 @@ class NewsFetcher:
                    category="sports",
                    page_size=5,
                    page=1) -> list[Article]:
+        return self.parse_articles(self.fetch_raw(query=query, country=country, category=category, page_size=page_size, page=page),
+                                   category=self.category_for(query, category))
 
-        if query and query != self.DEFAULT_QUERY:
-            url = self.everything_url
-            params = {
-                "apiKey": self.api_key,
-                "q": query,
-                "pageSize": page_size,
-                "page": page,
-                "sortBy": "relevancy"
-            }
-        else:
-            url = self.base_url
-            params = {
-                "apiKey": self.api_key,
-                "country": country,
-                "category": category,
-                "pageSize": page_size,
-                "page": page
-            }
-            
+    def fetch_raw(self,
+                  query: Optional[str]=DEFAULT_QUERY,
+                  country="us",
+                  category="sports",
+                  page_size=5,
+                  page=1) -> list[dict]:
+        """Same as fetch_news but returns the raw NewsAPI article dicts."""
+        url, params = self._headlines_request(query, country, category, page_size, page)
+        return self._get_json(url, params)
+
+    def _get(self, url, params) -> list[Article]:
+        return self.parse_articles(self._get_json(url, params), category=params.get("category"))
+
+    def _get_json(self, url, params) -> list[dict]:
         try:
-            response = requests.get(url, params=params)
-            data = response.json()
-            if response.status_code == 200:
-                articles = data.get("articles", [])
-                return self.parse_articles(articles)
-            else:
-                raise Exception(f"API call failed with status code: {response.status_code}, Response: {data}")
+            with stage("news.request", url=url) as span:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+                span.set_attribute("http.status_code", response.status_code)
+            return _json_articles(response)
         except requests.RequestException as e:
             raise Exception(f"An error occurred while fetching news: {e}")
-        
-    def parse_articles(self, articles_data) -> list[Article]:
+
+    def parse_articles(self, articles_data, category=None) -> list[Article]:
+        with stage("news.parse", articles=len(articles_data)):
+            return self._parse_articles(articles_data, category)
+
+    def _parse_articles(self, articles_data, category=None) -> list[Article]:
         articles = []
         for article_data in articles_data:
             title = article_data.get("title", "")
@@ -68,26 +107,110 @@ class NewsFetcher:
                 url=url,
                 source_name=source_name,
                 published_at=published_at,
-                author=author
+                author=author,
+                category=category
             )
             articles.append(article)
         return articles
-    
+
     def search_everything(self,query,page_size=20,sort_by='relevancy'):
-        params = {
-            "apiKey": self.api_key,
-            "q": query,
-            "pageSize": page_size,
-            "sortBy": sort_by
-        }
-        try:
-            response = requests.get(self.everything_url, params=params)
-            data = response.json()
-            if response.status_code == 200:
-                articles = data.get("articles", [])
-                return self.parse_articles(articles)
-            else:
-                raise Exception(f"API call failed with status code: {response.status_code}, Response: {data}")
-        except requests.RequestException as e:
-            raise Exception(f"An error occurred while fetching news: {e}")
+        url, params = self._everything_request(query, page_size=page_size, sort_by=sort_by)
+        return self._get(url, params)
+
+
+class AsyncNewsFetcher(NewsFetcher):
+    """NewsFetcher on a pooled httpx.AsyncClient.
+
+    Requests run with bounded concurrency and a per-request timeout, and are
+    retried with jittered exponential backoff on 429/5xx and transport errors.
+    Use it as an async context manager, or call `aclose()` when done.
+    """
+
+    def __init__(self, max_concurrency=None, max_retries=None, backoff_base=0.5, client: Optional[httpx.AsyncClient] = None):
+        super().__init__()
+        config = Config()
+        self.max_concurrency = max_concurrency or config.news_max_concurrency
+        self.max_retries = config.news_max_retries if max_retries is None else max_retries
+        self.backoff_base = backoff_base
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.client = client or httpx.AsyncClient(
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency),
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    async def fetch_news(self,
+                         query: Optional[str]=NewsFetcher.DEFAULT_QUERY,
+                         country="us",
+                         category="sports",
+                         page_size=5,
+                         page=1) -> list[Article]:
+        url, params = self._headlines_request(query, country, category, page_size, page)
+        return await self._get(url, params)
+
+    async def search_everything(self,query,page_size=20,sort_by='relevancy',page=1):
+        url, params = self._everything_request(query, page_size=page_size, sort_by=sort_by, page=page)
+        return await self._get(url, params)
+
+    async def fetch_many(self,
+                         queries: Optional[Iterable[str]]=None,
+                         categories: Optional[Iterable[str]]=None,
+                         pages=1,
+                         country="us",
+                         page_size=20) -> list[Article]:
+        """Fan out over every (query|category, page) pair and merge the results, deduplicated by Article.id."""
+        requests_to_send = []
+        for page in range(1, pages + 1):
+            for query in queries or []:
+                requests_to_send.append(self._everything_request(query, page_size=page_size, page=page))
+            for category in categories or []:
+                requests_to_send.append(self._headlines_request(None, country, category, page_size, page))
+
+        results = await asyncio.gather(*(self._get(url, params) for url, params in requests_to_send))
+
+        merged = {}
+        for articles in results:
+            for article in articles:
+                merged.setdefault(article.id, article)
+        return list(merged.values())
+
+    async def _get(self, url, params) -> list[Article]:
+        with stage("news.request", url=url) as span:
+            return await self._get_with_retries(url, params, span)
+
+    async def _get_with_retries(self, url, params, span) -> list[Article]:
+        for attempt in range(self.max_retries + 1):
+            span.set_attribute("retries", attempt)
+            try:
+                ## the slot is held for the request only, not while backing off
+                async with self._semaphore:
+                    response = await self.client.get(url, params=params)
+            except httpx.TransportError as e:
+                if attempt == self.max_retries:
+                    raise Exception(f"An error occurred while fetching news: {e}")
+                await asyncio.sleep(self._backoff(attempt))
+                continue
+
+            if response.status_code in RETRY_STATUS_CODES and attempt < self.max_retries:
+                await asyncio.sleep(self._backoff(attempt, response.headers.get("Retry-After")))
+                continue
+
+            span.set_attribute("http.status_code", response.status_code)
+            return self.parse_articles(_json_articles(response), category=params.get("category"))
 
+    def _backoff(self, attempt, retry_after=None) -> float:
+        if retry_after is not None:
+            try:
+                return min(max(float(retry_after), 0.0), MAX_RETRY_AFTER_SECONDS)
+            except ValueError:
+                pass
+        ## full jitter: uniform in [0, base * 2^attempt]
+        return random.uniform(0, self.backoff_base * (2 ** attempt))
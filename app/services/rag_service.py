@@ -1,66 +1,523 @@
-import chromadb
-import chromadb.config
-import langchain
+import asyncio
+import contextvars
+import json
 import os
-from sentence_transformers import SentenceTransformer
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Optional
 
-from app.models import Article
+from app.config import Config
+from app.models import Article, parse_published_at
+from app.services.context_builder import chunk_article
+from app.services.embedding_backends import create_embedding_backend
+from app.services.embedding_batcher import EmbeddingBatcher
+from app.services.embedding_cache import EmbeddingCache
+from app.services.lexical_index import LexicalIndex, reciprocal_rank_fusion
+from app.services.near_duplicates import NearDuplicateIndex
+from app.services.vector_index import create_vector_store
+from app.tracing import stage
+
+## bumped when the per-document metadata layout changes, older collections are backfilled on startup
+METADATA_VERSION = 2
+COLLECTION_METADATA = {"description": "News artickles with embeddings", "metadata_version": METADATA_VERSION}
+## filtered bm25 candidates are checked against the where clause in chroma, so fetch deeper
+LEXICAL_FILTER_OVERFETCH = 5
 
 class RAGService:
-    def __init__(self,db_path="../data/chroma_db"):
+    def __init__(self,db_path="../data/chroma_db",batch_size=None,embedding_model=None,client=None):
+        config = Config()
+        self.batch_size = batch_size or config.embedding_batch_size
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
 
-        self.client = chromadb.PersistentClient(path=db_path,settings=chromadb.config.Settings(anonymized_telemetry=False))
-        self.collection = self.client.get_or_create_collection(name="rag_collection",metadata={"description": "News artickles with embeddings"})
-        self.embedding_model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
+        ## a chroma client or any other VectorStore, by default the configured backend
+        self.client = client if client is not None else create_vector_store(config, db_path=db_path)
+        self.collection = self.client.get_or_create_collection(name="rag_collection",metadata=COLLECTION_METADATA)
+        ## articles are also chunked into passages, the /ask context is packed from those
+        self.passages = self.client.get_or_create_collection(name="rag_passages",metadata={"description": "Passages of the news articles"})
+        self.passage_max_tokens = config.passage_max_tokens
+        ## any object with SentenceTransformer's encode(), by default the configured backend
+        self.embedding_model = embedding_model or create_embedding_backend(config)
+        ## cpu bound encoding and blocking chroma calls get their own pools so they
+        ## don't compete with each other or with the event loop
+        self.embedding_executor = ThreadPoolExecutor(max_workers=config.embedding_workers, thread_name_prefix="embedding")
+        self.vectorstore_executor = ThreadPoolExecutor(max_workers=config.vectorstore_workers, thread_name_prefix="vectorstore")
+        ## concurrent search/ask queries are encoded together in one forward pass
+        self.query_batcher = EmbeddingBatcher(self.embed, self.embedding_executor,
+                                              max_batch_size=config.query_batch_max_size,
+                                              max_wait_ms=config.query_batch_max_wait_ms,
+                                              max_concurrent_batches=config.embedding_workers) if config.query_batching_enabled else None
+        ## vectors of different backends (e.g. int8 onnx) must not share cache entries
+        self.embedding_cache = EmbeddingCache(model_name=getattr(self.embedding_model, "name", config.embedding_model),
+                                              db_path=config.embedding_cache_path,
+                                              memory_size=config.embedding_cache_memory_size,
+                                              disk_size=config.embedding_cache_disk_size,
+                                              journal_mode=config.sqlite_journal_mode)
+        ## bm25 index over the same documents, fused with the dense ranking in hybrid mode
+        self.retrieval_mode = config.retrieval_mode
+        self.hybrid_candidates = config.hybrid_candidates
+        self.recency_half_life_hours = config.recency_half_life_hours or None
+        self.lexical_index = LexicalIndex(db_path=config.lexical_index_path, journal_mode=config.sqlite_journal_mode)
+        ## syndicated copies of a story are collapsed into one embedded canonical article
+        self.near_duplicates = NearDuplicateIndex(db_path=config.near_duplicate_index_path,
+                                                  threshold=config.near_duplicate_threshold,
+                                                  journal_mode=config.sqlite_journal_mode) if config.near_duplicate_enabled else None
+        ## callbacks run whenever the collection content changes (ingest or clear)
+        self._change_listeners: list[Callable[[], None]] = []
+        if len(self.lexical_index) == 0 and self.collection.count() > 0:
+            self.rebuild_lexical_index()
+        if (self.collection.metadata or {}).get("metadata_version") != METADATA_VERSION:
+            self.backfill_metadata()
         print("Embedding model initialized successfully.")
 
-    def add_articles(self,articles: list[Article]) -> None:
+    def add_change_listener(self, listener: Callable[[], None]) -> None:
+        self._change_listeners.append(listener)
+
+    def _notify_change(self) -> None:
+        for listener in self._change_listeners:
+            listener()
+
+    def close(self) -> None:
+        self.embedding_executor.shutdown(wait=False, cancel_futures=True)
+        self.vectorstore_executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _run(self, executor, fn, *args, **kwargs):
+        ## carry the current trace context over to the executor thread
+        return await asyncio.get_running_loop().run_in_executor(executor, contextvars.copy_context().run, partial(fn, *args, **kwargs))
+
+    async def aembed(self, texts: list[str], batch_size=None):
+        return await self._run(self.embedding_executor, self.embed, texts, batch_size=batch_size)
+
+    async def aembed_query(self, query: str):
+        """Embed a single query, through the micro-batcher when it is enabled. Returns a (1, dim) matrix."""
+        with stage("rag.embed_query", batched=self.query_batcher is not None):
+            if self.query_batcher is None:
+                return await self.aembed([query])
+            return (await self.query_batcher.embed(query)).reshape(1, -1)
+
+    def embed(self, texts: list[str], batch_size=None):
+        ## every document and query embedding goes through the cache
+        batch_size = batch_size or self.batch_size
+        with stage("rag.embed", texts=len(texts)):
+            return self.embedding_cache.encode(texts, lambda missing: self.embedding_model.encode(missing, batch_size=batch_size, convert_to_numpy=True))
+
+    def add_articles(self,articles: list[Article],batch_size=None) -> None:
         if not articles:
             print("No articles to add.")
             return
-        
-        count=0
+
+        batch_size = batch_size or self.batch_size
+        ## drop duplicates inside the incoming list, keeping the first occurrence
+        unique_articles = {}
         for article in articles:
-            existing =  self.collection.get(ids=[article.id])
-            if existing['ids']:
-                print(f"Article with ID {article.id} already exists in the collection.")
-                continue
-
-            full_text = article.get_full_text()
-            embedding = self.embedding_model.encode(full_text).tolist()
-            self.collection.add(
-                ids=[article.id],
-                documents=[full_text],
-                embeddings=[embedding],
-                metadatas=[{
-                    "title": article.title,
-                    "url": article.url,
-                    "source_name": article.source_name,
-                    "published_at": article.published_at,
-                }]
-            )
-            count+=1
-        
+            unique_articles.setdefault(article.id, article)
+
+        existing_ids = self.existing_ids(list(unique_articles))
+        new_articles = [article for article_id, article in unique_articles.items() if article_id not in existing_ids]
+        if existing_ids:
+            print(f"{len(existing_ids)} articles already exist in the collection.")
+        new_articles, alternates, clusters = self.collapse_near_duplicates(new_articles)
+
+        ## chroma caps the number of records per call
+        write_size = min(batch_size, self.client.get_max_batch_size())
+        count=0
+        for start in range(0, len(new_articles), write_size):
+            batch = new_articles[start:start+write_size]
+            texts = [article.get_full_text() for article in batch]
+            embeddings = self.embed(texts, batch_size=batch_size)
+            self.write_embeddings(batch, texts, embeddings)
+            self.write_passages(self.embed_passages(batch, batch_size=batch_size))
+            count+=len(batch)
+        self.attach_alternates(alternates)
+        self.record_near_duplicates(clusters)
+
         print(f"The total number of articles added in chromadb: {count}")
         return
-    
-    def search_articles(self,query,top_k=5) -> list[dict]:
-        query_embeddings = self.embedding_model.encode(query).tolist()
-        results = self.collection.query(query_embeddings=[query_embeddings],n_results=top_k)
+
+    def rekey_ids(self, batch_size=500, on_batch=None) -> int:
+        """Recompute every document id from its url metadata, reusing the stored vectors.
+
+        Documents are streamed in bounded batches into a new collection that
+        replaces the old one once complete, so nothing is re-embedded. The
+        original is renamed to a backup for the swap and only deleted after it,
+        an interrupted run leaves it (or its backup, put back on the next run)
+        untouched and can simply be started again.
+        """
+        def rekey_articles(ids, metadatas):
+            mapping = {old_id: Article.id_for_url(metadata.get("url", "")) for old_id, metadata in zip(ids, metadatas)}
+            if self.near_duplicates is not None:
+                self.near_duplicates.stage_rekey(mapping)
+            if on_batch is not None:
+                on_batch(mapping)
+            return [mapping[old_id] for old_id in ids], metadatas
+
+        def rekey_passages(ids, metadatas):
+            metadatas = [{**metadata, "article_id": Article.id_for_url(metadata.get("url", ""))} for metadata in metadatas]
+            return [f"{metadata['article_id']}:{metadata['index']}" for metadata in metadatas], metadatas
+
+        count = self._rekey_collection("rag_collection", COLLECTION_METADATA, rekey_articles, batch_size)
+        self._rekey_collection("rag_passages", {"description": "Passages of the news articles"}, rekey_passages, batch_size)
+        self.collection = self.client.get_collection("rag_collection")
+        self.passages = self.client.get_collection("rag_passages")
+        ## the cluster index follows only once both collections carry the new ids
+        if self.near_duplicates is not None:
+            self.near_duplicates.apply_rekey()
+        self.rebuild_lexical_index()
+        self._notify_change()
+        print(f"Re-keyed {count} documents in the vector store.")
+        return count
+
+    def _rekey_collection(self, name, metadata, rekey, batch_size) -> int:
+        rekeyed_name, backup_name = f"{name}_rekeyed", f"{name}_backup"
+        names = [getattr(collection, "name", collection) for collection in self.client.list_collections()]
+        ## a previous run stopped during the swap: either the new collection is already
+        ## in place and only the backup is left, or the original has to be put back
+        if backup_name in names:
+            if name in names:
+                self.client.delete_collection(backup_name)
+            else:
+                self.client.get_collection(backup_name).modify(name=name)
+        if rekeyed_name in names:
+            self.client.delete_collection(rekeyed_name)
+        source = self.client.get_or_create_collection(name=name, metadata=metadata)
+        rekeyed = self.client.create_collection(name=rekeyed_name, metadata=metadata)
+        batch_size = min(batch_size, self.client.get_max_batch_size())
+        offset = 0
+        while True:
+            batch = source.get(include=["embeddings", "documents", "metadatas"], limit=batch_size, offset=offset)
+            if not batch['ids']:
+                break
+            ids, metadatas = rekey(batch['ids'], batch['metadatas'])
+            rekeyed.upsert(ids=ids, embeddings=batch['embeddings'], documents=batch['documents'], metadatas=metadatas)
+            offset += len(batch['ids'])
+
+        ## the original is only deleted once the rekeyed copy carries its name
+        source.modify(name=backup_name)
+        rekeyed.modify(name=name)
+        self.client.delete_collection(backup_name)
+        return offset
+
+    def collapse_near_duplicates(self, articles: list[Article]) -> tuple[list[Article], dict[str, list[Article]], Optional[dict]]:
+        """Return the canonical articles to embed, the near duplicates keyed by their canonical id and the
+        pending clusters to pass to `record_near_duplicates` once the canonicals are written."""
+        if self.near_duplicates is None or not articles:
+            return articles, {}, None
+        canonicals, alternates, clusters = self.near_duplicates.cluster(articles)
+        if alternates:
+            print(f"Collapsed {sum(len(items) for items in alternates.values())} near duplicate articles.")
+        return canonicals, alternates, clusters
+
+    def record_near_duplicates(self, clusters: Optional[dict]) -> None:
+        ## only after the write, a failed write must leave the articles unclustered for the retry
+        if self.near_duplicates is not None and clusters:
+            self.near_duplicates.record(clusters)
+
+    def attach_alternates(self, alternates: dict[str, list[Article]]) -> None:
+        """Record near duplicate copies as alternate sources in their canonical article's metadata."""
+        if not alternates:
+            return
+        records = self.collection.get(ids=list(alternates), include=["metadatas"])
+        ids, metadatas = [], []
+        for doc_id, metadata in zip(records['ids'], records['metadatas']):
+            existing = json.loads(metadata.get("alternate_sources", "[]"))
+            known_urls = {item["url"] for item in existing}
+            existing.extend({"source_name": article.source_name, "url": article.url}
+                            for article in alternates[doc_id] if article.url not in known_urls)
+            ids.append(doc_id)
+            metadatas.append({**metadata, "alternate_sources": json.dumps(existing)})
+        if ids:
+            self.collection.update(ids=ids, metadatas=metadatas)
+
+    def write_embeddings(self, articles: list[Article], texts: list[str], embeddings) -> None:
+        """Write already embedded articles to the collection, chunked to chroma's max batch size."""
+        max_batch_size = self.client.get_max_batch_size()
+        with stage("rag.write", articles=len(articles)):
+            for start in range(0, len(articles), max_batch_size):
+                end = start + max_batch_size
+                self.collection.add(
+                    ids=[article.id for article in articles[start:end]],
+                    documents=texts[start:end],
+                    embeddings=embeddings[start:end],
+                    metadatas=[self._article_metadata(article) for article in articles[start:end]]
+                )
+            self.lexical_index.add([article.id for article in articles], texts)
+        if articles:
+            self._notify_change()
+
+    def embed_passages(self, articles: list[Article], batch_size=None) -> dict:
+        """Chunk and embed the passages of the given articles, returns chroma add() keyword arguments."""
+        records = {"ids": [], "documents": [], "metadatas": []}
+        for article in articles:
+            for index, text in enumerate(chunk_article(article, max_tokens=self.passage_max_tokens)):
+                records["ids"].append(f"{article.id}:{index}")
+                records["documents"].append(text)
+                records["metadatas"].append({"article_id": article.id, "index": index, "url": article.url})
+        records["embeddings"] = self.embed(records["documents"], batch_size=batch_size) if records["documents"] else []
+        return records
+
+    def write_passages(self, records: dict) -> None:
+        max_batch_size = self.client.get_max_batch_size()
+        with stage("rag.write_passages", passages=len(records["ids"])):
+            for start in range(0, len(records["ids"]), max_batch_size):
+                end = start + max_batch_size
+                self.passages.upsert(**{key: values[start:end] for key, values in records.items()})
+
+    def search_passages(self, query_embedding, article_ids: list[str], n_results=40) -> list[dict]:
+        """Return the passages of the given articles closest to the query, with their embeddings."""
+        if not article_ids or not self.passages.count():
+            return []
+        with stage("rag.passage_query"):
+            results = self.passages.query(query_embeddings=[list(map(float, query_embedding))],
+                                          n_results=min(n_results, self.passages.count()),
+                                          where={"article_id": {"$in": list(article_ids)}},
+                                          include=["documents", "metadatas", "embeddings"])
+        return [{"article_id": metadata["article_id"], "text": document, "embedding": embedding}
+                for document, metadata, embedding in zip(results['documents'][0], results['metadatas'][0], results['embeddings'][0])]
+
+    async def asearch_passages(self, query_embedding, article_ids: list[str], n_results=40) -> list[dict]:
+        return await self._run(self.vectorstore_executor, self.search_passages, query_embedding, article_ids, n_results)
+
+    def rebuild_lexical_index(self) -> None:
+        """Backfill the bm25 index from the documents already stored in the collection."""
+        self.lexical_index.clear()
+        max_batch_size = self.client.get_max_batch_size()
+        offset = 0
+        while True:
+            batch = self.collection.get(include=["documents"], limit=max_batch_size, offset=offset)
+            if not batch['ids']:
+                break
+            self.lexical_index.add(batch['ids'], batch['documents'])
+            offset += len(batch['ids'])
+        print(f"Rebuilt the lexical index with {len(self.lexical_index)} documents.")
+
+    def delete_articles(self, ids: list[str]) -> None:
+        """Remove articles with their passages from the collection and from the lexical and near duplicate indexes."""
+        if not ids:
+            return
+        max_batch_size = self.client.get_max_batch_size()
+        with stage("rag.delete", articles=len(ids)):
+            for start in range(0, len(ids), max_batch_size):
+                chunk = ids[start:start+max_batch_size]
+                self.collection.delete(ids=chunk)
+                self.passages.delete(where={"article_id": {"$in": chunk}})
+            self.lexical_index.remove(ids)
+            if self.near_duplicates is not None:
+                self.near_duplicates.remove(ids)
+        self._notify_change()
+
+    def backfill_metadata(self) -> None:
+        """Add the numeric published_ts field to documents written before it existed."""
+        max_batch_size = self.client.get_max_batch_size()
+        offset = 0
+        updated = 0
+        while True:
+            batch = self.collection.get(include=["metadatas"], limit=max_batch_size, offset=offset)
+            if not batch['ids']:
+                break
+            ids, metadatas = [], []
+            for doc_id, metadata in zip(batch['ids'], batch['metadatas']):
+                published_ts = parse_published_at(metadata.get("published_at"))
+                if published_ts is not None and metadata.get("published_ts") != published_ts:
+                    ids.append(doc_id)
+                    metadatas.append({**metadata, "published_ts": published_ts})
+            if ids:
+                self.collection.update(ids=ids, metadatas=metadatas)
+                updated += len(ids)
+            offset += len(batch['ids'])
+        self.collection.modify(metadata=COLLECTION_METADATA)
+        print(f"Backfilled the metadata of {updated} documents.")
+
+    def existing_ids(self, ids: list[str]) -> set[str]:
+        existing = set()
+        max_batch_size = self.client.get_max_batch_size()
+        for start in range(0, len(ids), max_batch_size):
+            result = self.collection.get(ids=ids[start:start+max_batch_size], include=[])
+            existing.update(result['ids'])
+        return existing
+
+    def _article_metadata(self, article: Article) -> dict:
+        metadata = {
+            "title": article.title,
+            "url": article.url,
+            "source_name": article.source_name,
+            "published_at": article.published_at,
+        }
+        ## numeric timestamp and category make time windows and categories chroma where clauses
+        published_ts = parse_published_at(article.published_at)
+        if published_ts is not None:
+            metadata["published_ts"] = published_ts
+        if article.category:
+            metadata["category"] = article.category
+        return metadata
+
+    @staticmethod
+    def _where(filters: Optional[dict]) -> Optional[dict]:
+        """Translate published_after/published_before (epoch seconds), source_name and category filters into a chroma where clause."""
+        if not filters:
+            return None
+        clauses = []
+        if filters.get("published_after") is not None:
+            clauses.append({"published_ts": {"$gte": int(filters["published_after"])}})
+        if filters.get("published_before") is not None:
+            clauses.append({"published_ts": {"$lte": int(filters["published_before"])}})
+        for field in ("source_name", "category"):
+            value = filters.get(field)
+            if isinstance(value, (list, tuple)):
+                clauses.append({field: {"$in": list(value)}})
+            elif value:
+                clauses.append({field: {"$eq": value}})
+        if not clauses:
+            return None
+        return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+    def search_articles(self,query,top_k=5,mode=None,filters=None,recency_half_life_hours=None) -> list[dict]:
+        """Retrieve the top_k articles, restricted by `filters` (see _where) and optionally re-scored by recency."""
+        mode = mode or self.retrieval_mode
+        where = self._where(filters)
+        half_life = self._half_life(recency_half_life_hours)
+        fetch_k = top_k if half_life is None else max(top_k, self.hybrid_candidates)
+        dense_results = []
+        if mode != "lexical":
+            query_embeddings = self.embed([query])
+            dense_results = self._format_results(self._dense_query(query_embeddings, self._candidates(fetch_k, mode), where))
+        lexical_results = self._lexical_query(query, self._candidates(fetch_k, mode), where) if mode != "dense" else []
+        return self._rescore(self._combine(dense_results, lexical_results, fetch_k, mode), top_k, half_life)
+
+    async def asearch_articles(self,query,top_k=5,mode=None,filters=None,recency_half_life_hours=None) -> list[dict]:
+        mode = mode or self.retrieval_mode
+        where = self._where(filters)
+        half_life = self._half_life(recency_half_life_hours)
+        fetch_k = top_k if half_life is None else max(top_k, self.hybrid_candidates)
+        dense_results = []
+        if mode != "lexical":
+            query_embeddings = await self.aembed_query(query)
+            results = await self._run(self.vectorstore_executor, self._dense_query, query_embeddings, self._candidates(fetch_k, mode), where)
+            dense_results = self._format_results(results)
+        if mode == "dense":
+            return self._rescore(self._combine(dense_results, [], fetch_k, mode), top_k, half_life)
+        lexical_results = await self._run(self.vectorstore_executor, self._lexical_query, query, self._candidates(fetch_k, mode), where)
+        combined = await self._run(self.vectorstore_executor, self._combine, dense_results, lexical_results, fetch_k, mode)
+        return self._rescore(combined, top_k, half_life)
+
+    def search_articles_batch(self,queries,top_k=5,mode=None,filters=None,recency_half_life_hours=None,query_embeddings=None) -> list[list[dict]]:
+        """search_articles for many queries at once: one embedding pass and one multi-query chroma call.
+
+        `query_embeddings` can be passed when the caller already embedded the queries.
+        """
+        mode = mode or self.retrieval_mode
+        where = self._where(filters)
+        half_life = self._half_life(recency_half_life_hours)
+        fetch_k = top_k if half_life is None else max(top_k, self.hybrid_candidates)
+        n_results = self._candidates(fetch_k, mode)
+        dense_results = [[] for _ in queries]
+        if mode != "lexical" and queries:
+            if query_embeddings is None:
+                query_embeddings = self.embed(queries)
+            results = self._dense_query(query_embeddings, n_results, where)
+            dense_results = [self._format_results(results, row) for row in range(len(queries))]
+        return [self._rescore(self._combine(dense, self._lexical_query(query, n_results, where) if mode != "dense" else [], fetch_k, mode), top_k, half_life)
+                for query, dense in zip(queries, dense_results)]
+
+    async def asearch_articles_batch(self,queries,top_k=5,mode=None,filters=None,recency_half_life_hours=None,query_embeddings=None) -> list[list[dict]]:
+        if query_embeddings is None and (mode or self.retrieval_mode) != "lexical":
+            ## one forward pass for the whole batch, the micro-batcher is for single concurrent queries
+            query_embeddings = await self.aembed(queries)
+        return await self._run(self.vectorstore_executor, self.search_articles_batch, queries, top_k=top_k, mode=mode, filters=filters,
+                               recency_half_life_hours=recency_half_life_hours, query_embeddings=query_embeddings)
+
+    def _dense_query(self, query_embeddings, n_results, where=None):
+        with stage("rag.dense_query", n_results=n_results, filtered=where is not None):
+            return self.collection.query(query_embeddings=query_embeddings, n_results=n_results, where=where)
+
+    def _lexical_query(self, query, n_results, where=None):
+        with stage("rag.lexical_query", n_results=n_results, filtered=where is not None):
+            if where is None:
+                return self.lexical_index.search(query, top_k=n_results)
+            ## the bm25 index has no metadata, keep the candidates chroma matches against the where clause
+            candidates = self.lexical_index.search(query, top_k=n_results * LEXICAL_FILTER_OVERFETCH)
+            if not candidates:
+                return []
+            allowed = set(self.collection.get(ids=[doc_id for doc_id, _ in candidates], where=where, include=[])['ids'])
+            return [(doc_id, score) for doc_id, score in candidates if doc_id in allowed][:n_results]
+
+    def _half_life(self, recency_half_life_hours) -> Optional[float]:
+        """The per-request half life, None falls back to the configured one and 0 turns decay off."""
+        half_life = self.recency_half_life_hours if recency_half_life_hours is None else recency_half_life_hours
+        return half_life or None
+
+    def _rescore(self, results: list[dict], top_k, half_life_hours=None) -> list[dict]:
+        """Exponential recency decay, the score halves every half_life_hours of article age."""
+        if half_life_hours is None:
+            return results[:top_k]
+        now = time.time()
+        rescored = []
+        for result in results:
+            published_ts = result['metadata'].get("published_ts")
+            ## articles without a usable date are treated as one half-life old
+            age_hours = max(0.0, (now - published_ts) / 3600) if published_ts is not None else half_life_hours
+            rescored.append({**result, "similarity_score": result['similarity_score'] * 0.5 ** (age_hours / half_life_hours)})
+        rescored.sort(key=lambda result: result['similarity_score'], reverse=True)
+        return rescored[:top_k]
+
+    def _candidates(self, top_k, mode) -> int:
+        ## hybrid fuses deeper candidate lists than it returns
+        return max(top_k, self.hybrid_candidates) if mode == "hybrid" else top_k
+
+    def _combine(self, dense_results: list[dict], lexical_results: list[tuple[str, float]], top_k, mode) -> list[dict]:
+        with stage("rag.fuse", mode=mode):
+            return self._fuse(dense_results, lexical_results, top_k, mode)
+
+    def _fuse(self, dense_results: list[dict], lexical_results: list[tuple[str, float]], top_k, mode) -> list[dict]:
+        if mode == "dense":
+            return dense_results[:top_k]
+
+        if mode == "lexical":
+            best = lexical_results[0][1] if lexical_results else 1.0
+            return self._fetch_results([(doc_id, score / best) for doc_id, score in lexical_results[:top_k]])
+
+        fused = reciprocal_rank_fusion([[result['id'] for result in dense_results], [doc_id for doc_id, _ in lexical_results]])[:top_k]
+        ## normalise rrf so that ranking first in both lists scores 1.0
+        best_possible = 2 / (60 + 1)
+        dense_by_id = {result['id']: result for result in dense_results}
+        missing = [(doc_id, score / best_possible) for doc_id, score in fused if doc_id not in dense_by_id]
+        fetched = {result['id']: result for result in self._fetch_results(missing)}
+        combined = []
+        for doc_id, score in fused:
+            result = dense_by_id.get(doc_id) or fetched.get(doc_id)
+            if result is not None:
+                combined.append({**result, "similarity_score": score / best_possible})
+        return combined
+
+    def _fetch_results(self, scored_ids: list[tuple[str, float]]) -> list[dict]:
+        if not scored_ids:
+            return []
+        records = self.collection.get(ids=[doc_id for doc_id, _ in scored_ids], include=["documents", "metadatas"])
+        by_id = {doc_id: (document, metadata) for doc_id, document, metadata in zip(records['ids'], records['documents'], records['metadatas'])}
+        results = []
+        for doc_id, score in scored_ids:
+            if doc_id in by_id:
+                document, metadata = by_id[doc_id]
+                results.append(self._format_record(doc_id, document, metadata, score))
+        return results
+
+    def _format_record(self, doc_id, document, metadata, similarity_score) -> dict:
+        return {
+            "id": doc_id,
+            "content": document,
+            "metadata": metadata,
+            "title": metadata.get("title",""),
+            "url": metadata.get("url",""),
+            "source_name": metadata.get("source_name",""),
+            "similarity_score": similarity_score
+        }
+
+    def _format_results(self, results, row=0) -> list[dict]:
+        """Format the results of the `row`-th query embedding of a chroma query."""
         formatted_results = []
-        for i in range(len(results['ids'][0])):
-            distance = results['distances'][0][i]
+        for i in range(len(results['ids'][row])):
+            distance = results['distances'][row][i]
             similarity_score = 1/(1+distance)
-            formatted_results.append({
-                "id": results['ids'][0][i],
-                "content": results['documents'][0][i],
-                "metadata":results['metadatas'][0][i],
-                "title": results['metadatas'][0][i].get("title",""),
-                "url": results['metadatas'][0][i].get("url",""),
-                "source_name": results['metadatas'][0][i].get("source_name",""),
-                "similarity_score": similarity_score
-            })
+            formatted_results.append(self._format_record(results['ids'][row][i], results['documents'][row][i], results['metadatas'][row][i], similarity_score))
 
         print(f"The total number of results: {len(formatted_results)}")
         return formatted_results
@@ -71,8 +528,20 @@ class RAGService:
             "top 3 elements in collection": self.collection.peek(3)
         }
 
+    async def aget_status(self):
+        return await self._run(self.vectorstore_executor, self.get_status)
+
+    async def aclear_storage(self):
+        return await self._run(self.vectorstore_executor, self.clear_storage)
+
     def clear_storage(self):
         self.client.delete_collection("rag_collection")
-        self.collection = self.client.get_or_create_collection(name="rag_collection",metadata={"description": "News artickles with embeddings"})
+        self.collection = self.client.get_or_create_collection(name="rag_collection",metadata=COLLECTION_METADATA)
+        self.client.delete_collection("rag_passages")
+        self.passages = self.client.get_or_create_collection(name="rag_passages",metadata={"description": "Passages of the news articles"})
+        self.lexical_index.clear()
+        if self.near_duplicates is not None:
+            self.near_duplicates.clear()
+        self._notify_change()
         print("Storage cleared !!")
 
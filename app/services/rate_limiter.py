@@ -0,0 +1,46 @@
+import asyncio
+import time
+
+from app.metrics import llm_rate_limit_wait
+
+
+class TokenRateLimiter:
+    """Async token bucket keeping LLM usage under `tokens_per_minute`, 0 disables it.
+
+    Callers reserve their estimated prompt + answer tokens before the call and
+    refund what the answer didn't use. Waiters are served in arrival order.
+    """
+
+    def __init__(self, tokens_per_minute=0):
+        self.tokens_per_minute = tokens_per_minute
+        self._available = float(tokens_per_minute)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._available = min(self.tokens_per_minute, self._available + (now - self._updated) * self.tokens_per_minute / 60)
+        self._updated = now
+
+    async def acquire(self, tokens: int) -> float:
+        """Wait until `tokens` are available and take them, returns the seconds waited."""
+        if not self.tokens_per_minute:
+            return 0.0
+        ## a request larger than the whole budget would never fit, let it drain the bucket instead
+        tokens = min(tokens, self.tokens_per_minute)
+        start = time.perf_counter()
+        async with self._lock:
+            self._refill()
+            while self._available < tokens:
+                await asyncio.sleep((tokens - self._available) * 60 / self.tokens_per_minute)
+                self._refill()
+            self._available -= tokens
+        waited = time.perf_counter() - start
+        llm_rate_limit_wait.observe(waited)
+        return waited
+
+    def refund(self, tokens: int) -> None:
+        if not self.tokens_per_minute or tokens <= 0:
+            return
+        self._refill()
+        self._available = min(self.tokens_per_minute, self._available + tokens)
@@ -0,0 +1,161 @@
+import threading
+import time
+from typing import Optional
+
+from fastapi import HTTPException
+
+from app.config import Config
+from app.metrics import service_startup_seconds
+from app.services.coordination import LeaderLease, SharedJobQueue
+from app.services.ingestion import IngestionWorker, Subscription
+from app.services.llm_service import LLMService
+from app.services.news_fetcher import NewsFetcher
+from app.services.rag_service import RAGService
+from app.services.retention import ColdArchive, Compactor, RetentionPolicy
+from app.services.storage import ArticleStorage
+from app.tracing import setup_tracing
+
+
+class ServiceRegistry:
+    """Process-wide holder for the application services.
+
+    The embedding model and the Chroma collection are expensive to build, so they
+    are created exactly once in `start()` and shared by every request handler.
+    The FastAPI lifespan calls `start_background()` so the server starts
+    listening (and answering /healthz) while the services load and warm up;
+    `ready` flips once they can serve traffic.
+    """
+
+    def __init__(self, storage_path="../data/articles.db", db_path="../data/chroma_db", legacy_json_path="../data/storage.json"):
+        self.storage_path = storage_path
+        self.legacy_json_path = legacy_json_path
+        self.db_path = db_path
+        self.news_fetcher: Optional[NewsFetcher] = None
+        self.storage: Optional[ArticleStorage] = None
+        self.rag_service: Optional[RAGService] = None
+        self.llm_service: Optional[LLMService] = None
+        self.ingestion_worker: Optional[IngestionWorker] = None
+        self.compactor: Optional[Compactor] = None
+        self.ready = False
+        self.startup_error: Optional[str] = None
+        self._startup_thread: Optional[threading.Thread] = None
+
+    @property
+    def started(self) -> bool:
+        return self.rag_service is not None
+
+    @property
+    def status(self) -> str:
+        if self.ready:
+            return "ready"
+        return "failed" if self.startup_error else "starting"
+
+    def start_background(self):
+        """Build and warm up the services on a background thread."""
+        if self._startup_thread is not None:
+            return
+        self._startup_thread = threading.Thread(target=self._start_and_warm_up, name="service-startup", daemon=True)
+        self._startup_thread.start()
+
+    def _start_and_warm_up(self):
+        try:
+            self.start()
+            self.warm_up()
+            self.ready = True
+        except Exception as e:
+            self.startup_error = str(e)
+            print(f"Service startup failed: {e}")
+
+    def warm_up(self):
+        """Run one embedding and one vector store read so the first request doesn't pay for lazy initialisation."""
+        start_time = time.perf_counter()
+        ## straight to the model, a cached embedding would skip the forward pass
+        self.rag_service.embedding_model.encode(["warm up"], convert_to_numpy=True)
+        self.rag_service.collection.count()
+        self.storage.get_stats()
+        print(f"Services warmed up in {time.perf_counter() - start_time:.2f}s")
+
+    def start(self):
+        if self.started:
+            return
+        start_time = time.perf_counter()
+        config = Config()
+        config.validate_news_api_key()
+        config.validate_groq_api_key()
+        setup_tracing(exporter=config.tracing_exporter, file_path=config.tracing_file_path, otlp_endpoint=config.tracing_otlp_endpoint)
+        self.news_fetcher = NewsFetcher()
+        self.storage = ArticleStorage(storage_path=self.storage_path, legacy_json_path=self.legacy_json_path,
+                                      journal_mode=config.sqlite_journal_mode)
+        self.rag_service = RAGService(db_path=self.db_path)
+        self.llm_service = LLMService(rag_service=self.rag_service)
+        ## several workers on one store: jobs go through a shared queue and a single elected leader ingests them
+        shared = bool(config.coordination_db_path)
+        lease = LeaderLease(config.coordination_db_path, ttl_seconds=config.leader_lease_seconds,
+                            journal_mode=config.sqlite_journal_mode) if shared else None
+        self.ingestion_worker = IngestionWorker(self.news_fetcher, self.storage, self.rag_service,
+                                                max_queue_size=config.ingestion_queue_size,
+                                                subscriptions=[Subscription(**item) for item in config.ingestion_subscriptions],
+                                                job_queue=SharedJobQueue(config.coordination_db_path, journal_mode=config.sqlite_journal_mode) if shared else None,
+                                                lease=lease)
+        self.ingestion_worker.start()
+        policy = RetentionPolicy(config.retention_default_ttl_hours, config.retention_category_ttl_hours)
+        self.compactor = Compactor(self.storage, self.rag_service, policy,
+                                   archive=ColdArchive(config.retention_archive_path) if config.retention_archive_path else None,
+                                   interval_seconds=config.retention_interval_seconds, batch_size=config.retention_batch_size,
+                                   rehydrate_hours=config.retention_rehydrate_hours, lease=lease)
+        if policy.enabled:
+            self.compactor.start()
+        duration = time.perf_counter() - start_time
+        service_startup_seconds.set(duration)
+        print(f"Services started in {duration:.2f}s")
+
+    def shutdown(self, timeout=10):
+        if self._startup_thread is not None:
+            ## a startup stuck on a model download must not hang the shutdown, the daemon thread dies with the process
+            self._startup_thread.join(timeout=timeout)
+            if self._startup_thread.is_alive():
+                print(f"Service startup still running after {timeout}s, abandoning it.")
+            self._startup_thread = None
+        self.ready = False
+        if self.ingestion_worker is not None:
+            self.ingestion_worker.stop()
+        self.ingestion_worker = None
+        if self.compactor is not None:
+            self.compactor.stop()
+        self.compactor = None
+        self.llm_service = None
+        if self.rag_service is not None:
+            self.rag_service.close()
+        self.rag_service = None
+        self.storage = None
+        self.news_fetcher = None
+
+
+registry = ServiceRegistry()
+
+
+def _require(service, name):
+    if service is None:
+        ## still loading, the readiness probe keeps traffic away until it is done
+        raise HTTPException(status_code=503, detail=f"{name} is not ready yet, the service is {registry.status}.", headers={"Retry-After": "5"})
+    return service
+
+
+## dependency providers for the route handlers, async so FastAPI doesn't hop to the threadpool
+async def get_news_fetcher() -> NewsFetcher:
+    return _require(registry.news_fetcher, "NewsFetcher")
+
+async def get_storage() -> ArticleStorage:
+    return _require(registry.storage, "ArticleStorage")
+
+async def get_rag_service() -> RAGService:
+    return _require(registry.rag_service, "RAGService")
+
+async def get_llm_service() -> LLMService:
+    return _require(registry.llm_service, "LLMService")
+
+async def get_ingestion_worker() -> IngestionWorker:
+    return _require(registry.ingestion_worker, "IngestionWorker")
+
+async def get_compactor() -> Compactor:
+    return _require(registry.compactor, "Compactor")
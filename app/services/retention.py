@@ -0,0 +1,170 @@
+import json
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional
+
+from app.metrics import compaction_duration_seconds, compaction_removed, corpus_size
+from app.models import Article, parse_published_at
+from app.services.coordination import LeaderLease
+from app.services.rag_service import RAGService
+from app.services.storage import ArticleStorage
+from app.tracing import tracer
+
+
+class RetentionPolicy:
+    """Per-category article TTLs, in hours. A TTL of 0 (or None) keeps articles forever."""
+
+    def __init__(self, default_ttl_hours: Optional[float] = None, category_ttl_hours: Optional[dict[str, float]] = None):
+        self.default_ttl_hours = default_ttl_hours or None
+        self.category_ttl_hours = {category: ttl or None for category, ttl in (category_ttl_hours or {}).items()}
+
+    @property
+    def enabled(self) -> bool:
+        return self.default_ttl_hours is not None or any(ttl is not None for ttl in self.category_ttl_hours.values())
+
+    def cutoffs(self, now: datetime) -> tuple[dict[str, Optional[int]], Optional[int]]:
+        """(per category cutoff, default cutoff) as epoch seconds, articles published before them are expired."""
+        def cutoff(ttl):
+            return int((now - timedelta(hours=ttl)).timestamp()) if ttl is not None else None
+        return {category: cutoff(ttl) for category, ttl in self.category_ttl_hours.items()}, cutoff(self.default_ttl_hours)
+
+
+class ColdArchive:
+    """zstd compressed JSONL archive of expired articles, one file per publish day.
+
+    Every archived batch is appended to its day file as a separate zstd frame,
+    readers decompress across frames.
+    """
+
+    def __init__(self, path: str, level=10):
+        ## only needed when the archive is enabled
+        import zstandard
+        self._zstd = zstandard
+        self.path = path
+        self.level = level
+        os.makedirs(path, exist_ok=True)
+
+    def _partition(self, day: date) -> str:
+        return os.path.join(self.path, f"{day.isoformat()}.jsonl.zst")
+
+    def archive(self, articles: list[Article]) -> None:
+        by_day: dict[date, list[Article]] = {}
+        for article in articles:
+            published_ts = parse_published_at(article.published_at)
+            day = datetime.fromtimestamp(published_ts, tz=timezone.utc).date() if published_ts is not None else date(1970, 1, 1)
+            by_day.setdefault(day, []).append(article)
+        compressor = self._zstd.ZstdCompressor(level=self.level)
+        for day, items in by_day.items():
+            lines = "".join(json.dumps(article.to_dict(), ensure_ascii=False) + "\n" for article in items)
+            with open(self._partition(day), "ab") as f:
+                f.write(compressor.compress(lines.encode("utf-8")))
+
+    def read(self, start: date, end: date) -> list[Article]:
+        """Archived articles published between start and end (inclusive days)."""
+        articles = []
+        day = start
+        while day <= end:
+            partition = self._partition(day)
+            if os.path.exists(partition):
+                with open(partition, "rb") as f:
+                    reader = self._zstd.ZstdDecompressor().stream_reader(f, read_across_frames=True)
+                    for line in reader.read().decode("utf-8").splitlines():
+                        data = json.loads(line)
+                        articles.append(Article(title=data['title'], description=data['description'], content=data['content'],
+                                                url=data['url'], source_name=data['source_name'], published_at=data['published_at'],
+                                                author=data['author'], category=data.get('category')))
+            day += timedelta(days=1)
+        return articles
+
+
+class Compactor:
+    """Background thread expiring articles past their TTL.
+
+    Expired articles are read from ArticleStorage in batches of `batch_size`,
+    optionally written to the cold archive, then removed from the vector store
+    (with their passages and index entries) and from ArticleStorage. With a
+    leader lease only the ingestion leader compacts. Rehydrated articles are
+    kept for `rehydrate_hours` and are not archived a second time.
+    """
+
+    def __init__(self, storage: ArticleStorage, rag_service: RAGService, policy: RetentionPolicy,
+                 archive: Optional[ColdArchive] = None, interval_seconds=3600, batch_size=500, rehydrate_hours=24.0,
+                 lease: Optional[LeaderLease] = None):
+        self.storage = storage
+        self.rag_service = rag_service
+        self.policy = policy
+        self.archive = archive
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+        self.rehydrate_hours = rehydrate_hours
+        self.lease = lease
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="retention-compactor", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=10):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if self.lease is None or self.lease.is_leader:
+                    self.compact()
+            except Exception as e:
+                print(f"Compaction failed: {e}")
+            self._stop.wait(self.interval_seconds)
+
+    def compact(self, now: Optional[datetime] = None) -> int:
+        """Remove every expired article, returns the number removed."""
+        start_time = time.perf_counter()
+        now = now or datetime.now(timezone.utc)
+        category_cutoffs, default_cutoff = self.policy.cutoffs(now)
+        removed = 0
+        with tracer.start_as_current_span("retention.compact"):
+            while not self._stop.is_set():
+                expired = self.storage.expired_articles(category_cutoffs, default_cutoff, limit=self.batch_size, now=now.timestamp())
+                if not expired:
+                    break
+                ids = [article.id for article in expired]
+                if self.archive is not None:
+                    ## rehydrated articles are still in the archive
+                    archived = self.storage.rehydrated_ids(ids)
+                    self.archive.archive([article for article in expired if article.id not in archived])
+                self.rag_service.delete_articles(ids)
+                self.storage.delete_articles(ids)
+                removed += len(ids)
+                compaction_removed.inc(len(ids))
+        duration = time.perf_counter() - start_time
+        compaction_duration_seconds.set(duration)
+        self.update_corpus_size()
+        print(f"Compaction removed {removed} expired articles in {duration:.2f}s")
+        return removed
+
+    def update_corpus_size(self) -> None:
+        corpus_size.labels(store="articles").set(self.storage.get_stats())
+        corpus_size.labels(store="vectorstore").set(self.rag_service.collection.count())
+
+    def rehydrate(self, start: date, end: date) -> int:
+        """Restore archived articles published between start and end into storage and the vector store.
+
+        Articles still past their TTL are kept for `rehydrate_hours`, then
+        expired again without being archived twice.
+        """
+        if self.archive is None:
+            raise RuntimeError("The cold archive is not enabled.")
+        articles = self.archive.read(start, end)
+        if articles:
+            ## marked first, a compaction running meanwhile must not expire them mid-restore
+            self.storage.mark_rehydrated([article.id for article in articles], time.time() + self.rehydrate_hours * 3600)
+            self.storage.save_articles(articles)
+            self.rag_service.add_articles(articles)
+        self.update_corpus_size()
+        return len(articles)
@@ -1,69 +1,328 @@
+import base64
 import json
 import os
-from app.models import Article
+import sqlite3
+import threading
+import time
+from typing import Iterator, Optional
+
+import orjson
+
+from app.models import Article, parse_published_at
+from app.tracing import stage
+
+ARTICLE_COLUMNS = ("id", "title", "description", "content", "url", "source_name", "published_at", "author", "category")
+
+## newest first, undated articles last; idx_articles_keyset serves both the order and the cursor range
+KEYSET_ORDER = "COALESCE(published_at, '') DESC, id DESC"
+KEYSET_AFTER = "COALESCE(published_at, '') <= ? AND (COALESCE(published_at, '') < ? OR id < ?)"
+
+def encode_cursor(row: dict) -> str:
+    """Opaque cursor pointing just after `row` in the keyset order."""
+    return base64.urlsafe_b64encode(orjson.dumps([row["published_at"] or "", row["id"]])).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple[str, str]:
+    try:
+        published_at, article_id = orjson.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    return published_at, article_id
 
 class ArticleStorage:
-    def __init__(self,storage_path):
+    """SQLite backed article store.
+
+    Articles are keyed by id and indexed on published_at and source_name, so
+    upserts cost O(batch) and stats/paged reads never scan the whole corpus.
+    The database runs in WAL mode so readers don't block the ingestion writer.
+    """
+
+    def __init__(self,storage_path,legacy_json_path=None,journal_mode="WAL"):
         self.storage_path = storage_path
+        self.journal_mode = journal_mode
         os.makedirs(os.path.dirname(self.storage_path),exist_ok=True)
-        if not os.path.exists(self.storage_path):
-            self.write_articles([])
-            print("Created new storage file !!")
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._create_schema()
+
+        if legacy_json_path and os.path.exists(legacy_json_path):
+            self.migrate_from_json(legacy_json_path)
+
+    def _connection(self) -> sqlite3.Connection:
+        ## one connection per thread, WAL lets them read concurrently
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.storage_path, timeout=30)
+            conn.execute(f"PRAGMA journal_mode={self.journal_mode}")
+            if self.journal_mode == "WAL":
+                conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
 
-    def read_articles(self) -> list[Article]:
+    def _create_schema(self, table="articles"):
+        conn = self._connection()
+        conn.executescript(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                id TEXT PRIMARY KEY,
+                title TEXT,
+                description TEXT,
+                content TEXT,
+                url TEXT,
+                source_name TEXT,
+                published_at TEXT,
+                author TEXT,
+                category TEXT,
+                published_ts INTEGER
+            );
+        """)
+        ## stores created before the category column
+        columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        if "category" not in columns:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN category TEXT")
+        ## and before published_ts, the epoch seconds retention compares on: publishedAt
+        ## strings come with offsets and fractional seconds and don't sort as text
+        if "published_ts" not in columns:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN published_ts INTEGER")
+            rows = conn.execute(f"SELECT id, published_at FROM {table} WHERE published_at IS NOT NULL AND published_at != ''").fetchall()
+            conn.executemany(f"UPDATE {table} SET published_ts = ? WHERE id = ?", [(parse_published_at(published_at), article_id) for article_id, published_at in rows])
+        conn.executescript(f"""
+            CREATE INDEX IF NOT EXISTS idx_{table}_published_at ON {table}(published_at);
+            CREATE INDEX IF NOT EXISTS idx_{table}_published_ts ON {table}(published_ts);
+            CREATE INDEX IF NOT EXISTS idx_{table}_source_name ON {table}(source_name);
+            CREATE INDEX IF NOT EXISTS idx_{table}_keyset ON {table}(COALESCE(published_at, ''), id);
+            CREATE TABLE IF NOT EXISTS {table}_rehydrated (id TEXT PRIMARY KEY, until REAL NOT NULL) WITHOUT ROWID;
+        """)
+        conn.commit()
+
+    @staticmethod
+    def _row_to_article(row) -> Article:
+        return Article(title=row[1],
+                       description=row[2],
+                       content=row[3],
+                       url=row[4],
+                       source_name=row[5],
+                       published_at=row[6],
+                       author=row[7],
+                       category=row[8]
+                       )
+
+    def read_articles(self, limit: Optional[int] = None, offset: int = 0) -> list[Article]:
         try:
-            with open(self.storage_path,'r',encoding='utf-8') as f:
-                data = json.load(f)
-
-            articles = []
-            for article_dict in data:
-                article = Article(title=article_dict['title'],
-                                  description=article_dict['description'],
-                                  content=article_dict['content'],
-                                  url=article_dict['url'],
-                                  source_name=article_dict['source_name'],
-                                  published_at=article_dict['published_at'],
-                                  author=article_dict['author']
-                                  )
-                articles.append(article)
-
-            return articles
+            query = f"SELECT {', '.join(ARTICLE_COLUMNS)} FROM articles ORDER BY {KEYSET_ORDER}"
+            params = ()
+            if limit is not None:
+                query += " LIMIT ? OFFSET ?"
+                params = (limit, offset)
+            with stage("storage.read", limit=limit or 0, offset=offset):
+                rows = self._connection().execute(query, params).fetchall()
+                return [self._row_to_article(row) for row in rows]
         except Exception as e:
             print(f"Error reading articles from storage: {e}")
             return []
 
-    def save_articles(self,articles :list[Article]):
-        existing_articles = self._read_articles()
-        exisiting_articles_ids = {article.id for article in existing_articles}
+    def read_page(self, limit: int, cursor: Optional[str] = None, columns=ARTICLE_COLUMNS, offset: int = 0) -> tuple[list[dict], Optional[str]]:
+        """One page of raw rows in keyset order and the cursor of the next page (None on the last page).
 
-        count_new = 0
-        count_duplicates = 0
+        Rows are plain {column: value} dicts, no Article is built, and every page
+        is an index range scan, however deep into the corpus the cursor points.
+        `offset` skips rows first, only for the deprecated offset pagination.
+        """
+        ## the keyset columns are needed for the next cursor
+        selected = list(dict.fromkeys(("id", "published_at", *columns)))
+        query = f"SELECT {', '.join(selected)} FROM articles"
+        params = []
+        if cursor is not None:
+            published_at, article_id = decode_cursor(cursor)
+            query += f" WHERE {KEYSET_AFTER}"
+            params = [published_at, published_at, article_id]
+        ## one extra row tells whether there is a next page
+        query += f" ORDER BY {KEYSET_ORDER} LIMIT ? OFFSET ?"
+        with stage("storage.page", limit=limit):
+            rows = self._connection().execute(query, (*params, limit + 1, offset)).fetchall()
+        rows = [dict(zip(selected, row)) for row in rows]
+        next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+        return [{column: row[column] for column in columns} for row in rows[:limit]], next_cursor
+
+    def iter_rows(self, cursor: Optional[str] = None, batch_size: int = 1000, columns=ARTICLE_COLUMNS) -> Iterator[list[dict]]:
+        """Walk the whole table in keyset order, `batch_size` rows at a time.
+
+        Each batch is its own short query, so memory stays bounded and no read
+        transaction is held open between batches while the caller is busy.
+        """
+        while True:
+            rows, cursor = self.read_page(batch_size, cursor=cursor, columns=columns)
+            if rows:
+                yield rows
+            if cursor is None:
+                return
+
+    def save_articles(self,articles :list[Article]):
+        """Upsert articles and return the number of articles that were new."""
+        rows = {}
         for article in articles:
-            if article.id not in exisiting_articles_ids:
-                existing_articles.append(article)
-                count_new+=1
-            else:
-                count_duplicates+=1
+            data = article.to_dict()
+            rows[article.id] = (*(data[column] for column in ARTICLE_COLUMNS), parse_published_at(article.published_at))
+        columns = (*ARTICLE_COLUMNS, "published_ts")
+        ## an article seen again through /everything keeps the category it was first fetched with
+        updates = ", ".join(f"{column}=COALESCE(excluded.{column}, {column})" if column == "category" else f"{column}=excluded.{column}"
+                            for column in columns[1:])
+        with stage("storage.save", articles=len(rows)), self._write_lock:
+            conn = self._connection()
+            with conn:
+                ## lock the database before counting, other workers may be saving the same articles
+                conn.execute("BEGIN IMMEDIATE")
+                existing = self._existing_ids(conn, list(rows))
+                conn.executemany(f"INSERT INTO articles ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+                                 f"ON CONFLICT(id) DO UPDATE SET {updates}", list(rows.values()))
+        count_new = len(rows) - len(existing)
 
         print(f"New Articles: {count_new}")
-        print(f"Duplicate Articles: {count_duplicates}")
+        print(f"Duplicate Articles: {len(articles) - count_new}")
+        return count_new
 
-        self.write_articles(existing_articles)           
-        return len(existing_articles)
+    @staticmethod
+    def _existing_ids(conn, ids: list[str]) -> set[str]:
+        existing = set()
+        ## stay below sqlite's bound parameter limit
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start+500]
+            rows = conn.execute(f"SELECT id FROM articles WHERE id IN ({', '.join('?' * len(chunk))})", chunk).fetchall()
+            existing.update(row[0] for row in rows)
+        return existing
 
     def write_articles(self,articles :list[Article]):
+        """Replace the whole storage content with `articles`."""
         try:
-            with open(self.storage_path,'w',encoding='utf-8') as f:
-                json.dump([article.to_dict() for article in articles],f)
+            with self._write_lock:
+                with self._connection() as conn:
+                    conn.execute("DELETE FROM articles")
+            self.save_articles(articles)
             return len(articles)
         except Exception as e:
             print(f"Error writing articles to storage: {e}")
 
     def get_stats(self):
-        articles = self.read_articles()
-        print(f"Total Articles: {len(articles)}")
-        return len(articles)
+        with stage("storage.stats"):
+            total = self._connection().execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+        print(f"Total Articles: {total}")
+        return total
+
+    def expired_articles(self, category_cutoffs: dict[str, Optional[int]], default_cutoff: Optional[int], limit=500,
+                         now: Optional[float] = None) -> list[Article]:
+        """Up to `limit` articles published before the cutoff of their category.
+
+        Cutoffs are epoch seconds compared against published_ts; a None cutoff keeps that category forever. Categories missing from
+        `category_cutoffs` (and uncategorised articles) use `default_cutoff`.
+        Articles rehydrated from the archive are kept until their exemption ends.
+        """
+        conditions, params = [], []
+        for category, cutoff in category_cutoffs.items():
+            if cutoff is not None:
+                conditions.append("(category = ? AND published_ts < ?)")
+                params.extend([category, cutoff])
+        if default_cutoff is not None:
+            placeholders = ", ".join("?" * len(category_cutoffs))
+            other = f"(category IS NULL OR category NOT IN ({placeholders}))" if category_cutoffs else "1"
+            conditions.append(f"({other} AND published_ts < ?)")
+            params.extend([*category_cutoffs, default_cutoff])
+        if not conditions:
+            return []
+        ## articles without a (parseable) publish date are never expired
+        query = (f"SELECT {', '.join(ARTICLE_COLUMNS)} FROM articles WHERE published_ts IS NOT NULL "
+                 f"AND ({' OR '.join(conditions)}) AND id NOT IN (SELECT id FROM articles_rehydrated WHERE until > ?) "
+                 f"ORDER BY published_ts LIMIT ?")
+        with stage("storage.expired", limit=limit):
+            rows = self._connection().execute(query, (*params, now if now is not None else time.time(), limit)).fetchall()
+        return [self._row_to_article(row) for row in rows]
+
+    def mark_rehydrated(self, ids: list[str], until: float) -> None:
+        """Exempt articles restored from the cold archive from expiry until the `until` epoch."""
+        with self._write_lock:
+            with self._connection() as conn:
+                conn.executemany("INSERT OR REPLACE INTO articles_rehydrated (id, until) VALUES (?, ?)", [(article_id, until) for article_id in ids])
+
+    def rehydrated_ids(self, ids: list[str]) -> set[str]:
+        """The ids among `ids` that were restored from the cold archive, and so are still in it."""
+        rehydrated = set()
+        conn = self._connection()
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start+500]
+            rows = conn.execute(f"SELECT id FROM articles_rehydrated WHERE id IN ({', '.join('?' * len(chunk))})", chunk).fetchall()
+            rehydrated.update(row[0] for row in rows)
+        return rehydrated
+
+    def delete_articles(self, ids: list[str]) -> int:
+        deleted = 0
+        with stage("storage.delete", articles=len(ids)), self._write_lock:
+            with self._connection() as conn:
+                for start in range(0, len(ids), 500):
+                    chunk = ids[start:start+500]
+                    deleted += conn.execute(f"DELETE FROM articles WHERE id IN ({', '.join('?' * len(chunk))})", chunk).rowcount
+                    conn.execute(f"DELETE FROM articles_rehydrated WHERE id IN ({', '.join('?' * len(chunk))})", chunk)
+        return deleted
 
     def clear_storage(self):
-        self.write_articles([])
+        with stage("storage.clear"), self._write_lock:
+            with self._connection() as conn:
+                conn.execute("DELETE FROM articles")
+                conn.execute("DELETE FROM articles_rehydrated")
         print("Storage cleared !!")
+
+    def migrate_from_json(self, json_path):
+        """One-shot import of the old storage.json file, which is renamed once imported."""
+        with open(json_path,'r',encoding='utf-8') as f:
+            data = json.load(f)
+        articles = [Article(title=article_dict['title'],
+                            description=article_dict['description'],
+                            content=article_dict['content'],
+                            url=article_dict['url'],
+                            source_name=article_dict['source_name'],
+                            published_at=article_dict['published_at'],
+                            author=article_dict['author'],
+                            category=article_dict.get('category'))
+                    for article_dict in data]
+        count_new = self.save_articles(articles)
+        os.replace(json_path, json_path + ".migrated")
+        print(f"Migrated {count_new} articles from {json_path}")
+        return count_new
+
+    def rekey_ids(self, batch_size=1000, on_batch=None) -> int:
+        """Recompute every article id from its url, streaming the table in bounded batches.
+
+        Rows are copied into a new table which replaces the old one at the end,
+        so an interrupted run leaves the store untouched. `on_batch` receives the
+        {old_id: new_id} mapping of each batch. Returns the number of rows copied.
+        """
+        with self._write_lock:
+            conn = self._connection()
+            conn.execute("DROP TABLE IF EXISTS articles_rekeyed")
+            conn.execute("DROP TABLE IF EXISTS articles_rekeyed_rehydrated")
+            self._create_schema("articles_rekeyed")
+            last_rowid = 0
+            copied = 0
+            while True:
+                rows = conn.execute(f"SELECT rowid, {', '.join(ARTICLE_COLUMNS)}, published_ts FROM articles WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                                    (last_rowid, batch_size)).fetchall()
+                if not rows:
+                    break
+                last_rowid = rows[-1][0]
+                mapping = {row[1]: Article.id_for_url(row[5]) for row in rows}
+                with conn:
+                    conn.executemany(f"INSERT OR IGNORE INTO articles_rekeyed ({', '.join(ARTICLE_COLUMNS)}, published_ts) VALUES ({', '.join('?' * (len(ARTICLE_COLUMNS) + 1))})",
+                                     [(mapping[row[1]],) + tuple(row[2:]) for row in rows])
+                    conn.executemany("INSERT OR REPLACE INTO articles_rekeyed_rehydrated (id, until) SELECT ?, until FROM articles_rehydrated WHERE id = ?",
+                                     [(new_id, old_id) for old_id, new_id in mapping.items()])
+                copied += len(rows)
+                if on_batch is not None:
+                    on_batch(mapping)
+            with conn:
+                conn.execute("DROP TABLE articles")
+                conn.execute("ALTER TABLE articles_rekeyed RENAME TO articles")
+                conn.execute("DROP TABLE articles_rehydrated")
+                conn.execute("ALTER TABLE articles_rekeyed_rehydrated RENAME TO articles_rehydrated")
+                conn.execute("DROP INDEX IF EXISTS idx_articles_rekeyed_published_at")
+                conn.execute("DROP INDEX IF EXISTS idx_articles_rekeyed_published_ts")
+                conn.execute("DROP INDEX IF EXISTS idx_articles_rekeyed_source_name")
+                conn.execute("DROP INDEX IF EXISTS idx_articles_rekeyed_keyset")
+            self._create_schema()
+        print(f"Re-keyed {copied} articles in storage.")
+        return copied
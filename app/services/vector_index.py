@@ -0,0 +1,653 @@
+import json
+import os
+import shutil
+import sqlite3
+import threading
+from typing import Optional
+
+import numpy as np
+
+from app.config import Config
+
+## chroma caps the records per call at roughly this, keep the same chunking for both backends
+MAX_BATCH_SIZE = 5000
+_SQL_OPERATORS = {"$eq": "=", "$ne": "!=", "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+
+
+class VectorIndex:
+    """A named collection of (id, embedding, document, metadata) records.
+
+    The methods are the subset of chroma's Collection API that RAGService
+    uses, so a chroma collection is used as is and other engines only have to
+    implement this. `where` clauses use chroma's operators ($eq, $ne, $gt,
+    $gte, $lt, $lte, $in, $nin, $and, $or) and distances are squared L2.
+    """
+
+    name: str
+    metadata: Optional[dict]
+
+    def add(self, ids, embeddings, documents=None, metadatas=None) -> None:
+        raise NotImplementedError
+
+    def upsert(self, ids, embeddings, documents=None, metadatas=None) -> None:
+        raise NotImplementedError
+
+    def update(self, ids, embeddings=None, documents=None, metadatas=None) -> None:
+        raise NotImplementedError
+
+    def delete(self, ids=None, where=None) -> None:
+        raise NotImplementedError
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=("documents", "metadatas")) -> dict:
+        raise NotImplementedError
+
+    def query(self, query_embeddings, n_results=10, where=None, include=("documents", "metadatas", "distances")) -> dict:
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def peek(self, limit=10) -> dict:
+        raise NotImplementedError
+
+    def modify(self, name=None, metadata=None) -> None:
+        raise NotImplementedError
+
+
+class VectorStore:
+    """Holds the named VectorIndex collections, the subset of chroma's client API that RAGService uses."""
+
+    def get_or_create_collection(self, name, metadata=None) -> VectorIndex:
+        raise NotImplementedError
+
+    def get_collection(self, name) -> VectorIndex:
+        raise NotImplementedError
+
+    def create_collection(self, name, metadata=None) -> VectorIndex:
+        raise NotImplementedError
+
+    def delete_collection(self, name) -> None:
+        raise NotImplementedError
+
+    def list_collections(self) -> list:
+        raise NotImplementedError
+
+    def get_max_batch_size(self) -> int:
+        return MAX_BATCH_SIZE
+
+
+def _normalize(vectors) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors.reshape(1, -1)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+def _where_sql(where: dict, collection: str) -> tuple[str, list]:
+    """Translate a chroma where clause into SQL over the metadata_index table, selecting record ids."""
+    clauses, params = [], []
+    for key, condition in where.items():
+        if key in ("$and", "$or"):
+            parts = [_where_sql(item, collection) for item in condition]
+            clauses.append("(" + f" {key[1:].upper()} ".join(sql for sql, _ in parts) + ")")
+            params.extend(param for _, part_params in parts for param in part_params)
+            continue
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for operator, value in condition.items():
+            subquery = "SELECT id FROM metadata_index WHERE collection = ? AND key = ? AND value"
+            if operator in ("$in", "$nin"):
+                clause = f"id IN ({subquery} IN ({', '.join('?' * len(value))}))"
+                values = list(value)
+            elif operator == "$ne":
+                ## matches chroma, documents without the key are kept
+                clause = f"id IN ({subquery} = ?)"
+                values = [value]
+            else:
+                clause = f"id IN ({subquery} {_SQL_OPERATORS[operator]} ?)"
+                values = [value]
+            clauses.append(f"NOT {clause}" if operator in ("$ne", "$nin") else clause)
+            params.extend([collection, key, *values])
+    return "(" + " AND ".join(clauses) + ")", params
+
+
+class _Segment:
+    """An immutable memory-mapped block of normalized vectors plus the ids of its live rows."""
+
+    def __init__(self, number: int, path: str, vectors: np.ndarray, ids: np.ndarray, live: np.ndarray):
+        self.number = number
+        self.path = path
+        self.vectors = vectors
+        self.ids = ids
+        self.live = live
+
+    def with_dead(self, rows) -> "_Segment":
+        ## copy-on-write, queries holding the old segment list are unaffected
+        live = self.live.copy()
+        live[rows] = False
+        return _Segment(self.number, self.path, self.vectors, self.ids, live)
+
+
+class NumpyVectorIndex(VectorIndex):
+    """In-process vector index over memory-mapped float32 segments.
+
+    Every write appends a new immutable segment file; deletes and overwritten
+    rows only clear a bit in the segment's live mask. Queries are exact: one
+    matrix product per segment and `argpartition` for the top k. When there
+    are more than `max_segments` small segments they are merged into one, and
+    when the small segments or the dead rows grow past a share of the base
+    segment everything is merged into a new base. With hnswlib installed the
+    base segment also gets an HNSW graph once it holds `hnsw_min_size`
+    vectors, used for unfiltered queries.
+
+    Ids, documents and metadata live in the store's SQLite database, and
+    scalar metadata values are indexed so where clauses are resolved by index
+    lookups instead of scanning.
+    """
+
+    def __init__(self, store: "NumpyVectorStore", name: str, metadata: Optional[dict], dim: Optional[int]):
+        self._store = store
+        self.name = name
+        self.metadata = metadata
+        self.dim = dim
+        self._write_lock = threading.RLock()
+        self._segments: tuple[_Segment, ...] = ()
+        self._hnsw = None
+        self._load()
+
+    ## storage
+
+    @property
+    def _dir(self) -> str:
+        return os.path.join(self._store.path, self.name)
+
+    def _conn(self) -> sqlite3.Connection:
+        return self._store._connection()
+
+    def _load(self) -> None:
+        os.makedirs(self._dir, exist_ok=True)
+        rows: dict[int, list[tuple[int, str]]] = {}
+        for doc_id, segment, row in self._conn().execute("SELECT id, segment, row FROM records WHERE collection = ?", (self.name,)):
+            rows.setdefault(segment, []).append((row, doc_id))
+        segments = []
+        for filename in sorted(os.listdir(self._dir)):
+            if not filename.startswith("segment-") or not filename.endswith(".npy"):
+                continue
+            number = int(filename[len("segment-"):-len(".npy")])
+            path = os.path.join(self._dir, filename)
+            if number not in rows:
+                ## left behind by an interrupted write or merge
+                os.remove(path)
+                continue
+            vectors = np.load(path, mmap_mode="r")
+            ids = np.empty(len(vectors), dtype=object)
+            live = np.zeros(len(vectors), dtype=bool)
+            for row, doc_id in rows[number]:
+                ids[row] = doc_id
+                live[row] = True
+            segments.append(_Segment(number, path, vectors, ids, live))
+        self._segments = tuple(segments)
+        self._load_hnsw()
+
+    def _write_segment(self, vectors: np.ndarray) -> _Segment:
+        number = max((segment.number for segment in self._segments), default=0) + 1
+        path = os.path.join(self._dir, f"segment-{number:08d}.npy")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, np.ascontiguousarray(vectors, dtype=np.float32))
+        os.replace(tmp_path, path)
+        return _Segment(number, path, np.load(path, mmap_mode="r"), np.empty(len(vectors), dtype=object), np.ones(len(vectors), dtype=bool))
+
+    @staticmethod
+    def _index_rows(collection, doc_id, metadata):
+        return [(collection, key, value, doc_id) for key, value in (metadata or {}).items()
+                if isinstance(value, (str, int, float, bool))]
+
+    ## writes
+
+    def add(self, ids, embeddings, documents=None, metadatas=None) -> None:
+        with self._write_lock:
+            existing = self._positions(ids)
+            keep = [i for i, doc_id in enumerate(ids) if doc_id not in existing]
+            if keep:
+                self._append([ids[i] for i in keep], [embeddings[i] for i in keep],
+                             [documents[i] for i in keep] if documents is not None else None,
+                             [metadatas[i] for i in keep] if metadatas is not None else None)
+
+    def upsert(self, ids, embeddings, documents=None, metadatas=None) -> None:
+        with self._write_lock:
+            self._append(list(ids), embeddings, documents, metadatas)
+
+    def update(self, ids, embeddings=None, documents=None, metadatas=None) -> None:
+        with self._write_lock:
+            if embeddings is not None:
+                current = self.get(ids=list(ids), include=["documents", "metadatas"])
+                by_id = {doc_id: (document, metadata) for doc_id, document, metadata in zip(current["ids"], current["documents"], current["metadatas"])}
+                rows = [(i, doc_id) for i, doc_id in enumerate(ids) if doc_id in by_id]
+                self._append([doc_id for _, doc_id in rows], [embeddings[i] for i, _ in rows],
+                             [documents[i] if documents is not None else by_id[doc_id][0] for i, doc_id in rows],
+                             [metadatas[i] if metadatas is not None else by_id[doc_id][1] for i, doc_id in rows])
+                return
+            conn = self._conn()
+            with conn:
+                for i, doc_id in enumerate(ids):
+                    if documents is not None:
+                        conn.execute("UPDATE records SET document = ? WHERE collection = ? AND id = ?", (documents[i], self.name, doc_id))
+                    if metadatas is not None:
+                        if conn.execute("UPDATE records SET metadata = ? WHERE collection = ? AND id = ?",
+                                        (json.dumps(metadatas[i]), self.name, doc_id)).rowcount:
+                            conn.execute("DELETE FROM metadata_index WHERE collection = ? AND id = ?", (self.name, doc_id))
+                            conn.executemany("INSERT INTO metadata_index (collection, key, value, id) VALUES (?, ?, ?, ?)",
+                                             self._index_rows(self.name, doc_id, metadatas[i]))
+
+    def _append(self, ids, embeddings, documents, metadatas) -> None:
+        if not ids:
+            return
+        ## the last occurrence of a repeated id wins, like a sequence of upserts
+        last = {doc_id: i for i, doc_id in enumerate(ids)}
+        order = sorted(last.values())
+        ids = [ids[i] for i in order]
+        vectors = _normalize([embeddings[i] for i in order])
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+            with self._conn() as conn:
+                conn.execute("UPDATE collections SET dim = ? WHERE name = ?", (self.dim, self.name))
+        segment = self._write_segment(vectors)
+        segment.ids[:] = ids
+        replaced = self._positions(ids)
+        conn = self._conn()
+        with conn:
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start+500]
+                conn.execute(f"DELETE FROM metadata_index WHERE collection = ? AND id IN ({', '.join('?' * len(chunk))})", [self.name, *chunk])
+            conn.executemany("INSERT OR REPLACE INTO records (collection, id, segment, row, document, metadata) VALUES (?, ?, ?, ?, ?, ?)",
+                             [(self.name, doc_id, segment.number, row,
+                               documents[order[row]] if documents is not None else None,
+                               json.dumps(metadatas[order[row]]) if metadatas is not None else None)
+                              for row, doc_id in enumerate(ids)])
+            conn.executemany("INSERT INTO metadata_index (collection, key, value, id) VALUES (?, ?, ?, ?)",
+                             [item for row, doc_id in enumerate(ids)
+                              for item in self._index_rows(self.name, doc_id, metadatas[order[row]] if metadatas is not None else None)])
+        self._segments = self._mark_dead(replaced) + (segment,)
+        self._maybe_merge()
+
+    def delete(self, ids=None, where=None) -> None:
+        with self._write_lock:
+            if where is not None:
+                ids = [doc_id for doc_id in self.get(ids=ids, where=where, include=[])["ids"]]
+            if not ids:
+                return
+            positions = self._positions(ids)
+            conn = self._conn()
+            with conn:
+                for start in range(0, len(ids), 500):
+                    chunk = list(ids[start:start+500])
+                    placeholders = ", ".join("?" * len(chunk))
+                    conn.execute(f"DELETE FROM records WHERE collection = ? AND id IN ({placeholders})", [self.name, *chunk])
+                    conn.execute(f"DELETE FROM metadata_index WHERE collection = ? AND id IN ({placeholders})", [self.name, *chunk])
+            self._segments = self._mark_dead(positions)
+            self._maybe_merge()
+
+    def _positions(self, ids) -> dict[str, tuple[int, int]]:
+        positions = {}
+        ids = list(ids)
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start+500]
+            rows = self._conn().execute(f"SELECT id, segment, row FROM records WHERE collection = ? AND id IN ({', '.join('?' * len(chunk))})",
+                                        [self.name, *chunk]).fetchall()
+            positions.update((doc_id, (segment, row)) for doc_id, segment, row in rows)
+        return positions
+
+    def _mark_dead(self, positions: dict[str, tuple[int, int]]) -> tuple[_Segment, ...]:
+        dead: dict[int, list[int]] = {}
+        for segment, row in positions.values():
+            dead.setdefault(segment, []).append(row)
+        return tuple(segment.with_dead(dead[segment.number]) if segment.number in dead else segment for segment in self._segments)
+
+    ## merging
+
+    def _maybe_merge(self) -> None:
+        segments = [segment for segment in self._segments if segment.live.any()]
+        if len(segments) != len(self._segments):
+            self._replace(list(self._segments), segments)
+        if not segments:
+            return
+        base, tail = segments[0], segments[1:]
+        total = sum(len(segment.live) for segment in segments)
+        dead = total - sum(int(segment.live.sum()) for segment in segments)
+        tail_rows = sum(len(segment.live) for segment in tail)
+        if dead > self._store.max_dead_ratio * total or tail_rows > self._store.merge_ratio * len(base.live):
+            self._merge(segments)
+        elif len(tail) > self._store.max_segments:
+            self._merge(tail)
+        if self._hnsw is not None and self._hnsw[0] != self._segments[0].number:
+            ## the base segment was dropped or rewritten
+            self._build_hnsw()
+
+    def _merge(self, segments: list[_Segment]) -> None:
+        """Rewrite the live rows of `segments` into one new segment."""
+        vectors = np.concatenate([segment.vectors[segment.live] for segment in segments])
+        ids = np.concatenate([segment.ids[segment.live] for segment in segments])
+        merged = self._write_segment(vectors)
+        merged.ids[:] = ids
+        with self._conn() as conn:
+            conn.executemany("UPDATE records SET segment = ?, row = ? WHERE collection = ? AND id = ?",
+                             [(merged.number, row, self.name, doc_id) for row, doc_id in enumerate(ids)])
+        self._replace(segments, [merged])
+        if merged.number == self._segments[0].number:
+            self._build_hnsw()
+        print(f"Merged {len(segments)} segments of {self.name} into one with {len(ids)} vectors.")
+
+    def _replace(self, old: list[_Segment], new: list[_Segment]) -> None:
+        numbers = {segment.number for segment in old}
+        self._segments = tuple(sorted([segment for segment in self._segments if segment.number not in numbers] + new,
+                                      key=lambda segment: segment.number))
+        kept = {segment.number for segment in new}
+        for segment in old:
+            if segment.number not in kept:
+                for path in (segment.path, self._hnsw_path(segment)):
+                    if os.path.exists(path):
+                        os.remove(path)
+
+    ## hnsw
+
+    def _hnsw_path(self, segment: _Segment) -> str:
+        return segment.path[:-len(".npy")] + ".hnsw"
+
+    def _load_hnsw(self) -> None:
+        self._hnsw = None
+        if not self._segments or not self._store.hnsw_min_size:
+            return
+        base = self._segments[0]
+        if os.path.exists(self._hnsw_path(base)) and self._store.hnswlib is not None:
+            index = self._store.hnswlib.Index(space="ip", dim=base.vectors.shape[1])
+            index.load_index(self._hnsw_path(base), max_elements=len(base.vectors))
+            index.set_ef(self._store.hnsw_ef)
+            self._hnsw = (base.number, index)
+        else:
+            self._build_hnsw()
+
+    def _build_hnsw(self) -> None:
+        base = self._segments[0]
+        if self._store.hnswlib is None or len(base.vectors) < self._store.hnsw_min_size:
+            self._hnsw = None
+            return
+        index = self._store.hnswlib.Index(space="ip", dim=base.vectors.shape[1])
+        index.init_index(max_elements=len(base.vectors), ef_construction=200, M=16)
+        index.add_items(base.vectors, np.arange(len(base.vectors)))
+        index.set_ef(self._store.hnsw_ef)
+        index.save_index(self._hnsw_path(base))
+        self._hnsw = (base.number, index)
+        print(f"Built an HNSW graph over {len(base.vectors)} vectors of {self.name}.")
+
+    ## reads
+
+    def count(self) -> int:
+        return sum(int(segment.live.sum()) for segment in self._segments)
+
+    def peek(self, limit=10) -> dict:
+        return self.get(limit=limit, include=["embeddings", "documents", "metadatas"])
+
+    def modify(self, name=None, metadata=None) -> None:
+        if metadata is not None:
+            self.metadata = metadata
+            with self._conn() as conn:
+                conn.execute("UPDATE collections SET metadata = ? WHERE name = ?", (json.dumps(metadata), self.name))
+        if name is not None and name != self.name:
+            self._store._rename(self, name)
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=("documents", "metadatas")) -> dict:
+        query = "SELECT id, segment, row, document, metadata FROM records WHERE collection = ?"
+        params: list = [self.name]
+        if ids is not None:
+            if not ids:
+                return self._result([], [], include)
+            query += f" AND id IN ({', '.join('?' * len(ids))})"
+            params.extend(ids)
+        if where:
+            sql, where_params = _where_sql(where, self.name)
+            query += f" AND {sql}"
+            params.extend(where_params)
+        query += " ORDER BY rowid"
+        if limit is not None or offset:
+            query += " LIMIT ? OFFSET ?"
+            params.extend([limit if limit is not None else -1, offset or 0])
+        with self._write_lock:
+            rows = self._conn().execute(query, params).fetchall()
+            embeddings = self._vectors([(segment, row) for _, segment, row, _, _ in rows]) if "embeddings" in include else None
+        return self._result(rows, embeddings, include)
+
+    def _vectors(self, positions: list[tuple[int, int]]) -> list[np.ndarray]:
+        segments = {segment.number: segment for segment in self._segments}
+        return [np.array(segments[segment].vectors[row]) for segment, row in positions]
+
+    @staticmethod
+    def _result(rows, embeddings, include) -> dict:
+        result = {"ids": [row[0] for row in rows]}
+        if "documents" in include:
+            result["documents"] = [row[3] for row in rows]
+        if "metadatas" in include:
+            result["metadatas"] = [json.loads(row[4]) if row[4] is not None else None for row in rows]
+        if "embeddings" in include:
+            result["embeddings"] = embeddings
+        return result
+
+    def query(self, query_embeddings, n_results=10, where=None, include=("documents", "metadatas", "distances")) -> dict:
+        queries = _normalize(query_embeddings)
+        ## snapshot, concurrent writes swap in new segment tuples and never mutate these
+        segments = self._segments
+        hnsw = self._hnsw if self._hnsw is not None and segments and self._hnsw[0] == segments[0].number else None
+        if where:
+            candidates = self._filtered(segments, where)
+            hits = [self._exact(segments, query, n_results, candidates) for query in queries]
+        elif hnsw is not None:
+            hits = [self._approximate(segments, hnsw[1], query, n_results) for query in queries]
+        else:
+            hits = self._exact_batch(segments, queries, n_results)
+
+        records = {}
+        all_ids = list({doc_id for query_hits in hits for doc_id, _, _ in query_hits})
+        for start in range(0, len(all_ids), 500):
+            chunk = all_ids[start:start+500]
+            for doc_id, document, metadata in self._conn().execute(
+                    f"SELECT id, document, metadata FROM records WHERE collection = ? AND id IN ({', '.join('?' * len(chunk))})", [self.name, *chunk]):
+                records[doc_id] = (document, json.loads(metadata) if metadata is not None else None)
+        ## a row deleted after the snapshot was taken is dropped
+        hits = [[hit for hit in query_hits if hit[0] in records] for query_hits in hits]
+        result = {"ids": [[doc_id for doc_id, _, _ in query_hits] for query_hits in hits]}
+        if "distances" in include:
+            ## squared l2 between unit vectors, the same scale chroma reports
+            result["distances"] = [[float(2 - 2 * score) for _, score, _ in query_hits] for query_hits in hits]
+        if "documents" in include:
+            result["documents"] = [[records[doc_id][0] for doc_id, _, _ in query_hits] for query_hits in hits]
+        if "metadatas" in include:
+            result["metadatas"] = [[records[doc_id][1] for doc_id, _, _ in query_hits] for query_hits in hits]
+        if "embeddings" in include:
+            result["embeddings"] = [[np.array(vector) for _, _, vector in query_hits] for query_hits in hits]
+        return result
+
+    def _filtered(self, segments, where) -> dict[int, np.ndarray]:
+        """Rows matching `where`, per segment number."""
+        sql, params = _where_sql(where, self.name)
+        rows: dict[int, list[int]] = {}
+        numbers = {segment.number: segment for segment in segments}
+        for doc_id, segment, row in self._conn().execute(f"SELECT id, segment, row FROM records WHERE collection = ? AND {sql}", [self.name, *params]):
+            ## skip rows a merge moved after the snapshot
+            if segment in numbers and numbers[segment].ids[row] == doc_id:
+                rows.setdefault(segment, []).append(row)
+        return {segment: np.array(sorted(items), dtype=np.int64) for segment, items in rows.items()}
+
+    @staticmethod
+    def _top(scores: np.ndarray, k: int) -> np.ndarray:
+        if k <= 0:
+            return np.empty(0, dtype=np.int64)
+        if k < len(scores):
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(scores))
+        return top[np.argsort(-scores[top], kind="stable")]
+
+    def _exact_batch(self, segments, queries: np.ndarray, n_results) -> list[list[tuple]]:
+        if not segments:
+            return [[] for _ in queries]
+        ## one (rows, queries) product per segment, dead rows never win
+        scores = np.concatenate([np.where(segment.live[:, None], segment.vectors @ queries.T, -np.inf) for segment in segments])
+        offsets = np.cumsum([0] + [len(segment.live) for segment in segments])
+        live = int(sum(segment.live.sum() for segment in segments))
+        hits = []
+        for column in range(len(queries)):
+            column_scores = scores[:, column]
+            top = self._top(column_scores, min(n_results, live))
+            owners = np.searchsorted(offsets, top, side="right") - 1
+            hits.append([self._hit((segments[owner], int(i - offsets[owner])), column_scores[i]) for i, owner in zip(top, owners)])
+        return hits
+
+    def _exact(self, segments, query: np.ndarray, n_results, candidates: dict[int, np.ndarray]) -> list[tuple]:
+        pairs, scores = [], []
+        for segment in segments:
+            rows = candidates.get(segment.number)
+            if rows is None or not len(rows):
+                continue
+            rows = rows[segment.live[rows]]
+            scores.append(segment.vectors[rows] @ query)
+            pairs.extend((segment, int(row)) for row in rows)
+        if not pairs:
+            return []
+        scores = np.concatenate(scores)
+        return [self._hit(pairs[i], scores[i]) for i in self._top(scores, min(n_results, len(scores)))]
+
+    def _approximate(self, segments, index, query: np.ndarray, n_results) -> list[tuple]:
+        base, tail = segments[0], segments[1:]
+        live_base = int(base.live.sum())
+        ## over-fetch so dead rows can be dropped, fall back to a scan when too many are dead
+        k = min(len(base.live), n_results + (len(base.live) - live_base))
+        labels, distances = index.knn_query(query, k=k)
+        hits = [self._hit((base, int(row)), 1 - distance) for row, distance in zip(labels[0], distances[0]) if base.live[row]]
+        if len(hits) < min(n_results, live_base):
+            hits = self._exact_batch([base], query.reshape(1, -1), n_results)[0]
+        for segment in tail:
+            hits.extend(self._exact_batch([segment], query.reshape(1, -1), n_results)[0])
+        hits.sort(key=lambda hit: hit[1], reverse=True)
+        return hits[:n_results]
+
+    @staticmethod
+    def _hit(position, score) -> tuple:
+        segment, row = position
+        return segment.ids[row], float(score), segment.vectors[row]
+
+
+class NumpyVectorStore(VectorStore):
+    """Directory of NumpyVectorIndex collections sharing one SQLite database.
+
+    In-process and single-writer, use the chroma server backend when several
+    processes share one corpus.
+    """
+
+    def __init__(self, path="../data/vector_index", max_segments=8, merge_ratio=0.1, max_dead_ratio=0.2, hnsw_min_size=0, hnsw_ef=64,
+                 journal_mode="WAL"):
+        self.path = path
+        self.journal_mode = journal_mode
+        self.max_segments = max_segments
+        self.merge_ratio = merge_ratio
+        self.max_dead_ratio = max_dead_ratio
+        self.hnsw_min_size = hnsw_min_size
+        self.hnsw_ef = hnsw_ef
+        self.hnswlib = None
+        if hnsw_min_size:
+            try:
+                ## optional, only needed for the hnsw graph
+                import hnswlib
+                self.hnswlib = hnswlib
+            except ImportError:
+                print("hnswlib is not installed, the vector index will use exact search only.")
+        os.makedirs(path, exist_ok=True)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._collections: dict[str, NumpyVectorIndex] = {}
+        self._connection().executescript("""
+            CREATE TABLE IF NOT EXISTS collections (name TEXT PRIMARY KEY, metadata TEXT, dim INTEGER);
+            CREATE TABLE IF NOT EXISTS records (collection TEXT NOT NULL, id TEXT NOT NULL, segment INTEGER NOT NULL, row INTEGER NOT NULL,
+                                                document TEXT, metadata TEXT, PRIMARY KEY (collection, id));
+            CREATE TABLE IF NOT EXISTS metadata_index (collection TEXT NOT NULL, key TEXT NOT NULL, value, id TEXT NOT NULL);
+            CREATE INDEX IF NOT EXISTS idx_metadata_index ON metadata_index(collection, key, value);
+            CREATE INDEX IF NOT EXISTS idx_metadata_index_id ON metadata_index(collection, id);
+        """)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(os.path.join(self.path, "index.sqlite3"), timeout=30)
+            conn.execute(f"PRAGMA journal_mode={self.journal_mode}")
+            if self.journal_mode == "WAL":
+                conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_or_create_collection(self, name, metadata=None) -> NumpyVectorIndex:
+        with self._lock:
+            if name in self._collections:
+                return self._collections[name]
+            row = self._connection().execute("SELECT metadata, dim FROM collections WHERE name = ?", (name,)).fetchone()
+            if row is None:
+                with self._connection() as conn:
+                    conn.execute("INSERT INTO collections (name, metadata) VALUES (?, ?)", (name, json.dumps(metadata) if metadata else None))
+                row = (json.dumps(metadata) if metadata else None, None)
+            ## like chroma, the metadata of an existing collection is kept
+            collection = NumpyVectorIndex(self, name, json.loads(row[0]) if row[0] else None, row[1])
+            self._collections[name] = collection
+            return collection
+
+    def get_collection(self, name) -> NumpyVectorIndex:
+        if name not in self.list_collections():
+            raise ValueError(f"Collection {name} does not exist.")
+        return self.get_or_create_collection(name)
+
+    def create_collection(self, name, metadata=None) -> NumpyVectorIndex:
+        if name in self.list_collections():
+            raise ValueError(f"Collection {name} already exists.")
+        return self.get_or_create_collection(name, metadata)
+
+    def delete_collection(self, name) -> None:
+        with self._lock:
+            with self._connection() as conn:
+                conn.execute("DELETE FROM collections WHERE name = ?", (name,))
+                conn.execute("DELETE FROM records WHERE collection = ?", (name,))
+                conn.execute("DELETE FROM metadata_index WHERE collection = ?", (name,))
+            self._collections.pop(name, None)
+            shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+
+    def list_collections(self) -> list[str]:
+        return [row[0] for row in self._connection().execute("SELECT name FROM collections")]
+
+    def _rename(self, collection: NumpyVectorIndex, name: str) -> None:
+        with self._lock, collection._write_lock:
+            if name in self.list_collections():
+                raise ValueError(f"Collection {name} already exists.")
+            with self._connection() as conn:
+                conn.execute("UPDATE collections SET name = ? WHERE name = ?", (name, collection.name))
+                conn.execute("UPDATE records SET collection = ? WHERE collection = ?", (name, collection.name))
+                conn.execute("UPDATE metadata_index SET collection = ? WHERE collection = ?", (name, collection.name))
+            os.rename(os.path.join(self.path, collection.name), os.path.join(self.path, name))
+            self._collections.pop(collection.name, None)
+            collection.name = name
+            self._collections[name] = collection
+            ## segment paths moved with the directory
+            collection._load()
+
+
+def create_vector_store(config: Optional[Config] = None, db_path="../data/chroma_db") -> VectorStore:
+    """Build the store selected by VECTOR_BACKEND (chroma | numpy)."""
+    config = config or Config()
+    if config.vector_backend == "numpy":
+        return NumpyVectorStore(config.vector_index_path, max_segments=config.vector_max_segments, hnsw_min_size=config.vector_hnsw_min_size,
+                                journal_mode=config.sqlite_journal_mode)
+    if config.vector_backend == "chroma":
+        ## chromadb is heavy to import, only pay for it when the service is built
+        import chromadb
+        import chromadb.config
+        settings = chromadb.config.Settings(anonymized_telemetry=False)
+        if config.chroma_host:
+            ## client/server mode, every worker and replica reads and writes the same collections
+            return chromadb.HttpClient(host=config.chroma_host, port=config.chroma_port, settings=settings)
+        return chromadb.PersistentClient(path=db_path, settings=settings)
+    raise ValueError(f"Unknown vector backend: {config.vector_backend}")
@@ -0,0 +1,52 @@
+import atexit
+import time
+from contextlib import contextmanager
+
+from opentelemetry import trace
+
+from app.metrics import stage_latency
+
+tracer = trace.get_tracer("ainews")
+
+
+def setup_tracing(exporter="none", file_path="../data/traces.jsonl", otlp_endpoint="http://localhost:4317") -> None:
+    """Install the global tracer provider.
+
+    exporter is one of none | console | file | otlp. The file exporter writes
+    one JSON span per line, otlp sends spans to a local collector over gRPC.
+    """
+    if exporter == "none":
+        return
+    ## the sdk is only needed once tracing is turned on
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+
+    if exporter == "otlp":
+        ## only needed when a collector is configured
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+        span_exporter = OTLPSpanExporter(endpoint=otlp_endpoint, insecure=True)
+    elif exporter == "file":
+        out = open(file_path, "a", encoding="utf-8")
+        atexit.register(out.close)
+        span_exporter = ConsoleSpanExporter(out=out, formatter=lambda span: span.to_json(indent=None) + "\n")
+    elif exporter == "console":
+        span_exporter = ConsoleSpanExporter()
+    else:
+        raise ValueError(f"Unknown tracing exporter: {exporter}")
+
+    provider = TracerProvider(resource=Resource.create({"service.name": "ainews"}))
+    provider.add_span_processor(BatchSpanProcessor(span_exporter))
+    trace.set_tracer_provider(provider)
+    atexit.register(provider.shutdown)
+
+
+@contextmanager
+def stage(name, **attributes):
+    """Trace a hot-path stage as a span and record its duration in the stage latency histogram."""
+    start = time.perf_counter()
+    with tracer.start_as_current_span(name, attributes=attributes) as span:
+        try:
+            yield span
+        finally:
+            stage_latency.labels(stage=name).observe(time.perf_counter() - start)
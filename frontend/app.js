@@ -89,11 +89,17 @@ async function handleFetchNews(e) {
             throw new Error(`HTTP error! status: ${response.status}`);
         }
         
-        const articles = await response.json();
+        // Ingestion runs in the background, poll the job until it finishes
+        const { job_id } = await response.json();
+        const job = await waitForJob(job_id);
+        if (job.status === 'failed') {
+            throw new Error(job.error || 'Ingestion job failed');
+        }
+        const articles = job.articles;
         
         resultsDiv.innerHTML = `
             <div class="success">
-                ✅ Successfully fetched ${articles.length} articles!
+                ✅ Successfully fetched ${articles.length} articles (${job.new_articles} new)!
             </div>
         `;
         
@@ -116,6 +122,21 @@ async function handleFetchNews(e) {
     }
 }
 
+// Poll an ingestion job until it completes or fails
+async function waitForJob(jobId, intervalMs = 1000) {
+    while (true) {
+        const response = await fetch(`${API_BASE_URL}/jobs/${jobId}`);
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+        const job = await response.json();
+        if (job.status === 'completed' || job.status === 'failed') {
+            return job;
+        }
+        await new Promise(resolve => setTimeout(resolve, intervalMs));
+    }
+}
+
 // Handle Search
 async function handleSearch(e) {
     e.preventDefault();
@@ -176,7 +197,7 @@ async function handleAsk(e) {
     resultsDiv.innerHTML = '';
     
     try {
-        const response = await fetch(`${API_BASE_URL}/ask`, {
+        const response = await fetch(`${API_BASE_URL}/ask/stream`, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json'
@@ -188,10 +209,22 @@ async function handleAsk(e) {
             throw new Error(`HTTP error! status: ${response.status}`);
         }
         
-        const data = await response.json();
-        
-        const answerEl = createAnswerElement(data);
+        const answerEl = createAnswerElement({ answer: '', sources: [] });
         resultsDiv.appendChild(answerEl);
+        const answerText = answerEl.querySelector('.answer-text');
+        let answer = '';
+        
+        await readEventStream(response, (event, data) => {
+            if (event === 'sources') {
+                hideLoading();
+                answerEl.querySelector('.answer-sources').innerHTML = createSourcesHTML(data);
+            } else if (event === 'token') {
+                answer += data;
+                answerText.textContent = answer;
+            } else if (event === 'error') {
+                throw new Error(data);
+            }
+        });
         
     } catch (error) {
         resultsDiv.innerHTML = `
@@ -204,6 +237,33 @@ async function handleAsk(e) {
     }
 }
 
+// Read a server-sent event stream from a fetch response, calling onEvent(event, data) per event
+async function readEventStream(response, onEvent) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const rawEvent = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            
+            let event = 'message';
+            let data = '';
+            rawEvent.split('\n').forEach(line => {
+                if (line.startsWith('event: ')) event = line.slice(7);
+                else if (line.startsWith('data: ')) data += line.slice(6);
+            });
+            onEvent(event, data ? JSON.parse(data) : null);
+        }
+    }
+}
+
 // Create Article Element
 function createArticleElement(article) {
     const div = document.createElement('div');
@@ -241,29 +301,33 @@ function createSearchResultElement(result) {
     return div;
 }
 
+// Create Sources HTML
+function createSourcesHTML(sources) {
+    if (!sources || sources.length === 0) {
+        return '';
+    }
+    return `
+        <div class="sources-title">📚 Sources:</div>
+        ${sources.map((source, idx) => `
+            <div class="source-item">
+                <strong>${idx + 1}. ${source.title}</strong><br>
+                <small>📰 ${source.source_name}</small><br>
+                <a href="${source.url}" target="_blank" class="result-url">Read article →</a>
+            </div>
+        `).join('')}
+    `;
+}
+
 // Create Answer Element
 function createAnswerElement(data) {
     const div = document.createElement('div');
     div.className = 'answer-box';
     
-    let sourcesHTML = '';
-    if (data.sources && data.sources.length > 0) {
-        sourcesHTML = `
-            <div class="sources-title">📚 Sources:</div>
-            ${data.sources.map((source, idx) => `
-                <div class="source-item">
-                    <strong>${idx + 1}. ${source.title}</strong><br>
-                    <small>📰 ${source.source} | Relevance: ${(source.relevance * 100).toFixed(1)}%</small><br>
-                    <a href="${source.url}" target="_blank" class="result-url">Read article →</a>
-                </div>
-            `).join('')}
-        `;
-    }
-    
     div.innerHTML = `
-        <div class="answer-text">${data.answer}</div>
-        ${sourcesHTML}
+        <div class="answer-text"></div>
+        <div class="answer-sources">${createSourcesHTML(data.sources)}</div>
     `;
+    div.querySelector('.answer-text').textContent = data.answer;
     
     return div;
-}
\ No newline at end of file
+}